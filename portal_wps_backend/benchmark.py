@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Script de benchmark de desempenho do Cargo Flow
+
+Executa cenários contra o banco configurado em DATABASE_URL usando uma empresa
+dedicada de benchmark, que é removida ao final de cada execução.
+
+Uso:
+    python benchmark.py login --users 50 --requests 400 --concurrency 16
+    python benchmark.py email-lookup --users 100000 --lookups 2000
+    python benchmark.py dashboard --plants 300 --appointments 200000 --requests 50
+    python benchmark.py plant-dashboard --appointments 200000 --requests 50
+    python benchmark.py export --appointments 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta, time as time_class
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import jwt
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.models.user import User, db
+from src.models.company import Company
+from src.models.plant import Plant
+from src.models.supplier import Supplier
+from src.models.appointment import Appointment
+from src.models.appointment_daily_stat import AppointmentDailyStat
+from src.main import app
+from src.routes.auth import SECRET_KEY
+from src.utils.password_hashing import hash_password
+from src.utils.daily_stats import backfill_daily_stats
+from src.utils import report_cache, rate_limit
+
+# Os cenários medem as consultas dos relatórios, não o cache de respostas
+report_cache.REPORT_CACHE_ENABLED = False
+# Todas as requisições saem do mesmo IP: sem isso o login mediria o limitador (429), não o hashing
+rate_limit.RATE_LIMIT_ENABLED = False
+
+BENCH_COMPANY_CNPJ = '99.999.999/9999-99'
+BENCH_PASSWORD = 'benchmark123'
+
+
+def _percentile(values, pct):
+    """Retorna o percentil pct (0-100) de uma lista de valores"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _print_latencies(label, latencies_ms, elapsed_s):
+    """Imprime resumo de latência e throughput"""
+    print(f"\n=== {label} ===")
+    print(f"Requisições: {len(latencies_ms)} em {elapsed_s:.2f}s ({len(latencies_ms) / elapsed_s:.1f} req/s)")
+    if latencies_ms:
+        print(f"Latência média: {statistics.mean(latencies_ms):.2f} ms")
+        print(f"p50: {_percentile(latencies_ms, 50):.2f} ms | p95: {_percentile(latencies_ms, 95):.2f} ms | p99: {_percentile(latencies_ms, 99):.2f} ms")
+
+
+def _cleanup_company(company_id):
+    """Remove todos os dados da empresa de benchmark"""
+    db.session.rollback()
+    AppointmentDailyStat.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    Appointment.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    User.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    Plant.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    Supplier.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    Company.query.filter_by(id=company_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@contextmanager
+def bench_company():
+    """Cria a empresa de benchmark e garante sua remoção ao final"""
+    existing = Company.query.filter_by(cnpj=BENCH_COMPANY_CNPJ).first()
+    if existing:
+        _cleanup_company(existing.id)
+
+    company = Company(name='Benchmark', cnpj=BENCH_COMPANY_CNPJ, is_active=True)
+    db.session.add(company)
+    db.session.commit()
+    try:
+        yield company
+    finally:
+        _cleanup_company(company.id)
+
+
+def bench_login(args):
+    """Mede throughput do /api/login com requisições concorrentes"""
+    with app.app_context():
+        with bench_company() as company:
+            print(f"Criando {args.users} usuários de benchmark...")
+            emails = []
+            for i in range(args.users):
+                user = User(email=f'bench{i}@benchmark.local', role='admin', company_id=company.id)
+                user.set_password(BENCH_PASSWORD)
+                db.session.add(user)
+                emails.append(user.email)
+            db.session.commit()
+
+            def do_login(i):
+                client = app.test_client()
+                started = time.perf_counter()
+                response = client.post('/api/login', json={
+                    'email': emails[i % len(emails)],
+                    # Uma parte das tentativas usa senha errada, como em um pico real
+                    'password': BENCH_PASSWORD if i % 10 else 'senha-errada'
+                })
+                return (time.perf_counter() - started) * 1000, response.status_code
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(do_login, range(args.requests)))
+            elapsed = time.perf_counter() - started
+
+            status_counts = {}
+            for _, status in results:
+                status_counts[status] = status_counts.get(status, 0) + 1
+
+            _print_latencies(f"Login ({args.concurrency} clientes concorrentes)", [lat for lat, _ in results], elapsed)
+            print(f"Status: {dict(sorted(status_counts.items()))}")
+
+
+def bench_email_lookup(args):
+    """Mede a busca de usuário por e-mail (login/recuperação de senha) com muitos usuários"""
+    with app.app_context():
+        with bench_company() as company:
+            print(f"Criando {args.users} usuários de benchmark...")
+            password_hash = hash_password(BENCH_PASSWORD)
+            batch = []
+            for i in range(args.users):
+                batch.append({
+                    'email': f'Bench.User{i}@Benchmark.local',
+                    'password_hash': password_hash,
+                    'role': 'supplier',
+                    'is_active': True,
+                    'company_id': company.id
+                })
+                if len(batch) >= 5000:
+                    db.session.execute(db.insert(User), batch)
+                    batch = []
+            if batch:
+                db.session.execute(db.insert(User), batch)
+            db.session.commit()
+            db.session.execute(db.text('ANALYZE users'))
+
+            sample_email = f'bench.user{args.users // 2}@benchmark.local'
+            plan = db.session.execute(
+                db.text("EXPLAIN SELECT * FROM users WHERE lower(email) = :email LIMIT 1"),
+                {'email': sample_email}
+            ).scalars().all()
+            print("\nPlano de execução:")
+            for line in plan:
+                print(f"  {line}")
+
+            latencies = []
+            started = time.perf_counter()
+            for i in range(args.lookups):
+                email = f'  BENCH.user{(i * 7919) % args.users}@benchmark.local '
+                lookup_started = time.perf_counter()
+                user = User.find_by_email(email)
+                latencies.append((time.perf_counter() - lookup_started) * 1000)
+                if not user:
+                    raise RuntimeError(f"Usuário não encontrado: {email}")
+                db.session.expunge_all()
+            elapsed = time.perf_counter() - started
+
+            _print_latencies(f"Busca por e-mail ({args.users} usuários)", latencies, elapsed)
+
+
+def _bulk_insert(model, rows, batch_size=5000):
+    """Insere linhas em lotes (executemany)"""
+    for i in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(model), rows[i:i + batch_size])
+    db.session.commit()
+
+
+def _admin_token(company_id):
+    """Cria um admin da empresa de benchmark e retorna o header de autorização"""
+    admin = User(email='bench.admin@benchmark.local', role='admin', company_id=company_id)
+    admin.set_password(BENCH_PASSWORD)
+    db.session.add(admin)
+    db.session.commit()
+    token = jwt.encode({
+        'user_id': admin.id,
+        'email': admin.email,
+        'role': admin.role,
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, SECRET_KEY, algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def seed_large_tenant(company_id, plants, suppliers, appointments, days):
+    """Popula a empresa de benchmark com plantas, fornecedores e agendamentos distribuídos no período"""
+    random.seed(42)
+    _bulk_insert(Plant, [{
+        'name': f'Planta {i}',
+        'cnpj': f'00.000.{i:03d}/0001-00',
+        'is_active': i % 10 != 0,
+        'max_capacity': 1 + i % 5,
+        'company_id': company_id
+    } for i in range(plants)])
+    _bulk_insert(Supplier, [{
+        'cnpj': f'11.111.{i:03d}/0001-00',
+        'description': f'Fornecedor {i}',
+        'is_active': True,
+        'is_deleted': False,
+        'company_id': company_id
+    } for i in range(suppliers)])
+
+    plant_ids = [row[0] for row in db.session.query(Plant.id).filter_by(company_id=company_id).all()]
+    supplier_ids = [row[0] for row in db.session.query(Supplier.id).filter_by(company_id=company_id).all()]
+    statuses = ['scheduled', 'checked_in', 'checked_out', 'rescheduled']
+    today = datetime.now().date()
+
+    rows = []
+    for i in range(appointments):
+        hour = random.randint(6, 17)
+        rows.append({
+            'appointment_number': f'BENCH-{i}',
+            'date': today - timedelta(days=random.randint(0, days - 1)),
+            'time': time_class(hour, 0),
+            'time_end': time_class(hour + 1, 0),
+            'purchase_order': f'PO{i}',
+            'truck_plate': 'BEN0001',
+            'driver_name': 'Benchmark',
+            'status': random.choice(statuses),
+            'company_id': company_id,
+            'supplier_id': random.choice(supplier_ids),
+            'plant_id': random.choice(plant_ids)
+        })
+    _bulk_insert(Appointment, rows)
+    # Inserções em massa não passam pelos eventos da sessão; o agregado é recalculado
+    backfill_daily_stats(company_id)
+    db.session.execute(db.text('ANALYZE appointment'))
+    db.session.execute(db.text('ANALYZE appointment_daily_stats'))
+    db.session.commit()
+
+
+def _measure_report(client, url, headers, requests, label):
+    """Executa a mesma requisição GET várias vezes e imprime as latências"""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"Resposta inesperada: {response.status_code} {response.get_data(as_text=True)}")
+    elapsed = time.perf_counter() - started
+
+    _print_latencies(label, latencies, elapsed)
+    print(f"Resposta: {response.get_json()}")
+
+
+def bench_dashboard(args):
+    """Mede o resumo do dashboard de relatórios em uma empresa grande"""
+    with app.app_context():
+        with bench_company() as company:
+            print(f"Populando {args.plants} plantas, {args.suppliers} fornecedores e {args.appointments} agendamentos...")
+            seed_large_tenant(company.id, args.plants, args.suppliers, args.appointments, args.days)
+            headers = _admin_token(company.id)
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=args.days)
+            url = f'/api/admin/reports/dashboard-summary?start_date={start_date}&end_date={end_date}'
+            _measure_report(
+                app.test_client(), url, headers, args.requests,
+                f"Resumo do dashboard ({args.plants} plantas, {args.days} dias)"
+            )
+
+
+def bench_plant_dashboard(args):
+    """Mede o resumo do dashboard de relatórios de uma planta"""
+    with app.app_context():
+        with bench_company() as company:
+            print(f"Populando {args.plants} plantas, {args.suppliers} fornecedores e {args.appointments} agendamentos...")
+            seed_large_tenant(company.id, args.plants, args.suppliers, args.appointments, args.days)
+            plant = Plant.query.filter_by(company_id=company.id, is_active=True).order_by(Plant.id).first()
+            plant_user = User(email='bench.plant@benchmark.local', role='plant', company_id=company.id, plant_id=plant.id)
+            plant_user.set_password(BENCH_PASSWORD)
+            db.session.add(plant_user)
+            db.session.commit()
+            token = jwt.encode({
+                'user_id': plant_user.id,
+                'email': plant_user.email,
+                'role': plant_user.role,
+                'exp': datetime.utcnow() + timedelta(hours=1)
+            }, SECRET_KEY, algorithm='HS256')
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=args.days)
+            url = f'/api/plant/reports/dashboard-summary?start_date={start_date}&end_date={end_date}'
+            _measure_report(
+                app.test_client(), url, {'Authorization': f'Bearer {token}'}, args.requests,
+                f"Resumo do dashboard da planta ({args.appointments // args.plants} agendamentos/planta, {args.days} dias)"
+            )
+
+
+def _current_rss_mb():
+    """Memória residente atual do processo em MB (Linux)"""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def bench_export(args):
+    """Mede a exportação CSV de agendamentos (tempo até o primeiro byte, vazão e memória)"""
+    with app.app_context():
+        with bench_company() as company:
+            print(f"Populando {args.appointments} agendamentos em {args.days} dias...")
+            seed_large_tenant(company.id, args.plants, args.suppliers, args.appointments, args.days)
+            headers = _admin_token(company.id)
+            client = app.test_client()
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=args.days)
+            url = f'/api/admin/appointments/export.csv?start={start_date}&end={end_date}'
+
+            rss_before = _current_rss_mb()
+            rss_peak = rss_before
+            started = time.perf_counter()
+            response = client.get(url, headers=headers, buffered=False)
+            if response.status_code != 200:
+                raise RuntimeError(f"Resposta inesperada: {response.status_code} {response.get_data(as_text=True)}")
+
+            first_byte_ms = None
+            lines = 0
+            size = 0
+            for chunk in response.response:
+                if first_byte_ms is None:
+                    first_byte_ms = (time.perf_counter() - started) * 1000
+                lines += chunk.count(b'\n')
+                size += len(chunk)
+                rss_peak = max(rss_peak, _current_rss_mb())
+            response.close()
+            elapsed = time.perf_counter() - started
+
+            print(f"\nExportação CSV ({lines - 1} agendamentos)")
+            print(f"  tempo total: {elapsed:.2f}s | primeiro byte: {first_byte_ms:.1f}ms")
+            print(f"  vazão: {(lines - 1) / elapsed:.0f} linhas/s | {size / 1024 / 1024 / elapsed:.1f} MB/s ({size / 1024 / 1024:.1f} MB)")
+            # A memória durante a exportação não deve crescer com a quantidade de linhas
+            print(f"  memória do processo: {rss_before:.0f} MB antes, pico de {rss_peak:.0f} MB durante a exportação")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de desempenho do Cargo Flow')
+    subparsers = parser.add_subparsers(dest='scenario', required=True)
+
+    login_parser = subparsers.add_parser('login', help='Throughput do endpoint de login')
+    login_parser.add_argument('--users', type=int, default=50)
+    login_parser.add_argument('--requests', type=int, default=400)
+    login_parser.add_argument('--concurrency', type=int, default=16)
+    login_parser.set_defaults(func=bench_login)
+
+    email_parser = subparsers.add_parser('email-lookup', help='Busca de usuário por e-mail')
+    email_parser.add_argument('--users', type=int, default=100000)
+    email_parser.add_argument('--lookups', type=int, default=2000)
+    email_parser.set_defaults(func=bench_email_lookup)
+
+    dashboard_parser = subparsers.add_parser('dashboard', help='Resumo do dashboard de relatórios')
+    dashboard_parser.add_argument('--plants', type=int, default=300)
+    dashboard_parser.add_argument('--suppliers', type=int, default=500)
+    dashboard_parser.add_argument('--appointments', type=int, default=200000)
+    dashboard_parser.add_argument('--days', type=int, default=365)
+    dashboard_parser.add_argument('--requests', type=int, default=50)
+    dashboard_parser.set_defaults(func=bench_dashboard)
+
+    plant_dashboard_parser = subparsers.add_parser('plant-dashboard', help='Resumo do dashboard de relatórios da planta')
+    plant_dashboard_parser.add_argument('--plants', type=int, default=50)
+    plant_dashboard_parser.add_argument('--suppliers', type=int, default=500)
+    plant_dashboard_parser.add_argument('--appointments', type=int, default=200000)
+    plant_dashboard_parser.add_argument('--days', type=int, default=365)
+    plant_dashboard_parser.add_argument('--requests', type=int, default=50)
+    plant_dashboard_parser.set_defaults(func=bench_plant_dashboard)
+
+    export_parser = subparsers.add_parser('export', help='Exportação CSV de agendamentos')
+    export_parser.add_argument('--plants', type=int, default=50)
+    export_parser.add_argument('--suppliers', type=int, default=200)
+    export_parser.add_argument('--appointments', type=int, default=1000000)
+    export_parser.add_argument('--days', type=int, default=365)
+    export_parser.set_defaults(func=bench_export)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Comandos de manutenção do Cargo Flow
+
+Uso:
+    python manage.py migrate [--list]
+    python manage.py backfill-daily-stats [--company-id ID]
+    python manage.py partitions [--months-ahead N] [--check]
+    python manage.py archive-appointments [--months N] [--detach] [--batch-size N]
+"""
+import os
+import sys
+import argparse
+from sqlalchemy.orm import Session
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.utils.daily_stats import backfill_daily_stats
+from src.utils.migrations import run_migrations, migration_status, pending_migrations
+from src.utils.appointment_archive import (
+    APPOINTMENT_ARCHIVE_MONTHS, archive_cutoff, archive_rows, check_partition_pruning,
+    detach_old_partitions, ensure_partitions, is_partitioned
+)
+from src.models.user import db
+
+
+def cmd_migrate(args):
+    """Aplica as migrações pendentes do banco de dados"""
+    with app.app_context():
+        if args.list:
+            for migration in migration_status():
+                mark = 'x' if migration['applied'] else ' '
+                print(f"[{mark}] {migration['version']} - {migration['description']}")
+            return
+        pending = pending_migrations()
+        if pending:
+            print(f"Aplicando: {', '.join(pending)}")
+        executed = run_migrations()
+        for version in executed:
+            print(f"Aplicada: {version}")
+        print(f"Migrações aplicadas: {len(executed)}" if executed else "Banco de dados atualizado")
+
+
+def cmd_backfill_daily_stats(args):
+    """Recalcula o agregado diário de agendamentos (appointment_daily_stats)"""
+    with app.app_context():
+        rows = backfill_daily_stats(company_id=args.company_id)
+        print(f"Agregado diário recalculado: {rows} linhas")
+
+
+def cmd_partitions(args):
+    """Cria as partições mensais futuras de appointment e verifica o partition pruning"""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            if not is_partitioned(connection):
+                print("A tabela appointment não é particionada (requer PostgreSQL e a migração 0004)")
+                return
+            created = ensure_partitions(connection, months_ahead=args.months_ahead)
+        print(f"Partições criadas: {', '.join(f'{month:%Y-%m}' for month in created) or 'nenhuma'}")
+
+        if args.check:
+            with db.engine.connect() as connection:
+                for name, relations in check_partition_pruning(connection).items():
+                    print(f"{name}: {', '.join(relations)}")
+
+
+def cmd_archive_appointments(args):
+    """Arquiva os agendamentos anteriores ao corte em appointment_archive"""
+    with app.app_context():
+        cutoff = archive_cutoff(args.months)
+        print(f"Arquivando agendamentos anteriores a {cutoff.isoformat()}")
+        if args.detach:
+            with Session(bind=db.engine) as session, session.begin():
+                connection = session.connection()
+                if not is_partitioned(connection):
+                    print("--detach requer a tabela appointment particionada (PostgreSQL)")
+                    return
+                # Linhas antigas que estejam na partição padrão ganham partição antes de desanexar
+                ensure_partitions(connection)
+                archived = detach_old_partitions(session, cutoff)
+            print(f"Partições arquivadas: {', '.join(archived) or 'nenhuma'}")
+        else:
+            total = archive_rows(db.engine, cutoff, batch_size=args.batch_size)
+            print(f"Agendamentos arquivados: {total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comandos de manutenção do Cargo Flow')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Aplica as migrações pendentes do banco de dados')
+    migrate_parser.add_argument('--list', action='store_true', help='Apenas lista as migrações e se já foram aplicadas')
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    backfill_parser = subparsers.add_parser('backfill-daily-stats', help='Recalcula o agregado diário de agendamentos')
+    backfill_parser.add_argument('--company-id', type=int, default=None, help='Recalcular apenas esta company')
+    backfill_parser.set_defaults(func=cmd_backfill_daily_stats)
+
+    partitions_parser = subparsers.add_parser('partitions', help='Cria as partições mensais futuras de appointment')
+    partitions_parser.add_argument('--months-ahead', type=int, default=None, help='Meses futuros com partição (padrão: APPOINTMENT_PARTITION_MONTHS_AHEAD)')
+    partitions_parser.add_argument('--check', action='store_true', help='Mostra as partições lidas pelas consultas típicas (EXPLAIN)')
+    partitions_parser.set_defaults(func=cmd_partitions)
+
+    archive_parser = subparsers.add_parser('archive-appointments', help='Arquiva agendamentos antigos em appointment_archive')
+    archive_parser.add_argument('--months', type=int, default=APPOINTMENT_ARCHIVE_MONTHS, help='Idade mínima em meses (padrão: APPOINTMENT_ARCHIVE_MONTHS)')
+    archive_parser.add_argument('--detach', action='store_true', help='Move partições mensais inteiras (todos os status) em vez de linhas com check-out')
+    archive_parser.add_argument('--batch-size', type=int, default=5000, help='Agendamentos por transação no modo padrão')
+    archive_parser.set_defaults(func=cmd_archive_appointments)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
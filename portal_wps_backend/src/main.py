@@ -9,10 +9,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.models.user import db
 from src.models.company import Company
 from src.models.supplier import Supplier
 from src.models.appointment import Appointment
+from src.models.appointment_archive import AppointmentArchive
+from src.models.appointment_number import AppointmentNumber
 from src.models.schedule_config import ScheduleConfig
 from src.models.default_schedule import DefaultSchedule
 from src.models.system_config import SystemConfig
@@ -20,11 +23,24 @@ from src.models.plant import Plant
 from src.models.operating_hours import OperatingHours
 from src.models.permission import Permission
 from src.models.password_reset_token import PasswordResetToken
+from src.models.cache_invalidation_event import CacheInvalidationEvent
+from src.models.appointment_daily_stat import AppointmentDailyStat
+from src.models.report_job import ReportJob
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp
 from src.routes.admin import admin_bp
 from src.routes.supplier import supplier_bp
 from src.routes.plant import plant_bp
+from src.utils.rate_limit import init_admission_control
+from src.utils.pool_metrics import (
+    pool_engine_options, init_pool_metrics, get_pool_metrics, metrics_access_allowed, METRICS_TOKEN
+)
+from src.utils.cache_bus import init_cache_bus
+from src.utils.db_routing import init_read_routing, replica_bind_config
+from src.utils.daily_stats import init_daily_stats
+from src.utils.query_stats import init_query_stats
+from src.utils.server_timing import init_server_timing, get_route_timings
+from src.utils.migrations import pending_migrations
 
 # Configurar logging
 # Em produção, usar WARNING para reduzir logs desnecessários
@@ -38,6 +54,16 @@ logger = logging.getLogger(__name__)
 # Criar aplicação Flask
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
+# Proxies confiáveis na frente da aplicação (Railway: 1). O IP do cliente (limitação de taxa)
+# é a entrada do X-Forwarded-For adicionada pelo último proxy confiável, não a primeira,
+# que o próprio cliente pode enviar
+TRUSTED_PROXY_COUNT = int(os.environ.get(
+    'TRUSTED_PROXY_COUNT',
+    1 if (os.environ.get('FLASK_ENV') == 'production' or os.environ.get('ENVIRONMENT') == 'production' or os.environ.get('RAILWAY_ENVIRONMENT')) else 0
+))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+
 # SECRET_KEY: usar variável de ambiente em produção, fallback apenas para desenvolvimento
 SECRET_KEY = os.environ.get('SECRET_KEY') or os.environ.get('JWT_SECRET_KEY')
 if not SECRET_KEY:
@@ -156,23 +182,34 @@ except Exception as e:
 # Configurar SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool configurável por deploy (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING)
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-    'pool_size': 5,
-    'max_overflow': 10,
+    **pool_engine_options(),
     'connect_args': {
         'connect_timeout': 10,
         'sslmode': 'require',
         'application_name': 'portal_wps_backend'
     }
 }
+# Réplica de leitura opcional (DATABASE_READ_URL): GETs e relatórios em segundo plano
+app.config['SQLALCHEMY_BINDS'] = replica_bind_config(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
 
 # Inicializar banco de dados
 try:
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        # O esquema é mantido pelas migrações (python manage.py migrate, antes do deploy):
+        # a inicialização dos workers não executa DDL
+        pending = pending_migrations()
+        if pending:
+            logger.warning(f"Migrações pendentes: {', '.join(pending)}. Execute: python manage.py migrate")
+        init_daily_stats()
+    init_pool_metrics(app, db)
+    init_admission_control(app)
+    init_cache_bus(app, db)
+    init_read_routing(app)
+    init_query_stats(app)
+    init_server_timing(app)
     logger.info("Banco de dados inicializado com sucesso")
 except Exception as e:
     logger.error(f"Erro ao inicializar banco de dados: {e}")
@@ -223,6 +260,40 @@ def health_check():
             'error': str(e)
         }), 503
 
+def metrics_access_denied():
+    """Resposta de erro dos endpoints de métricas (None se o acesso é permitido)"""
+    if metrics_access_allowed():
+        return None
+    if METRICS_TOKEN:
+        return jsonify({'error': 'Token de métricas inválido'}), 401
+    return jsonify({'error': 'Endpoint não encontrado'}), 404
+
+@app.route('/api/health/pool', methods=['GET'])
+def pool_metrics():
+    """Métricas do pool de conexões deste worker (conexões emprestadas, esperas, overflows)"""
+    denied = metrics_access_denied()
+    if denied:
+        return denied
+    
+    return jsonify({
+        'pid': os.getpid(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'pools': get_pool_metrics()
+    }), 200
+
+@app.route('/api/health/timing', methods=['GET'])
+def route_timings():
+    """Histogramas do tempo por fase (auth, permission, db, ...) de cada rota deste worker"""
+    denied = metrics_access_denied()
+    if denied:
+        return denied
+    
+    return jsonify({
+        'pid': os.getpid(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'routes': get_route_timings()
+    }), 200
+
 @app.route('/api', methods=['GET'])
 def api_root():
     """Endpoint raiz da API"""
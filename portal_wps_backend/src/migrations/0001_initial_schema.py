@@ -0,0 +1,15 @@
+"""
+Esquema inicial
+
+Cria as tabelas declaradas nos models que ainda não existirem, com os seus índices.
+Tabelas já existentes (bancos criados antes das migrações pelo db.create_all() na
+inicialização) não são alteradas, nem recebem índices novos: índices em tabelas
+existentes são criados pelas migrações seguintes (0002, 0006).
+"""
+from src.models.user import db
+
+DESCRIPTION = 'Esquema inicial (tabelas e índices dos models)'
+
+
+def upgrade(connection):
+    db.metadata.create_all(bind=connection)
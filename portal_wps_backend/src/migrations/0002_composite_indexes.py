@@ -0,0 +1,28 @@
+"""
+Índices compostos das consultas de disponibilidade e relatórios
+
+- appointment (company_id, plant_id, date, time): disponibilidade por planta e
+  relatórios por período; a ordem segue o filtro multi-tenant (company_id primeiro)
+- appointment (supplier_id, date): agenda e estatísticas do fornecedor
+- schedule_configs (plant_id, date): bloqueios de datas específicas
+- default_schedules (plant_id, day_of_week): bloqueios semanais
+
+operating_hours já é coberta pela constraint única (plant_id, schedule_type, day_of_week).
+Criados com CONCURRENTLY no PostgreSQL para não bloquear agendamentos durante o deploy.
+"""
+from src.utils.migrations import create_index
+
+DESCRIPTION = 'Índices compostos de agendamentos e horários'
+TRANSACTIONAL = False
+
+INDEXES = (
+    ('ix_appointment_company_plant_date_time', 'appointment', 'company_id, plant_id, date, time'),
+    ('ix_appointment_supplier_date', 'appointment', 'supplier_id, date'),
+    ('ix_schedule_configs_plant_date', 'schedule_configs', 'plant_id, date'),
+    ('ix_default_schedules_plant_day', 'default_schedules', 'plant_id, day_of_week'),
+)
+
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
@@ -0,0 +1,20 @@
+"""
+Preenchimento inicial do agregado diário de agendamentos
+
+Substitui o ensure_daily_stats() que rodava na inicialização dos workers.
+"""
+from src.models.user import db
+from src.utils.daily_stats import ensure_daily_stats
+
+DESCRIPTION = 'Preenche appointment_daily_stats a partir dos agendamentos existentes'
+# O backfill grava em lotes pela sessão da aplicação, com commits próprios
+TRANSACTIONAL = False
+
+
+def upgrade(connection):
+    try:
+        ensure_daily_stats()
+    finally:
+        # Encerra a transação de leitura da sessão: aberta, ela bloquearia o
+        # LOCK TABLE appointment da migração 0004 na mesma execução
+        db.session.remove()
@@ -0,0 +1,17 @@
+"""
+Particionamento mensal de appointment e tabela de arquivo
+
+No PostgreSQL converte appointment em tabela particionada por mês em date (chave
+primária (id, date)) e cria appointment_archive particionada com as mesmas colunas.
+A conversão copia os agendamentos com a tabela bloqueada; em bases grandes, aplique em
+janela de manutenção. Nos demais bancos apenas cria appointment_archive.
+"""
+from src.models.appointment_archive import AppointmentArchive
+from src.utils.appointment_archive import partition_appointment_table
+
+DESCRIPTION = 'Particiona appointment por mês e cria appointment_archive'
+
+
+def upgrade(connection):
+    if not partition_appointment_table(connection):
+        AppointmentArchive.__table__.create(bind=connection, checkfirst=True)
@@ -0,0 +1,22 @@
+"""
+Registro dos números de agendamento (appointment_numbers)
+
+Cria a tabela e a preenche com os números existentes em appointment e
+appointment_archive. A partir daqui generate_appointment_number() reserva cada número
+novo nesse registro, cuja chave primária (company_id, appointment_number) mantém a
+unicidade por company que a constraint da tabela particionada deixou de garantir.
+"""
+from sqlalchemy import text
+from src.models.appointment_number import AppointmentNumber
+
+DESCRIPTION = 'Cria appointment_numbers com os números de agendamento existentes'
+
+
+def upgrade(connection):
+    AppointmentNumber.__table__.create(bind=connection, checkfirst=True)
+    connection.execute(text(
+        'INSERT INTO appointment_numbers (company_id, appointment_number) '
+        'SELECT company_id, appointment_number FROM appointment WHERE appointment_number IS NOT NULL '
+        'UNION '
+        'SELECT company_id, appointment_number FROM appointment_archive WHERE appointment_number IS NOT NULL'
+    ))
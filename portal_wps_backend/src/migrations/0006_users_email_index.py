@@ -0,0 +1,16 @@
+"""
+Índice funcional do login por e-mail
+
+users (lower(email), company_id): busca de usuário por e-mail sem diferenciar
+maiúsculas/minúsculas (User.find_by_email). Antes das migrações era criado na
+inicialização da aplicação; bancos existentes não o recebiam pela migração inicial.
+Criado com CONCURRENTLY no PostgreSQL para não bloquear logins durante o deploy.
+"""
+from src.utils.migrations import create_index
+
+DESCRIPTION = 'Índice de users por lower(email) e company_id'
+TRANSACTIONAL = False
+
+
+def upgrade(connection):
+    create_index(connection, 'ix_users_email_lower_company', 'users', 'lower(email), company_id')
@@ -0,0 +1,33 @@
+"""
+Normalização dos e-mails de usuários já cadastrados
+
+A partir daqui o modelo grava o e-mail sem espaços e em minúsculas (User.normalize_email);
+esta migração aplica o mesmo aos usuários existentes. Quando dois usuários da mesma company
+só diferem por maiúsculas/espaços, a normalização violaria uq_user_email_company: esses
+ficam como estão e são listados no log para revisão manual.
+"""
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+DESCRIPTION = 'Normaliza users.email (sem espaços e em minúsculas)'
+
+_NORMALIZED = 'lower(trim({alias}.email))'
+_CONFLICT = (
+    'EXISTS (SELECT 1 FROM users other WHERE other.company_id = users.company_id '
+    f'AND other.id <> users.id AND {_NORMALIZED.format(alias="other")} = {_NORMALIZED.format(alias="users")})'
+)
+
+
+def upgrade(connection):
+    pending = f'users.email <> {_NORMALIZED.format(alias="users")}'
+    conflicts = connection.execute(text(
+        f'SELECT id, company_id, email FROM users WHERE {pending} AND {_CONFLICT} ORDER BY id'
+    )).all()
+    for user_id, company_id, email in conflicts:
+        logger.warning(f"[migrations] E-mail do usuário {user_id} (company {company_id}) não normalizado: "
+                       f"'{email}' conflita com outro usuário da company")
+    connection.execute(text(
+        f'UPDATE users SET email = {_NORMALIZED.format(alias="users")} WHERE {pending} AND NOT {_CONFLICT}'
+    ))
@@ -0,0 +1 @@
+"""Migrações versionadas do banco de dados (aplicadas por src.utils.migrations)"""
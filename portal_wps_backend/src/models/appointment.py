@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.user import db
+from src.utils.server_timing import timed_phase
 
 class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -30,11 +31,20 @@ class Appointment(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Constraint único: appointment_number deve ser único por company (se não for NULL)
-    __table_args__ = (db.UniqueConstraint('appointment_number', 'company_id', name='uq_appointment_number_company'),)
+    # No PostgreSQL a tabela é particionada por mês em date (migração 0004), e toda constraint
+    # única precisa incluir a coluna de partição. A unicidade por company (inclusive após
+    # reagendamento e arquivamento) é garantida pelo registro appointment_numbers (migração 0005).
+    # Índices das consultas por planta/data (grade de horários, capacidade) e por fornecedor/data
+    __table_args__ = (
+        db.UniqueConstraint('appointment_number', 'company_id', 'date', name='uq_appointment_number_company'),
+        db.Index('ix_appointment_company_plant_date_time', 'company_id', 'plant_id', 'date', 'time'),
+        db.Index('ix_appointment_supplier_date', 'supplier_id', 'date'),
+    )
 
     def __repr__(self):
         return f'<Appointment {self.purchase_order} - {self.date} {self.time}>'
 
+    @timed_phase('serialize')
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,36 @@
+from src.models.user import db
+
+class AppointmentArchive(db.Model):
+    """
+    Agendamentos antigos arquivados (python manage.py archive-appointments)
+
+    Mesmas colunas, na mesma ordem, da tabela appointment: no PostgreSQL as partições
+    mensais desanexadas de appointment são anexadas diretamente a esta tabela. Sem chaves
+    estrangeiras nem constraints únicas; os relatórios leem appointment + arquivo.
+    """
+    __tablename__ = 'appointment_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointment_number = db.Column(db.String(50), nullable=True)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    time_end = db.Column(db.Time, nullable=True)
+    purchase_order = db.Column(db.String(100), nullable=False)
+    truck_plate = db.Column(db.String(20), nullable=False)
+    driver_name = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    motivo_reagendamento = db.Column(db.String(500), nullable=True)
+    check_in_time = db.Column(db.DateTime, nullable=True)
+    check_out_time = db.Column(db.DateTime, nullable=True)
+    company_id = db.Column(db.Integer, nullable=False)
+    supplier_id = db.Column(db.Integer, nullable=False)
+    plant_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_appointment_archive_company_date', 'company_id', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<AppointmentArchive {self.purchase_order} - {self.date} {self.time}>'
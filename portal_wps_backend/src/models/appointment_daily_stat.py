@@ -0,0 +1,33 @@
+from src.models.user import db
+
+class AppointmentDailyStat(db.Model):
+    """Agregado diário de agendamentos por planta, fornecedor e status (mantido a cada escrita de Appointment)"""
+    __tablename__ = 'appointment_daily_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, nullable=False)
+    plant_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = agendamento sem planta
+    supplier_id = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)  # Quantidade de agendamentos
+    booked_minutes = db.Column(db.Integer, nullable=False, default=0)  # Soma da duração dos agendamentos
+
+    __table_args__ = (
+        db.UniqueConstraint('company_id', 'plant_id', 'supplier_id', 'date', 'status', name='uq_appointment_daily_stats_key'),
+        db.Index('ix_appointment_daily_stats_company_date', 'company_id', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<AppointmentDailyStat {self.date} plant={self.plant_id} {self.status}={self.count}>'
+
+    def to_dict(self):
+        return {
+            'company_id': self.company_id,
+            'plant_id': self.plant_id or None,
+            'supplier_id': self.supplier_id,
+            'date': self.date.isoformat() if self.date else None,
+            'status': self.status,
+            'count': self.count,
+            'booked_minutes': self.booked_minutes
+        }
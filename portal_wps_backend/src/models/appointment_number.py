@@ -0,0 +1,18 @@
+from src.models.user import db
+
+class AppointmentNumber(db.Model):
+    """
+    Números de agendamento já emitidos, por company
+
+    Tabela não particionada: a constraint única de appointment precisa incluir date (a
+    coluna de partição) e não alcança appointment_archive. A chave primária deste registro
+    garante que um número não se repete na company, mesmo após reagendamento para outra
+    data ou arquivamento. O número não é liberado quando o agendamento é excluído.
+    """
+    __tablename__ = 'appointment_numbers'
+
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), primary_key=True)
+    appointment_number = db.Column(db.String(50), primary_key=True)
+
+    def __repr__(self):
+        return f'<AppointmentNumber {self.company_id} {self.appointment_number}>'
@@ -0,0 +1,24 @@
+from datetime import datetime
+from src.models.user import db
+
+class CacheInvalidationEvent(db.Model):
+    """Eventos de invalidação de cache lidos pelos workers no modo de polling do barramento"""
+    __tablename__ = 'cache_invalidation_events'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # Ex: 'plant', 'supplier', 'system_config'
+    company_id = db.Column(db.Integer, nullable=True)  # NULL = global
+    entity_id = db.Column(db.String(100), nullable=True)  # NULL = todas as entradas da entidade
+    origin = db.Column(db.String(50), nullable=True)  # Worker que publicou o evento
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<CacheInvalidationEvent {self.entity} {self.company_id} {self.entity_id}>'
+
+    def to_dict(self):
+        return {
+            'entity': self.entity,
+            'company_id': self.company_id,
+            'id': self.entity_id,
+            'origin': self.origin
+        }
@@ -13,6 +13,10 @@ class DefaultSchedule(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_default_schedules_plant_day', 'plant_id', 'day_of_week'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
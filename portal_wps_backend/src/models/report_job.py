@@ -0,0 +1,40 @@
+import json
+import uuid
+from datetime import datetime
+from src.models.user import db
+
+class ReportJob(db.Model):
+    """Relatório gerado em segundo plano (consultado pelo cliente até a conclusão)"""
+    __tablename__ = 'report_jobs'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    company_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    report_type = db.Column(db.String(50), nullable=False)  # Ex: 'dashboard-summary', 'plant-stats'
+    params = db.Column(db.Text, nullable=True)  # Parâmetros do relatório (JSON)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    result = db.Column(db.Text, nullable=True)  # Resultado (JSON) quando status = done
+    error = db.Column(db.Text, nullable=True)  # Mensagem de erro quando status = failed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_report_jobs_company_status', 'company_id', 'status'),
+        db.Index('ix_report_jobs_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.report_type} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report_type': self.report_type,
+            'params': json.loads(self.params) if self.params else {},
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -13,6 +13,10 @@ class ScheduleConfig(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_schedule_configs_plant_date', 'plant_id', 'date'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -1,5 +1,11 @@
 from src.models.user import db
 from datetime import datetime
+from sqlalchemy import or_
+from src.utils.cache import get_cache
+from src.utils.cache_bus import register_invalidation_handler
+
+# Namespace do cache com as configurações resolvidas por company
+CONFIG_CACHE_NAMESPACE = 'system_config'
 
 class SystemConfig(db.Model):
     __tablename__ = 'system_configs'
@@ -30,24 +36,61 @@ class SystemConfig(db.Model):
         }
     
     @staticmethod
-    def get_value(key, company_id=None, default=None):
+    def get_config_map(company_id=None):
+        """Retorna todas as configurações efetivas da company (globais sobrescritas pelas da company)
+        Carrega as configurações globais e as da company em uma única consulta e mantém o
+        resultado em cache até a próxima alteração.
+
+        Returns:
+            dict: key -> to_dict() da configuração efetiva
+        """
+        def load():
+            query = SystemConfig.query
+            if company_id is not None:
+                query = query.filter(or_(SystemConfig.company_id == company_id, SystemConfig.company_id.is_(None)))
+            else:
+                query = query.filter(SystemConfig.company_id.is_(None))
+
+            configs = {}
+            # Globais primeiro, para que as da company as sobrescrevam
+            for config in sorted(query.all(), key=lambda c: c.company_id is not None):
+                configs[config.key] = config.to_dict()
+            return configs
+
+        return get_cache().get_or_load(CONFIG_CACHE_NAMESPACE, company_id or 'global', load)
+
+    @staticmethod
+    def get_config(key, company_id=None):
+        """Retorna a configuração efetiva (to_dict) ou None"""
+        return SystemConfig.get_config_map(company_id).get(key)
+
+    @staticmethod
+    def get_value(key, company_id=None, default=None, cast=None):
         """Retorna o valor de uma configuração ou o valor padrão
         Se company_id for fornecido, busca configuração específica da empresa.
         Se não encontrar, busca configuração global (company_id=NULL).
+        Se cast for fornecido (ex: int), converte o valor; valores inválidos retornam o padrão.
         """
-        # Primeiro tenta buscar configuração específica da company
-        if company_id is not None:
-            config = SystemConfig.query.filter_by(key=key, company_id=company_id).first()
-            if config:
-                return config.value
-        
-        # Se não encontrou específica, busca global
-        config = SystemConfig.query.filter_by(key=key, company_id=None).first()
-        if config:
-            return config.value
-        
-        return default
-    
+        config = SystemConfig.get_config(key, company_id)
+        if config is None:
+            return default
+        if cast is None:
+            return config['value']
+        try:
+            if cast is bool:
+                return config['value'].strip().lower() in ('1', 'true', 'yes', 'sim')
+            return cast(config['value'])
+        except (ValueError, TypeError):
+            return default
+
+    @staticmethod
+    def invalidate_cache(company_id=None, key=None):
+        """Remove as configurações em cache (company_id=None: configuração global, afeta todas as companies)"""
+        if company_id is None:
+            get_cache().bump_namespace(CONFIG_CACHE_NAMESPACE)
+        else:
+            get_cache().delete(CONFIG_CACHE_NAMESPACE, company_id)
+
     @staticmethod
     def set_value(key, value, company_id=None, description=None):
         """Define ou atualiza o valor de uma configuração
@@ -69,6 +112,11 @@ class SystemConfig(db.Model):
             )
             db.session.add(config)
         db.session.commit()
+        SystemConfig.invalidate_cache(company_id)
         return config
 
 
+# Alterações feitas por outros workers (ou por rotas que editam SystemConfig diretamente)
+register_invalidation_handler('system_config', SystemConfig.invalidate_cache)
+
+
@@ -1,8 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import validates
+from src.utils.password_hashing import hash_password
+from src.utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession envia leituras para a réplica quando DATABASE_READ_URL está configurada
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     """Modelo para representar um usuário do sistema"""
@@ -29,14 +34,24 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Constraint único: email deve ser único por company
-    __table_args__ = (db.UniqueConstraint('email', 'company_id', name='uq_user_email_company'),)
+    # Índice funcional lower(email): login e recuperação de senha buscam o e-mail em todas as companies
+    # sem diferenciar maiúsculas/minúsculas; company_id como segunda coluna atende as buscas por company
+    __table_args__ = (
+        db.UniqueConstraint('email', 'company_id', name='uq_user_email_company'),
+        db.Index('ix_users_email_lower_company', func.lower(email), company_id),
+    )
 
     def __repr__(self):
         return f'<User {self.email}>'
 
+    @validates('email')
+    def _validate_email(self, key, email):
+        """Grava o e-mail normalizado em toda criação e alteração (o mesmo valor buscado por find_by_email)"""
+        return User.normalize_email(email)
+
     def set_password(self, password):
-        """Define a senha do usuário com hash"""
-        self.password_hash = generate_password_hash(password)
+        """Define a senha do usuário com hash (método configurado em PASSWORD_HASH_METHOD)"""
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Verifica se a senha está correta"""
@@ -49,6 +64,23 @@ class User(db.Model):
             # Isso pode acontecer se o password_hash estiver vazio ou corrompido
             return False
 
+    @staticmethod
+    def normalize_email(email):
+        """Normaliza o e-mail para comparação (sem espaços e em minúsculas)"""
+        return email.strip().lower() if email else email
+
+    @staticmethod
+    def find_by_email(email, company_id=None):
+        """Busca usuário pelo e-mail sem diferenciar maiúsculas/minúsculas (usa ix_users_email_lower_company)
+        Se company_id for fornecido, restringe a busca à company.
+        """
+        if not email:
+            return None
+        query = User.query.filter(func.lower(User.email) == User.normalize_email(email))
+        if company_id is not None:
+            query = query.filter(User.company_id == company_id)
+        return query.first()
+
     def to_dict(self):
         return {
             'id': self.id,
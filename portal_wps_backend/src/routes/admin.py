@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from datetime import datetime, timedelta, time
 from sqlalchemy import func, or_, and_
 from sqlalchemy.exc import IntegrityError
@@ -6,9 +6,24 @@ from src.models.user import User, db
 from src.models.supplier import Supplier
 from src.models.appointment import Appointment
 from src.models.plant import Plant
+from src.models.report_job import ReportJob
 from src.routes.auth import admin_required
 from src.utils.helpers import generate_temp_password, generate_appointment_number
 from src.utils.permissions import permission_required
+from src.utils.rate_limit import rate_limit, admission_control
+from src.utils.plant_cache import get_plant_descriptor, invalidate_plant_descriptor
+from src.utils.reports import (
+    build_dashboard_summary, build_plant_stats, build_supplier_stats,
+    get_dwell_time_stats, get_punctuality_stats, build_occupancy_heatmap, build_week_overview
+)
+from src.utils.report_cache import cached_report
+from src.utils.report_jobs import validate_job_request, submit_report_job
+from src.utils.db_routing import use_primary
+from src.utils.server_timing import timed, timed_phase
+from src.utils.forecast import build_demand_forecast
+from src.utils.appointment_archive import appointment_source
+import io
+import csv
 import logging
 
 logger = logging.getLogger(__name__)
@@ -72,6 +87,7 @@ def get_time_slots_in_range(start_time, end_time):
     
     return slots
 
+@timed_phase('capacity')
 def validate_time_range_capacity(date, start_time, end_time, max_capacity, plant_id=None, company_id=None, exclude_appointment_id=None):
     """
     Valida se todos os slots de 1 hora dentro do intervalo respeitam a capacidade máxima.
@@ -177,10 +193,7 @@ def create_supplier(current_user):
             return jsonify({'error': 'Já existe um fornecedor com este nome nesta empresa'}), 400
         
         # Verificar se email já existe na mesma company
-        existing_user = User.query.filter_by(
-            email=data['email'],
-            company_id=current_user.company_id
-        ).first()
+        existing_user = User.find_by_email(data['email'], company_id=current_user.company_id)
         if existing_user:
             return jsonify({'error': 'Email já cadastrado nesta empresa'}), 400
         
@@ -222,8 +235,141 @@ def create_supplier(current_user):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Colunas da exportação CSV de agendamentos
+EXPORT_CSV_HEADERS = [
+    'Número', 'Data', 'Horário', 'Horário Final', 'Status', 'Pedido de Compra', 'Placa',
+    'Motorista', 'Fornecedor', 'CNPJ Fornecedor', 'Planta', 'Check-in (UTC)', 'Check-out (UTC)',
+    'Motivo Reagendamento'
+]
+EXPORT_STATUS_LABELS = {
+    'scheduled': 'Agendado',
+    'checked_in': 'Check-in',
+    'checked_out': 'Finalizado',
+    'rescheduled': 'Reagendado'
+}
+# Linhas lidas do cursor do banco e enviadas ao cliente por bloco
+EXPORT_CSV_BATCH_SIZE = 2000
+# Última linha de uma exportação interrompida por erro
+EXPORT_CSV_ERROR_MARKER = '# ERRO: exportação interrompida - arquivo incompleto\r\n'
+
+@admin_bp.route('/appointments/export.csv', methods=['GET'])
+@admin_required
+@rate_limit('appointments_export', user='5/minute', company='20/minute')
+def export_appointments_csv(current_user):
+    """
+    Exporta agendamentos em CSV (start, end, plant_id e supplier_id opcionais)
+    
+    As linhas são lidas com cursor no servidor e enviadas em blocos conforme são
+    geradas, então a memória usada não depende do tamanho do período. Agendamentos
+    movidos para appointment_archive entram na exportação quando o período os alcança.
+    Um erro no meio da transmissão grava uma linha final de erro e interrompe a resposta,
+    para que o arquivo não pareça completo.
+    """
+    try:
+        start_str = request.args.get('start') or request.args.get('start_date')
+        end_str = request.args.get('end') or request.args.get('end_date')
+        plant_id = request.args.get('plant_id', type=int)
+        supplier_id = request.args.get('supplier_id', type=int)
+        
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else None
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else None
+        except ValueError:
+            return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
+        
+        # Agendamentos ativos + arquivados (quando há arquivados a partir de start)
+        source = appointment_source(current_user.company_id, start_date)
+        query = db.session.query(
+            source.appointment_number, source.date, source.time, source.time_end,
+            source.status, source.purchase_order, source.truck_plate, source.driver_name,
+            Supplier.description, Supplier.cnpj, Plant.name,
+            source.check_in_time, source.check_out_time, source.motivo_reagendamento
+        ).join(
+            Supplier, source.supplier_id == Supplier.id
+        ).outerjoin(
+            Plant, source.plant_id == Plant.id
+        ).filter(
+            source.company_id == current_user.company_id
+        )
+        if start_date:
+            query = query.filter(source.date >= start_date)
+        if end_date:
+            query = query.filter(source.date <= end_date)
+        if plant_id is not None:
+            query = query.filter(source.plant_id == plant_id)
+        if supplier_id is not None:
+            query = query.filter(source.supplier_id == supplier_id)
+        
+        # yield_per: cursor no servidor (PostgreSQL), lido em lotes em vez de carregar tudo
+        query = query.order_by(
+            source.date, source.time, source.id
+        ).execution_options(yield_per=EXPORT_CSV_BATCH_SIZE)
+        
+        def format_date(value):
+            return value.strftime('%d/%m/%Y') if value else ''
+        
+        def format_time(value):
+            return value.strftime('%H:%M') if value else ''
+        
+        def format_datetime(value):
+            return value.strftime('%d/%m/%Y %H:%M') if value else ''
+        
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # BOM para o Excel reconhecer UTF-8 (mesmo formato das exportações do frontend)
+            buffer.write('\ufeff')
+            writer.writerow(EXPORT_CSV_HEADERS)
+            
+            rows = 0
+            try:
+                for row in query:
+                    writer.writerow([
+                        row.appointment_number or '',
+                        format_date(row.date),
+                        format_time(row.time),
+                        format_time(row.time_end),
+                        EXPORT_STATUS_LABELS.get(row.status, row.status),
+                        row.purchase_order,
+                        row.truck_plate,
+                        row.driver_name,
+                        row.description,
+                        row.cnpj,
+                        row.name or '',
+                        format_datetime(row.check_in_time),
+                        format_datetime(row.check_out_time),
+                        row.motivo_reagendamento or ''
+                    ])
+                    rows += 1
+                    if rows % EXPORT_CSV_BATCH_SIZE == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate(0)
+            except Exception as e:
+                logger.error(f"[export] Exportação interrompida após {rows} agendamentos: {e}", exc_info=True)
+                # O status 200 já foi enviado: marca o arquivo como incompleto e interrompe a
+                # resposta (sem o bloco final do chunked, o cliente vê o download falhar)
+                buffer.write(EXPORT_CSV_ERROR_MARKER)
+                yield buffer.getvalue()
+                raise
+            
+            yield buffer.getvalue()
+            logger.info(f"[export] {rows} agendamentos exportados em CSV (company {current_user.company_id})")
+        
+        filename = f"agendamentos_{start_str or 'inicio'}_{end_str or 'fim'}.csv"
+        response = Response(stream_with_context(generate()), mimetype='text/csv')
+        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Erro ao exportar agendamentos: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/appointments', methods=['GET', 'POST'])
 @admin_required
+@rate_limit('appointments', methods=('POST',), user='30/minute', company='300/minute')
+@admission_control(methods=('POST',))
 def manage_appointments(current_user):
     """Gerencia agendamentos: GET para listar, POST para criar"""
     
@@ -404,15 +550,12 @@ def manage_appointments(current_user):
                 return jsonify({'error': error_msg}), 400
             
             # Verificar se a planta existe e pertence à mesma company
-            plant = Plant.query.filter_by(
-                id=plant_id,
-                company_id=current_user.company_id
-            ).first()
+            plant = get_plant_descriptor(plant_id, current_user.company_id)
             if not plant:
                 return jsonify({'error': 'Planta não encontrada'}), 404
             
             # Usar capacidade máxima da planta (padrão: 1 se não configurado)
-            max_capacity = plant.max_capacity if plant.max_capacity else 1
+            max_capacity = plant['max_capacity']
             
             # Validar capacidade para todos os slots do intervalo
             if appointment_time_end:
@@ -439,25 +582,26 @@ def manage_appointments(current_user):
                 # 1. Agendamentos antigos (sem time_end) que começam neste horário
                 # 2. Agendamentos com intervalo que incluem este horário
                 # Multi-tenant: filtrar por company_id
-                total_count = Appointment.query.filter(
-                    Appointment.date == appointment_date,
-                    Appointment.plant_id == plant_id,
-                    Appointment.company_id == current_user.company_id
-                ).filter(
-                    or_(
-                        # Agendamento antigo que começa neste horário
-                        and_(
-                            Appointment.time == appointment_time,
-                            Appointment.time_end.is_(None)
-                        ),
-                        # Agendamento com intervalo que inclui este horário
-                        and_(
-                            Appointment.time <= appointment_time,
-                            Appointment.time_end.isnot(None),
-                            Appointment.time_end > appointment_time
+                with timed('capacity'):
+                    total_count = Appointment.query.filter(
+                        Appointment.date == appointment_date,
+                        Appointment.plant_id == plant_id,
+                        Appointment.company_id == current_user.company_id
+                    ).filter(
+                        or_(
+                            # Agendamento antigo que começa neste horário
+                            and_(
+                                Appointment.time == appointment_time,
+                                Appointment.time_end.is_(None)
+                            ),
+                            # Agendamento com intervalo que inclui este horário
+                            and_(
+                                Appointment.time <= appointment_time,
+                                Appointment.time_end.isnot(None),
+                                Appointment.time_end > appointment_time
+                            )
                         )
-                    )
-                ).count()
+                    ).count()
                 
                 if total_count >= max_capacity:
                     return jsonify({
@@ -465,7 +609,7 @@ def manage_appointments(current_user):
                     }), 409
             
             # Gerar número único do agendamento
-            appointment_number = generate_appointment_number(appointment_date)
+            appointment_number = generate_appointment_number(current_user.company_id, appointment_date)
             
             # Criar agendamento
             appointment = Appointment(
@@ -1565,12 +1709,12 @@ def get_max_capacity(current_user):
     try:
         from src.models.system_config import SystemConfig
         
-        config = SystemConfig.query.filter_by(key='max_capacity_per_slot').first()
+        config = SystemConfig.get_config('max_capacity_per_slot', current_user.company_id)
         
         if config:
             return jsonify({
-                'max_capacity': int(config.value),
-                'config': config.to_dict(),
+                'max_capacity': int(config['value']),
+                'config': config,
                 'deprecated': True,
                 'message': 'Esta rota está depreciada. Use /plants/<plant_id>/max-capacity'
             }), 200
@@ -1666,6 +1810,7 @@ def set_plant_max_capacity(current_user, plant_id):
         plant.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_plant_descriptor(plant.id)
         
         return jsonify({
             'message': 'Capacidade máxima da planta atualizada com sucesso',
@@ -1784,10 +1929,7 @@ def create_plant(current_user):
             }), 400
         
         # Verificar se email já existe na mesma company
-        existing_user = User.query.filter_by(
-            email=data['email'],
-            company_id=current_user.company_id
-        ).first()
+        existing_user = User.find_by_email(data['email'], company_id=current_user.company_id)
         if existing_user:
             # Se o usuário existe e está ativo OU tem uma planta associada ativa, não permitir
             if existing_user.is_active:
@@ -1843,6 +1985,7 @@ def create_plant(current_user):
         db.session.add(user)
         
         db.session.commit()
+        invalidate_plant_descriptor(plant.id)
         
         # Log para verificar o que está sendo retornado
         plant_dict = plant.to_dict()
@@ -2043,6 +2186,7 @@ def update_plant(current_user, plant_id):
         plant.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_plant_descriptor(plant_id)
         
         return jsonify({
             'message': 'Planta atualizada com sucesso',
@@ -2238,6 +2382,7 @@ def save_operating_hours_by_plant(current_user, plant_id):
                     return jsonify({'error': 'Formato de horário inválido para feriados'}), 400
         
         db.session.commit()
+        invalidate_plant_descriptor(plant_id)
         
         return jsonify({
             'message': 'Horários de funcionamento salvos com sucesso',
@@ -2267,16 +2412,8 @@ def delete_plant(current_user, plant_id):
         # Buscar usuário com mesmo email da planta (independente de plant_id)
         user_to_delete = None
         if plant.email:
-            plant_email_clean = plant.email.strip().lower()
-            
-            # Buscar usuário com email correspondente (case-insensitive)
-            users_with_email = User.query.filter(User.email.isnot(None)).all()
-            
-            for user in users_with_email:
-                user_email_clean = user.email.strip().lower() if user.email else None
-                if user_email_clean == plant_email_clean:
-                    user_to_delete = user
-                    break
+            # Buscar usuário com email correspondente (case-insensitive) na company da planta
+            user_to_delete = User.find_by_email(plant.email, company_id=plant.company_id)
         
         # Buscar TODOS os usuários vinculados à planta pelo plant_id
         # IMPORTANTE: Precisamos remover o vínculo de TODOS antes de deletar a planta
@@ -2313,6 +2450,7 @@ def delete_plant(current_user, plant_id):
         # Agora podemos deletar a planta com segurança (todos os vínculos foram removidos)
         db.session.delete(plant)
         db.session.commit()
+        invalidate_plant_descriptor(plant_id)
         
         deleted_count = 1 if user_to_delete else 0
         inactivated_count = len(users_to_inactivate)
@@ -2655,7 +2793,7 @@ def create_user(current_user):
             return jsonify({'error': f'Role inválido. Deve ser um de: {", ".join(valid_roles)}'}), 400
         
         # Verificar se email já existe
-        existing_user = User.query.filter_by(email=data['email']).first()
+        existing_user = User.find_by_email(data['email'])
         if existing_user:
             return jsonify({'error': 'Email já cadastrado'}), 400
         
@@ -2723,11 +2861,8 @@ def update_user(current_user, user_id):
         data = request.get_json()
         
         # Atualizar email (se fornecido e diferente)
-        if 'email' in data and data['email'] != user.email:
-            existing_user = User.query.filter_by(
-                email=data['email'],
-                company_id=current_user.company_id
-            ).first()
+        if 'email' in data and User.normalize_email(data['email']) != user.email:
+            existing_user = User.find_by_email(data['email'], company_id=current_user.company_id)
             if existing_user and existing_user.id != user_id:
                 return jsonify({'error': 'Email já cadastrado nesta empresa'}), 400
             user.email = data['email']
@@ -3178,8 +3313,45 @@ def debug_permissions(current_user):
         logger.error(f"Erro ao debugar permissões: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/overview', methods=['GET'])
+@admin_required
+@cached_report
+def get_week_overview(current_user):
+    """
+    Visão geral da semana: matriz plantas x dias com agendados, capacidade, check-ins
+    e não comparecimentos
+    
+    Parâmetro week: primeiro dia da semana (YYYY-MM-DD). Padrão: segunda-feira da semana atual.
+    """
+    try:
+        week_start = request.args.get('week')
+        today = datetime.now().date()
+        
+        if week_start:
+            try:
+                start_date = datetime.strptime(week_start, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
+        else:
+            start_date = today - timedelta(days=today.weekday())
+        
+        overview = build_week_overview(current_user.company_id, start_date, today)
+        
+        return jsonify({
+            **overview,
+            'week': {
+                'start_date': start_date.isoformat(),
+                'end_date': (start_date + timedelta(days=6)).isoformat()
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar visão geral da semana: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/reports/dashboard-summary', methods=['GET'])
 @admin_required
+@cached_report
 def get_dashboard_summary(current_user):
     """Retorna resumo geral para o dashboard de relatórios"""
     try:
@@ -3194,71 +3366,11 @@ def get_dashboard_summary(current_user):
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        # Total de agendamentos no período
-        total_appointments = Appointment.query.filter(
-            Appointment.company_id == current_user.company_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).count()
-        
-        # Agendamentos por status
-        appointments_by_status = db.session.query(
-            Appointment.status,
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.company_id == current_user.company_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(Appointment.status).all()
-        
-        status_counts = {status: count for status, count in appointments_by_status}
-        
-        # Total de fornecedores ativos
-        active_suppliers = Supplier.query.filter_by(
-            company_id=current_user.company_id,
-            is_active=True,
-            is_deleted=False
-        ).count()
-        
-        # Total de plantas ativas
-        active_plants = Plant.query.filter_by(
-            company_id=current_user.company_id,
-            is_active=True
-        ).count()
-        
-        # Taxa de ocupação média (agendamentos confirmados / capacidade total)
-        # Calcular para cada planta e fazer média
-        plants = Plant.query.filter_by(
-            company_id=current_user.company_id,
-            is_active=True
-        ).all()
-        
-        occupation_rates = []
-        for plant in plants:
-            plant_appointments = Appointment.query.filter(
-                Appointment.plant_id == plant.id,
-                Appointment.date >= start_date,
-                Appointment.date <= end_date,
-                Appointment.status.in_(['scheduled', 'checked_in', 'checked_out'])
-            ).count()
-            
-            # Calcular dias úteis no período
-            days_in_period = (end_date - start_date).days + 1
-            max_capacity = plant.max_capacity or 1
-            total_slots = days_in_period * max_capacity
-            
-            if total_slots > 0:
-                rate = (plant_appointments / total_slots) * 100
-                occupation_rates.append(rate)
-        
-        avg_occupation_rate = sum(occupation_rates) / len(occupation_rates) if occupation_rates else 0
+        # Resumo completo (status, plantas, fornecedores e ocupação) em uma única consulta
+        summary = build_dashboard_summary(current_user.company_id, start_date, end_date)
         
         return jsonify({
-            'total_appointments': total_appointments,
-            'appointments_by_status': status_counts,
-            'active_suppliers': active_suppliers,
-            'active_plants': active_plants,
-            'average_occupation_rate': round(avg_occupation_rate, 2),
+            **summary,
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
@@ -3271,6 +3383,7 @@ def get_dashboard_summary(current_user):
 
 @admin_bp.route('/reports/plant-stats', methods=['GET'])
 @admin_required
+@cached_report
 def get_plant_stats(current_user):
     """Retorna estatísticas de uma planta específica"""
     try:
@@ -3298,73 +3411,7 @@ def get_plant_stats(current_user):
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        # Agendamentos da planta no período
-        appointments = Appointment.query.filter(
-            Appointment.plant_id == plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).all()
-        
-        total_appointments = len(appointments)
-        
-        # Agendamentos por status
-        status_counts = {}
-        for apt in appointments:
-            status_counts[apt.status] = status_counts.get(apt.status, 0) + 1
-        
-        # Agendamentos por dia
-        appointments_by_date = db.session.query(
-            Appointment.date,
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.plant_id == plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(Appointment.date).order_by(Appointment.date).all()
-        
-        daily_data = [{'date': date.isoformat(), 'count': count} for date, count in appointments_by_date]
-        
-        # Taxa de ocupação por dia
-        days_in_period = (end_date - start_date).days + 1
-        max_capacity = plant.max_capacity or 1
-        total_slots = days_in_period * max_capacity
-        
-        confirmed_appointments = sum(1 for apt in appointments if apt.status in ['scheduled', 'checked_in', 'checked_out'])
-        occupation_rate = (confirmed_appointments / total_slots * 100) if total_slots > 0 else 0
-        
-        # Top fornecedores (mais agendamentos)
-        supplier_counts = db.session.query(
-            Appointment.supplier_id,
-            Supplier.description,
-            func.count(Appointment.id).label('count')
-        ).join(
-            Supplier, Appointment.supplier_id == Supplier.id
-        ).filter(
-            Appointment.plant_id == plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(
-            Appointment.supplier_id, Supplier.description
-        ).order_by(func.count(Appointment.id).desc()).limit(10).all()
-        
-        top_suppliers = [{'supplier_id': sid, 'supplier_name': name, 'count': count} for sid, name, count in supplier_counts]
-        
-        return jsonify({
-            'plant': {
-                'id': plant.id,
-                'name': plant.name,
-                'max_capacity': plant.max_capacity
-            },
-            'total_appointments': total_appointments,
-            'appointments_by_status': status_counts,
-            'daily_appointments': daily_data,
-            'occupation_rate': round(occupation_rate, 2),
-            'top_suppliers': top_suppliers,
-            'period': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            }
-        }), 200
+        return jsonify(build_plant_stats(current_user.company_id, plant, start_date, end_date)), 200
         
     except Exception as e:
         logger.error(f"Erro ao gerar estatísticas da planta: {str(e)}", exc_info=True)
@@ -3372,6 +3419,7 @@ def get_plant_stats(current_user):
 
 @admin_bp.route('/reports/supplier-stats', methods=['GET'])
 @admin_required
+@cached_report
 def get_supplier_stats(current_user):
     """Retorna estatísticas de um fornecedor específico"""
     try:
@@ -3399,63 +3447,44 @@ def get_supplier_stats(current_user):
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        # Agendamentos do fornecedor no período
-        appointments = Appointment.query.filter(
-            Appointment.supplier_id == supplier_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).all()
+        return jsonify(build_supplier_stats(current_user.company_id, supplier, start_date, end_date)), 200
         
-        total_appointments = len(appointments)
+    except Exception as e:
+        logger.error(f"Erro ao gerar estatísticas do fornecedor: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/reports/dwell-time', methods=['GET'])
+@admin_required
+@cached_report
+def get_dwell_time_report(current_user):
+    """Retorna o tempo de permanência (check-in até check-out) por planta ou fornecedor"""
+    try:
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        group_by = request.args.get('group_by', 'plant')
+        plant_id = request.args.get('plant_id', type=int)
+        supplier_id = request.args.get('supplier_id', type=int)
         
-        # Agendamentos por status
-        status_counts = {}
-        for apt in appointments:
-            status_counts[apt.status] = status_counts.get(apt.status, 0) + 1
+        if group_by not in ('plant', 'supplier'):
+            return jsonify({'error': "group_by deve ser 'plant' ou 'supplier'"}), 400
         
-        # Agendamentos por dia
-        appointments_by_date = db.session.query(
-            Appointment.date,
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.supplier_id == supplier_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(Appointment.date).order_by(Appointment.date).all()
-        
-        daily_data = [{'date': date.isoformat(), 'count': count} for date, count in appointments_by_date]
-        
-        # Taxa de comparecimento (checked_in + checked_out / total)
-        confirmed = sum(1 for apt in appointments if apt.status in ['checked_in', 'checked_out'])
-        attendance_rate = (confirmed / total_appointments * 100) if total_appointments > 0 else 0
-        
-        # Top plantas (mais agendamentos)
-        plant_counts = db.session.query(
-            Appointment.plant_id,
-            Plant.name,
-            func.count(Appointment.id).label('count')
-        ).join(
-            Plant, Appointment.plant_id == Plant.id
-        ).filter(
-            Appointment.supplier_id == supplier_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(
-            Appointment.plant_id, Plant.name
-        ).order_by(func.count(Appointment.id).desc()).limit(10).all()
+        # Se não fornecido, usar últimos 30 dias
+        if not start_date_str or not end_date_str:
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=30)
+        else:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        top_plants = [{'plant_id': pid, 'plant_name': name, 'count': count} for pid, name, count in plant_counts]
+        # Média e percentis calculados no banco (percentile_cont), por grupo e no total
+        stats = get_dwell_time_stats(
+            current_user.company_id, start_date, end_date, group_by=group_by,
+            plant_id=plant_id, supplier_id=supplier_id
+        )
         
         return jsonify({
-            'supplier': {
-                'id': supplier.id,
-                'description': supplier.description
-            },
-            'total_appointments': total_appointments,
-            'appointments_by_status': status_counts,
-            'daily_appointments': daily_data,
-            'attendance_rate': round(attendance_rate, 2),
-            'top_plants': top_plants,
+            **stats,
+            'group_by': group_by,
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
@@ -3463,5 +3492,208 @@ def get_supplier_stats(current_user):
         }), 200
         
     except Exception as e:
-        logger.error(f"Erro ao gerar estatísticas do fornecedor: {str(e)}", exc_info=True)
+        logger.error(f"Erro ao gerar relatório de permanência: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/reports/punctuality', methods=['GET'])
+@admin_required
+@cached_report
+def get_punctuality_report(current_user):
+    """Retorna o atraso na chegada (check-in x horário agendado) por planta ou fornecedor"""
+    try:
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        group_by = request.args.get('group_by', 'plant')
+        plant_id = request.args.get('plant_id', type=int)
+        supplier_id = request.args.get('supplier_id', type=int)
+        
+        if group_by not in ('plant', 'supplier'):
+            return jsonify({'error': "group_by deve ser 'plant' ou 'supplier'"}), 400
+        
+        # Se não fornecido, usar últimos 30 dias
+        if not start_date_str or not end_date_str:
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=30)
+        else:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        
+        # Média e percentis calculados no banco (percentile_cont), por grupo e no total
+        stats = get_punctuality_stats(
+            current_user.company_id, start_date, end_date, group_by=group_by,
+            plant_id=plant_id, supplier_id=supplier_id
+        )
+        
+        return jsonify({
+            **stats,
+            'group_by': group_by,
+            'period': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar relatório de pontualidade: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+# Faixas aceitas no mapa de calor (minutos)
+HEATMAP_RESOLUTIONS = (15, 30, 60)
+
+@admin_bp.route('/reports/heatmap', methods=['GET'])
+@admin_required
+@cached_report
+def get_occupancy_heatmap(current_user):
+    """Retorna o mapa de calor (dia da semana x horário) da ocupação de uma planta"""
+    try:
+        plant_id = request.args.get('plant_id', type=int)
+        start_date_str = request.args.get('start') or request.args.get('start_date')
+        end_date_str = request.args.get('end') or request.args.get('end_date')
+        resolution = request.args.get('resolution', 60, type=int)
+        
+        if not plant_id:
+            return jsonify({'error': 'plant_id é obrigatório'}), 400
+        if resolution not in HEATMAP_RESOLUTIONS:
+            return jsonify({'error': f"resolution deve ser um de: {', '.join(str(value) for value in HEATMAP_RESOLUTIONS)}"}), 400
+        
+        # Verificar se a planta pertence à mesma company
+        plant = Plant.query.filter_by(
+            id=plant_id,
+            company_id=current_user.company_id
+        ).first()
+        
+        if not plant:
+            return jsonify({'error': 'Planta não encontrada'}), 404
+        
+        # Se não fornecido, usar últimas 12 semanas
+        if not start_date_str or not end_date_str:
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(weeks=12) + timedelta(days=1)
+        else:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        
+        return jsonify(build_occupancy_heatmap(current_user.company_id, plant, start_date, end_date, resolution)), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar mapa de calor de ocupação: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/reports/forecast', methods=['GET'])
+@admin_required
+@cached_report
+def get_demand_forecast(current_user):
+    """
+    Retorna a previsão de agendamentos por planta (dia e hora) para as próximas semanas
+    
+    Parâmetros: plant_id (opcional; padrão: todas as plantas ativas), weeks (1-12, padrão: 4)
+    e history_weeks (1-52, padrão: 8).
+    """
+    try:
+        plant_id = request.args.get('plant_id', type=int)
+        weeks = request.args.get('weeks', 4, type=int)
+        history_weeks = request.args.get('history_weeks', 8, type=int)
+        
+        if not 1 <= weeks <= 12:
+            return jsonify({'error': 'weeks deve estar entre 1 e 12'}), 400
+        if not 1 <= history_weeks <= 52:
+            return jsonify({'error': 'history_weeks deve estar entre 1 e 52'}), 400
+        
+        if plant_id:
+            plants = Plant.query.filter_by(id=plant_id, company_id=current_user.company_id).all()
+            if not plants:
+                return jsonify({'error': 'Planta não encontrada'}), 404
+        else:
+            plants = Plant.query.filter_by(
+                company_id=current_user.company_id,
+                is_active=True
+            ).order_by(Plant.name).all()
+        
+        forecast = build_demand_forecast(
+            current_user.company_id, plants, datetime.now().date(),
+            weeks=weeks, history_weeks=history_weeks
+        )
+        return jsonify(forecast), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar previsão de demanda: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/reports/jobs', methods=['POST'])
+@admin_required
+@rate_limit('report_jobs', user='10/minute', company='30/minute')
+def create_report_job(current_user):
+    """
+    Cria um relatório em segundo plano
+    
+    Corpo: report_type ('dashboard-summary', 'plant-stats' ou 'supplier-stats') e os
+    parâmetros do relatório (start_date, end_date, plant_id, supplier_id).
+    O status é consultado em /reports/jobs/<id> e o resultado em /reports/jobs/<id>/result.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        report_type = data.get('report_type')
+        
+        params, error = validate_job_request(current_user.company_id, report_type, data)
+        if error:
+            message, status_code = error
+            return jsonify({'error': message}), status_code
+        
+        job, error = submit_report_job(current_user, report_type, params)
+        if error:
+            message, status_code = error
+            response = jsonify({'error': message})
+            if status_code == 503:
+                response.headers['Retry-After'] = '30'
+            return response, status_code
+        
+        return jsonify({
+            **job.to_dict(),
+            'status_url': f'/api/admin/reports/jobs/{job.id}',
+            'result_url': f'/api/admin/reports/jobs/{job.id}/result'
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao criar relatório em segundo plano: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@admin_required
+@use_primary
+def get_report_job(current_user, job_id):
+    """Retorna o status de um relatório em segundo plano"""
+    try:
+        job = ReportJob.query.filter_by(id=job_id, company_id=current_user.company_id).first()
+        if not job:
+            return jsonify({'error': 'Relatório não encontrado'}), 404
+        
+        return jsonify(job.to_dict()), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao consultar relatório em segundo plano: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/reports/jobs/<job_id>/result', methods=['GET'])
+@admin_required
+@use_primary
+def get_report_job_result(current_user, job_id):
+    """Retorna o resultado de um relatório concluído (download=1 para baixar como arquivo)"""
+    try:
+        job = ReportJob.query.filter_by(id=job_id, company_id=current_user.company_id).first()
+        if not job:
+            return jsonify({'error': 'Relatório não encontrado'}), 404
+        
+        if job.status == 'failed':
+            return jsonify({'error': f'Falha ao gerar o relatório: {job.error}', 'status': job.status}), 500
+        if job.status != 'done':
+            return jsonify({'error': 'Relatório ainda não concluído', 'status': job.status}), 409
+        
+        response = current_app.response_class(job.result, status=200, mimetype='application/json')
+        if request.args.get('download', 'false').lower() in ('1', 'true'):
+            response.headers['Content-Disposition'] = f'attachment; filename=relatorio-{job.report_type}-{job.id}.json'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter resultado do relatório: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -4,6 +4,10 @@ from datetime import datetime, timedelta
 from src.models.user import User, db
 from src.models.password_reset_token import PasswordResetToken
 from src.utils.email_service import EmailService
+from src.utils.password_hashing import verify_password, HashingPoolSaturated
+from src.utils.rate_limit import rate_limit, admission_control
+from src.utils.db_routing import set_request_company
+from src.utils.server_timing import timed
 import logging
 import os
 
@@ -18,6 +22,8 @@ SECRET_KEY = os.environ.get('SECRET_KEY') or os.environ.get('JWT_SECRET_KEY') or
 email_service = EmailService()
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', ip='30/minute', email_ip='10/minute')
+@admission_control()
 def login():
     """Endpoint de login que retorna JWT token"""
     try:
@@ -32,19 +38,36 @@ def login():
         email = data.get('email')
         # Nota: email agora é único por company, mas para login precisamos buscar em todas as companies
         # Isso é seguro porque o email+company_id é único, então ainda há isolamento
-        user = User.query.filter_by(email=email).first()
+        user = User.find_by_email(email)
         
         if not user:
             # Não expor informações sobre usuários existentes (segurança)
             return jsonify({'error': 'Credenciais inválidas'}), 401
         
-        if not user.check_password(data['password']):
+        # Verificar senha no pool limitado (não ocupa a thread da requisição com o hash)
+        try:
+            password_ok, new_hash = verify_password(user.password_hash, data['password'])
+        except HashingPoolSaturated as e:
+            response = jsonify({'error': 'Servidor ocupado. Tente novamente em instantes.'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
+        
+        if not password_ok:
             # Não expor se a senha está incorreta (segurança)
             return jsonify({'error': 'Credenciais inválidas'}), 401
         
         if not user.is_active:
             return jsonify({'error': 'Usuário inativo'}), 403
         
+        # Refazer o hash quando os parâmetros configurados mudaram (transparente para o usuário)
+        if new_hash:
+            try:
+                user.password_hash = new_hash
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.warning(f"Falha ao atualizar hash da senha do usuário ID {user.id}")
+        
         # Gerar JWT token
         payload = {
             'user_id': user.id,
@@ -111,8 +134,9 @@ def token_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(payload['user_id'])
+            with timed('auth'):
+                payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+                current_user = User.query.get(payload['user_id'])
             
             if not current_user:
                 return jsonify({'error': 'Usuário não encontrado'}), 401
@@ -125,6 +149,7 @@ def token_required(f):
             logger.error(f"Erro ao validar token: {str(e)}", exc_info=True)
             return jsonify({'error': 'Erro ao validar autenticação'}), 500
         
+        set_request_company(current_user.company_id)
         return f(current_user, *args, **kwargs)
     
     decorated.__name__ = f.__name__
@@ -142,8 +167,9 @@ def admin_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(payload['user_id'])
+            with timed('auth'):
+                payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+                current_user = User.query.get(payload['user_id'])
             
             if not current_user:
                 return jsonify({'error': 'Usuário não encontrado'}), 401
@@ -159,6 +185,7 @@ def admin_required(f):
             logger.error(f"Erro ao validar token admin: {str(e)}", exc_info=True)
             return jsonify({'error': 'Erro ao validar autenticação'}), 500
         
+        set_request_company(current_user.company_id)
         return f(current_user, *args, **kwargs)
     
     decorated.__name__ = f.__name__
@@ -176,8 +203,9 @@ def plant_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(payload['user_id'])
+            with timed('auth'):
+                payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+                current_user = User.query.get(payload['user_id'])
             
             if not current_user:
                 return jsonify({'error': 'Usuário não encontrado'}), 401
@@ -193,12 +221,15 @@ def plant_required(f):
             logger.error(f"Erro ao validar token plant: {str(e)}", exc_info=True)
             return jsonify({'error': 'Erro ao validar autenticação'}), 500
         
+        set_request_company(current_user.company_id)
         return f(current_user, *args, **kwargs)
     
     decorated.__name__ = f.__name__
     return decorated
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@rate_limit('forgot_password', ip='10/minute', email='5/hour')
+@admission_control()
 def forgot_password():
     """Endpoint para solicitar recuperação de senha (RN03)"""
     try:
@@ -211,7 +242,7 @@ def forgot_password():
             }), 200
         
         email = data['email']
-        user = User.query.filter_by(email=email).first()
+        user = User.find_by_email(email)
         
         # RN03 - Mesmo que o usuário não exista, retornar sucesso
         # Isso evita enumerar emails válidos no sistema
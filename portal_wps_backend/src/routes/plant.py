@@ -7,7 +7,12 @@ from src.models.plant import Plant
 from src.models.supplier import Supplier
 from src.routes.auth import token_required, plant_required
 from src.utils.permissions import permission_required
+from src.utils.rate_limit import rate_limit, admission_control
+from src.utils.plant_cache import get_plant_descriptor
+from src.utils.reports import get_period_stats, build_plant_dashboard_summary
+from src.utils.report_cache import cached_report
 from src.utils.helpers import generate_appointment_number
+from src.utils.server_timing import timed
 import logging
 
 logger = logging.getLogger(__name__)
@@ -67,6 +72,8 @@ def get_plant_appointments(current_user):
 
 @plant_bp.route('/appointments', methods=['POST'])
 @permission_required('create_appointment', 'editor')
+@rate_limit('appointments', user='30/minute', company='300/minute')
+@admission_control()
 def create_appointment(current_user):
     """Cria um novo agendamento (para plantas)"""
     try:
@@ -114,52 +121,52 @@ def create_appointment(current_user):
             return jsonify({'error': 'Usuário não está vinculado a uma planta'}), 400
         
         # Buscar a planta e obter sua capacidade máxima
-        from src.models.plant import Plant
-        plant = Plant.query.get(current_user.plant_id)
+        plant = get_plant_descriptor(current_user.plant_id, current_user.company_id)
         if not plant:
             return jsonify({'error': 'Planta não encontrada'}), 404
         
         # Usar capacidade máxima da planta (padrão: 1 se não configurado)
-        max_capacity = plant.max_capacity if plant.max_capacity else 1
+        max_capacity = plant['max_capacity']
         
         # Validar capacidade para todos os slots do intervalo
         from sqlalchemy import or_, and_
         
-        if appointment_time_end:
-            slots = []
-            current = datetime.combine(appointment_date, appointment_time)
-            end = datetime.combine(appointment_date, appointment_time_end)
-            
-            while current < end:
-                slots.append(current.time())
-                current += timedelta(hours=1)
-            
-            for slot in slots:
-                # Contar agendamentos que ocupam este slot para esta planta
-                # Multi-tenant: filtrar por company_id
-                query = Appointment.query.filter(
-                    Appointment.date == appointment_date,
-                    Appointment.plant_id == current_user.plant_id,
-                    Appointment.company_id == current_user.company_id
-                ).filter(
-                    or_(
-                        and_(
-                            Appointment.time == slot,
-                            Appointment.time_end.is_(None)
-                        ),
-                        and_(
-                            Appointment.time <= slot,
-                            Appointment.time_end.isnot(None),
-                            Appointment.time_end > slot
+        with timed('capacity'):
+            if appointment_time_end:
+                slots = []
+                current = datetime.combine(appointment_date, appointment_time)
+                end = datetime.combine(appointment_date, appointment_time_end)
+                
+                while current < end:
+                    slots.append(current.time())
+                    current += timedelta(hours=1)
+                
+                for slot in slots:
+                    # Contar agendamentos que ocupam este slot para esta planta
+                    # Multi-tenant: filtrar por company_id
+                    query = Appointment.query.filter(
+                        Appointment.date == appointment_date,
+                        Appointment.plant_id == current_user.plant_id,
+                        Appointment.company_id == current_user.company_id
+                    ).filter(
+                        or_(
+                            and_(
+                                Appointment.time == slot,
+                                Appointment.time_end.is_(None)
+                            ),
+                            and_(
+                                Appointment.time <= slot,
+                                Appointment.time_end.isnot(None),
+                                Appointment.time_end > slot
+                            )
                         )
                     )
-                )
-                
-                if query.count() >= max_capacity:
-                    slot_str = slot.strftime('%H:%M')
-                    return jsonify({
-                        'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida no horário {slot_str}. Por favor, escolha outro intervalo.'
-                    }), 400
+                    
+                    if query.count() >= max_capacity:
+                        slot_str = slot.strftime('%H:%M')
+                        return jsonify({
+                            'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida no horário {slot_str}. Por favor, escolha outro intervalo.'
+                        }), 400
         
         # Validar horários de funcionamento da planta
         from src.utils.operating_hours_validator import validate_operating_hours
@@ -168,7 +175,7 @@ def create_appointment(current_user):
             return jsonify({'error': error_msg}), 400
         
         # Gerar número único do agendamento
-        appointment_number = generate_appointment_number(appointment_date)
+        appointment_number = generate_appointment_number(current_user.company_id, appointment_date)
         
         # Criar agendamento (plant_id preenchido automaticamente com a planta do usuário)
         appointment = Appointment(
@@ -645,12 +652,12 @@ def get_max_capacity(current_user):
         
         from src.models.system_config import SystemConfig
         
-        config = SystemConfig.query.filter_by(key='max_capacity_per_slot').first()
+        config = SystemConfig.get_config('max_capacity_per_slot', current_user.company_id)
         
         if config:
             return jsonify({
-                'max_capacity': int(config.value),
-                'config': config.to_dict()
+                'max_capacity': int(config['value']),
+                'config': config
             }), 200
         else:
             # Valor padrão se não existir configuração
@@ -689,21 +696,13 @@ def set_max_capacity(current_user):
         if max_capacity < 1:
             return jsonify({'error': 'Capacidade máxima deve ser no mínimo 1'}), 400
         
-        # Criar ou atualizar configuração
-        config = SystemConfig.query.filter_by(key='max_capacity_per_slot').first()
-        if config:
-            config.value = str(max_capacity)
-            config.description = 'Capacidade máxima de agendamentos por horário'
-            config.updated_at = datetime.utcnow()
-        else:
-            config = SystemConfig(
-                key='max_capacity_per_slot',
-                value=str(max_capacity),
-                description='Capacidade máxima de agendamentos por horário'
-            )
-            db.session.add(config)
-        
-        db.session.commit()
+        # Criar ou atualizar configuração da company
+        config = SystemConfig.set_value(
+            'max_capacity_per_slot',
+            max_capacity,
+            company_id=current_user.company_id,
+            description='Capacidade máxima de agendamentos por horário'
+        )
         
         return jsonify({
             'message': 'Configuração salva com sucesso',
@@ -718,6 +717,7 @@ def set_max_capacity(current_user):
 
 @plant_bp.route('/reports/dashboard-summary', methods=['GET'])
 @token_required
+@cached_report
 def get_plant_dashboard_summary(current_user):
     """Retorna resumo geral da própria planta para o dashboard de relatórios"""
     try:
@@ -738,69 +738,16 @@ def get_plant_dashboard_summary(current_user):
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        # Buscar a planta
-        plant = Plant.query.get(current_user.plant_id)
+        # Planta (nome, capacidade e horários) do descritor em cache
+        plant = get_plant_descriptor(current_user.plant_id, company_id=current_user.company_id)
         if not plant:
             return jsonify({'error': 'Planta não encontrada'}), 404
         
-        # Total de agendamentos da planta no período
-        total_appointments = Appointment.query.filter(
-            Appointment.plant_id == current_user.plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).count()
-        
-        # Agendamentos por status
-        appointments_by_status = db.session.query(
-            Appointment.status,
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.plant_id == current_user.plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(Appointment.status).all()
-        
-        status_counts = {status: count for status, count in appointments_by_status}
-        
-        # Total de fornecedores ativos que agendam nesta planta
-        supplier_ids = db.session.query(Appointment.supplier_id).filter(
-            Appointment.plant_id == current_user.plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).distinct().all()
-        
-        supplier_ids_list = [sid[0] for sid in supplier_ids if sid[0]]
-        active_suppliers = Supplier.query.filter(
-            Supplier.id.in_(supplier_ids_list),
-            Supplier.is_active == True,
-            Supplier.is_deleted == False,
-            Supplier.company_id == current_user.company_id
-        ).count() if supplier_ids_list else 0
-        
-        # Taxa de ocupação da planta
-        plant_appointments = Appointment.query.filter(
-            Appointment.plant_id == current_user.plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date,
-            Appointment.status.in_(['scheduled', 'checked_in', 'checked_out'])
-        ).count()
-        
-        days_in_period = (end_date - start_date).days + 1
-        max_capacity = plant.max_capacity or 1
-        total_slots = days_in_period * max_capacity
-        
-        occupation_rate = (plant_appointments / total_slots * 100) if total_slots > 0 else 0
+        # Status, fornecedores e bloqueios do período em uma única consulta ao agregado diário
+        summary = build_plant_dashboard_summary(current_user.company_id, plant, start_date, end_date)
         
         return jsonify({
-            'total_appointments': total_appointments,
-            'appointments_by_status': status_counts,
-            'active_suppliers': active_suppliers,
-            'occupation_rate': round(occupation_rate, 2),
-            'plant': {
-                'id': plant.id,
-                'name': plant.name,
-                'max_capacity': plant.max_capacity
-            },
+            **summary,
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
@@ -813,6 +760,7 @@ def get_plant_dashboard_summary(current_user):
 
 @plant_bp.route('/reports/supplier-stats', methods=['GET'])
 @token_required
+@cached_report
 def get_plant_supplier_stats(current_user):
     """Retorna estatísticas de um fornecedor específico que agenda nesta planta"""
     try:
@@ -846,37 +794,15 @@ def get_plant_supplier_stats(current_user):
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        # Agendamentos do fornecedor nesta planta no período
-        appointments = Appointment.query.filter(
-            Appointment.supplier_id == supplier_id,
-            Appointment.plant_id == current_user.plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).all()
-        
-        total_appointments = len(appointments)
-        
-        # Agendamentos por status
-        status_counts = {}
-        for apt in appointments:
-            status_counts[apt.status] = status_counts.get(apt.status, 0) + 1
-        
-        # Agendamentos por dia
-        appointments_by_date = db.session.query(
-            Appointment.date,
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.supplier_id == supplier_id,
-            Appointment.plant_id == current_user.plant_id,
-            Appointment.date >= start_date,
-            Appointment.date <= end_date
-        ).group_by(Appointment.date).order_by(Appointment.date).all()
-        
-        daily_data = [{'date': date.isoformat(), 'count': count} for date, count in appointments_by_date]
+        # Contagens por status e por dia do fornecedor nesta planta, agregadas no banco
+        stats = get_period_stats(
+            current_user.company_id, start_date, end_date,
+            plant_id=current_user.plant_id, supplier_id=supplier_id
+        )
         
         # Taxa de comparecimento (checked_in + checked_out / total)
-        confirmed = sum(1 for apt in appointments if apt.status in ['checked_in', 'checked_out'])
-        attendance_rate = (confirmed / total_appointments * 100) if total_appointments > 0 else 0
+        total_appointments = stats['total_appointments']
+        attendance_rate = (stats['attended'] / total_appointments * 100) if total_appointments > 0 else 0
         
         return jsonify({
             'supplier': {
@@ -884,8 +810,8 @@ def get_plant_supplier_stats(current_user):
                 'description': supplier.description
             },
             'total_appointments': total_appointments,
-            'appointments_by_status': status_counts,
-            'daily_appointments': daily_data,
+            'appointments_by_status': stats['appointments_by_status'],
+            'daily_appointments': stats['daily_appointments'],
             'attendance_rate': round(attendance_rate, 2),
             'period': {
                 'start_date': start_date.isoformat(),
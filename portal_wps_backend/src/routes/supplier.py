@@ -7,6 +7,9 @@ from src.models.supplier import Supplier
 from src.models.operating_hours import OperatingHours
 from src.routes.auth import token_required
 from src.utils.permissions import permission_required, has_permission
+from src.utils.rate_limit import rate_limit, admission_control
+from src.utils.plant_cache import get_plant_descriptor
+from src.utils.server_timing import timed
 from src.utils.helpers import generate_appointment_number
 
 logger = logging.getLogger(__name__)
@@ -269,6 +272,8 @@ def get_available_times(current_user):
 
 @supplier_bp.route('/appointments', methods=['POST'])
 @permission_required('create_appointment', 'editor')
+@rate_limit('appointments', user='30/minute', company='300/minute')
+@admission_control()
 def create_appointment(current_user):
     """Cria um novo agendamento para o fornecedor"""
     try:
@@ -305,13 +310,8 @@ def create_appointment(current_user):
             return jsonify({'error': 'Planta de entrega é obrigatória'}), 400
         
         # Verificar se a planta existe, está ativa e pertence à mesma company
-        from src.models.plant import Plant
-        plant = Plant.query.filter_by(
-            id=plant_id, 
-            is_active=True,
-            company_id=current_user.company_id
-        ).first()
-        if not plant:
+        plant = get_plant_descriptor(plant_id, current_user.company_id)
+        if not plant or not plant['is_active']:
             return jsonify({'error': 'Planta não encontrada, inativa ou não pertence ao seu domínio'}), 404
         
         # Validar horários de funcionamento da planta (validação específica da planta)
@@ -323,7 +323,7 @@ def create_appointment(current_user):
         
         # Verificar capacidade máxima por horário da planta
         # Usar capacidade máxima da planta (padrão: 1 se não configurado)
-        max_capacity = plant.max_capacity if plant.max_capacity else 1
+        max_capacity = plant['max_capacity']
         
         # Validar capacidade para todos os slots do intervalo
         # IMPORTANTE: Validar slots de 1 hora (não 30 minutos) para manter compatibilidade
@@ -331,83 +331,84 @@ def create_appointment(current_user):
         from sqlalchemy import or_, and_
         from datetime import timedelta
         
-        if appointment_time_end:
-            # Agendamento com intervalo - validar todos os slots de 1 hora
-            slots = []
-            current = datetime.combine(appointment_date, appointment_time)
-            end = datetime.combine(appointment_date, appointment_time_end)
-            
-            # Arredondar para baixo para o horário de 1 hora mais próximo
-            # Exemplo: 08:30 -> 08:00, 09:15 -> 09:00
-            start_hour = time(current.hour, 0)
-            current = datetime.combine(appointment_date, start_hour)
-            
-            while current < end:
-                slot_hour = current.time()
-                slots.append(slot_hour)
-                current += timedelta(hours=1)
-            
-            for slot in slots:
-                # Contar agendamentos que ocupam este slot para esta planta
+        with timed('capacity'):
+            if appointment_time_end:
+                # Agendamento com intervalo - validar todos os slots de 1 hora
+                slots = []
+                current = datetime.combine(appointment_date, appointment_time)
+                end = datetime.combine(appointment_date, appointment_time_end)
+                
+                # Arredondar para baixo para o horário de 1 hora mais próximo
+                # Exemplo: 08:30 -> 08:00, 09:15 -> 09:00
+                start_hour = time(current.hour, 0)
+                current = datetime.combine(appointment_date, start_hour)
+                
+                while current < end:
+                    slot_hour = current.time()
+                    slots.append(slot_hour)
+                    current += timedelta(hours=1)
+                
+                for slot in slots:
+                    # Contar agendamentos que ocupam este slot para esta planta
+                    # Multi-tenant: filtrar por company_id
+                    count = Appointment.query.filter(
+                        Appointment.date == appointment_date,
+                        Appointment.plant_id == plant_id,
+                        Appointment.company_id == current_user.company_id
+                    ).filter(
+                        or_(
+                            # Agendamento antigo que começa neste slot
+                            and_(
+                                Appointment.time == slot,
+                                Appointment.time_end.is_(None)
+                            ),
+                            # Agendamento com intervalo que inclui este slot
+                            and_(
+                                Appointment.time <= slot,
+                                Appointment.time_end.isnot(None),
+                                Appointment.time_end > slot
+                            )
+                        )
+                    ).count()
+                    
+                    if count >= max_capacity:
+                        slot_str = slot.strftime('%H:%M') if slot else 'desconhecido'
+                        return jsonify({
+                            'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida no horário {slot_str}. Por favor, escolha outro intervalo.'
+                        }), 400
+            else:
+                # Agendamento antigo (apenas horário único) - manter compatibilidade
+                # Contar todos os agendamentos que ocupam este horário específico para esta planta:
+                # 1. Agendamentos antigos (sem time_end) que começam neste horário
+                # 2. Agendamentos com intervalo que incluem este horário
                 # Multi-tenant: filtrar por company_id
-                count = Appointment.query.filter(
+                total_count = Appointment.query.filter(
                     Appointment.date == appointment_date,
                     Appointment.plant_id == plant_id,
                     Appointment.company_id == current_user.company_id
                 ).filter(
                     or_(
-                        # Agendamento antigo que começa neste slot
+                        # Agendamento antigo que começa neste horário
                         and_(
-                            Appointment.time == slot,
+                            Appointment.time == appointment_time,
                             Appointment.time_end.is_(None)
                         ),
-                        # Agendamento com intervalo que inclui este slot
+                        # Agendamento com intervalo que inclui este horário
                         and_(
-                            Appointment.time <= slot,
+                            Appointment.time <= appointment_time,
                             Appointment.time_end.isnot(None),
-                            Appointment.time_end > slot
+                            Appointment.time_end > appointment_time
                         )
                     )
                 ).count()
                 
-                if count >= max_capacity:
-                    slot_str = slot.strftime('%H:%M') if slot else 'desconhecido'
+                if total_count >= max_capacity:
                     return jsonify({
-                        'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida no horário {slot_str}. Por favor, escolha outro intervalo.'
+                        'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida. Por favor, escolha outro horário.'
                     }), 400
-        else:
-            # Agendamento antigo (apenas horário único) - manter compatibilidade
-            # Contar todos os agendamentos que ocupam este horário específico para esta planta:
-            # 1. Agendamentos antigos (sem time_end) que começam neste horário
-            # 2. Agendamentos com intervalo que incluem este horário
-            # Multi-tenant: filtrar por company_id
-            total_count = Appointment.query.filter(
-                Appointment.date == appointment_date,
-                Appointment.plant_id == plant_id,
-                Appointment.company_id == current_user.company_id
-            ).filter(
-                or_(
-                    # Agendamento antigo que começa neste horário
-                    and_(
-                        Appointment.time == appointment_time,
-                        Appointment.time_end.is_(None)
-                    ),
-                    # Agendamento com intervalo que inclui este horário
-                    and_(
-                        Appointment.time <= appointment_time,
-                        Appointment.time_end.isnot(None),
-                        Appointment.time_end > appointment_time
-                    )
-                )
-            ).count()
-            
-            if total_count >= max_capacity:
-                return jsonify({
-                    'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida. Por favor, escolha outro horário.'
-                }), 400
         
         # Gerar número único do agendamento
-        appointment_number = generate_appointment_number(appointment_date)
+        appointment_number = generate_appointment_number(current_user.company_id, appointment_date)
         
         # Criar agendamento
         appointment = Appointment(
@@ -578,34 +579,35 @@ def update_supplier_appointment(current_user, appointment_id):
                 slots.append(current.time())
                 current += timedelta(hours=1)
             
-            for slot in slots:
-                # Contar agendamentos que ocupam este slot para esta planta
-                count = Appointment.query.filter(
-                    Appointment.date == appointment.date,
-                    Appointment.plant_id == appointment.plant_id
-                ).filter(
-                    Appointment.id != appointment_id
-                ).filter(
-                    or_(
-                        # Agendamento antigo que começa neste slot
-                        and_(
-                            Appointment.time == slot,
-                            Appointment.time_end.is_(None)
-                        ),
-                        # Agendamento com intervalo que inclui este slot
-                        and_(
-                            Appointment.time <= slot,
-                            Appointment.time_end.isnot(None),
-                            Appointment.time_end > slot
+            with timed('capacity'):
+                for slot in slots:
+                    # Contar agendamentos que ocupam este slot para esta planta
+                    count = Appointment.query.filter(
+                        Appointment.date == appointment.date,
+                        Appointment.plant_id == appointment.plant_id
+                    ).filter(
+                        Appointment.id != appointment_id
+                    ).filter(
+                        or_(
+                            # Agendamento antigo que começa neste slot
+                            and_(
+                                Appointment.time == slot,
+                                Appointment.time_end.is_(None)
+                            ),
+                            # Agendamento com intervalo que inclui este slot
+                            and_(
+                                Appointment.time <= slot,
+                                Appointment.time_end.isnot(None),
+                                Appointment.time_end > slot
+                            )
                         )
-                    )
-                ).count()
-                
-                if count >= max_capacity:
-                    slot_str = slot.strftime('%H:%M') if slot else 'desconhecido'
-                    return jsonify({
-                        'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida no horário {slot_str}. Por favor, escolha outro intervalo.'
-                    }), 400
+                    ).count()
+                    
+                    if count >= max_capacity:
+                        slot_str = slot.strftime('%H:%M') if slot else 'desconhecido'
+                        return jsonify({
+                            'error': f'Capacidade máxima de {max_capacity} agendamento(s) por horário foi atingida no horário {slot_str}. Por favor, escolha outro intervalo.'
+                        }), 400
         
         if 'purchase_order' in data:
             appointment.purchase_order = data['purchase_order'].strip()
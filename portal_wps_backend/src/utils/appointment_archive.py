@@ -0,0 +1,342 @@
+"""
+Particionamento mensal de appointment e arquivamento de agendamentos antigos
+
+No PostgreSQL a tabela appointment é particionada por intervalo (RANGE) em date, com
+uma partição por mês (appointment_pYYYYMM) e a partição padrão appointment_pdefault para
+datas ainda sem partição. Consultas filtradas por data (listagens, disponibilidade,
+relatórios) leem apenas as partições do período (partition pruning); buscas só por id
+consultam o índice de cada partição.
+
+Arquivamento (python manage.py archive-appointments):
+- padrão: move os agendamentos com check-out anteriores ao corte para appointment_archive,
+  em lotes (funciona também sem particionamento)
+- --detach: desanexa as partições mensais inteiramente anteriores ao corte e as anexa a
+  appointment_archive (apenas metadados, sem copiar linhas; todos os status)
+
+O agregado diário (appointment_daily_stats) não é alterado: dashboards e estatísticas
+continuam contando os agendamentos arquivados. Relatórios que leem agendamentos
+individuais usam appointment_source(), que inclui o arquivo quando o período o alcança.
+Os dois modos publicam no barramento de cache um evento 'appointment' por company
+afetada, entregue após o commit (invalida listagens e a versão dos relatórios).
+
+Configuração:
+    APPOINTMENT_PARTITION_MONTHS_AHEAD: Meses futuros com partição criada (padrão: 12)
+    APPOINTMENT_ARCHIVE_MONTHS: Idade, em meses, a partir da qual os agendamentos são arquivados (padrão: 24)
+"""
+import os
+import re
+import logging
+from datetime import date, timedelta
+from sqlalchemy import text, select, insert, delete, union_all
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.schema import CreateIndex
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.appointment_archive import AppointmentArchive
+from src.utils.cache_bus import publish
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENT_PARTITION_MONTHS_AHEAD = int(os.environ.get('APPOINTMENT_PARTITION_MONTHS_AHEAD', 12))
+APPOINTMENT_ARCHIVE_MONTHS = int(os.environ.get('APPOINTMENT_ARCHIVE_MONTHS', 24))
+
+PARENT_TABLE = 'appointment'
+ARCHIVE_TABLE = 'appointment_archive'
+DEFAULT_PARTITION = 'appointment_pdefault'
+ARCHIVE_DEFAULT_PARTITION = 'appointment_archive_pdefault'
+LEGACY_TABLE = 'appointment_unpartitioned'
+PARTITION_NAME_PATTERN = re.compile(r'^appointment_p(\d{4})(\d{2})$')
+
+# Status arquivados no modo padrão (agendamentos concluídos)
+ARCHIVABLE_STATUSES = ('checked_out',)
+
+
+def add_months(day, months):
+    """Primeiro dia do mês `months` meses depois do mês de `day`"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'appointment_p{month:%Y%m}'
+
+
+def archive_cutoff(months, today=None):
+    """Primeiro dia do mês a partir do qual os agendamentos permanecem na tabela principal"""
+    return add_months(today or date.today(), -months)
+
+
+def is_partitioned(connection, table=PARENT_TABLE):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+        'WHERE c.relname = :table AND pg_table_is_visible(c.oid)'
+    ), {'table': table}).first() is not None
+
+
+def list_month_partitions(connection, table=PARENT_TABLE):
+    """Partições mensais anexadas à tabela: {primeiro dia do mês: nome}"""
+    rows = connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent '
+        'WHERE p.relname = :table AND pg_table_is_visible(p.oid)'
+    ), {'table': table})
+    partitions = {}
+    for (name,) in rows:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _bounds(month):
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def _move_rows(connection, source_table, target_table, month):
+    """Move as linhas do mês de uma tabela para outra (mesmas colunas, mesma ordem)"""
+    connection.execute(text(
+        f'WITH moved AS (DELETE FROM {source_table} WHERE date >= :start AND date < :end RETURNING *) '
+        f'INSERT INTO {target_table} SELECT * FROM moved'
+    ), {'start': month, 'end': add_months(month, 1)})
+
+
+def create_month_partition(connection, month):
+    """
+    Cria a partição do mês, trazendo as linhas do mês que estavam na partição padrão
+
+    Bloqueia inserções de agendamentos até o fim da transação (rápido enquanto a
+    partição padrão é pequena).
+    """
+    name = partition_name(month)
+    connection.execute(text(f'LOCK TABLE {PARENT_TABLE} IN SHARE ROW EXCLUSIVE MODE'))
+    connection.execute(text(f'CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)'))
+    _move_rows(connection, DEFAULT_PARTITION, name, month)
+    connection.execute(text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} {_bounds(month)}'))
+    logger.info(f"[partitions] Partição {name} criada")
+
+
+def ensure_partitions(connection, months_ahead=None, today=None):
+    """
+    Cria as partições do mês atual, dos próximos meses e dos meses com linhas na partição padrão
+
+    Returns:
+        list: Meses (date) cujas partições foram criadas
+    """
+    if not is_partitioned(connection):
+        return []
+    months_ahead = APPOINTMENT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    first = (today or date.today()).replace(day=1)
+    wanted = {add_months(first, offset) for offset in range(months_ahead + 1)}
+    wanted.update(
+        row[0] for row in connection.execute(text(
+            f"SELECT DISTINCT CAST(date_trunc('month', date) AS date) FROM {DEFAULT_PARTITION}"
+        ))
+    )
+    existing = list_month_partitions(connection)
+    created = []
+    for month in sorted(wanted):
+        if month not in existing:
+            create_month_partition(connection, month)
+            created.append(month)
+    return created
+
+
+def _recreate_archive_table(connection):
+    """appointment_archive particionada com as colunas de appointment (para anexar partições)"""
+    if connection.dialect.has_table(connection, ARCHIVE_TABLE):
+        if is_partitioned(connection, ARCHIVE_TABLE):
+            return
+        if connection.execute(text(f'SELECT 1 FROM {ARCHIVE_TABLE} LIMIT 1')).first() is not None:
+            raise RuntimeError(f'{ARCHIVE_TABLE} já contém dados e não é particionada')
+        connection.execute(text(f'DROP TABLE {ARCHIVE_TABLE}'))
+
+    connection.execute(text(f'CREATE TABLE {ARCHIVE_TABLE} (LIKE {PARENT_TABLE}) PARTITION BY RANGE (date)'))
+    connection.execute(text(f'CREATE TABLE {ARCHIVE_DEFAULT_PARTITION} PARTITION OF {ARCHIVE_TABLE} DEFAULT'))
+    for index in AppointmentArchive.__table__.indexes:
+        connection.execute(CreateIndex(index))
+
+
+def partition_appointment_table(connection, months_ahead=None, today=None):
+    """
+    Converte appointment em tabela particionada por mês (usado pela migração 0004)
+
+    Copia todas as linhas em uma transação com a tabela bloqueada: em bases grandes,
+    execute em janela de manutenção. Não faz nada se a tabela já estiver particionada.
+
+    Returns:
+        bool: True se a tabela foi convertida
+    """
+    if connection.dialect.name != 'postgresql' or is_partitioned(connection):
+        return False
+
+    months_ahead = APPOINTMENT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    connection.execute(text(f'LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE'))
+    connection.execute(text(f'ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}'))
+    sequence = connection.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': LEGACY_TABLE}
+    ).scalar()
+
+    connection.execute(text(
+        f'CREATE TABLE {PARENT_TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (date)'
+    ))
+    connection.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT'))
+
+    first_date = connection.execute(text(f'SELECT MIN(date) FROM {LEGACY_TABLE}')).scalar()
+    current = (today or date.today()).replace(day=1)
+    month = first_date.replace(day=1) if first_date and first_date < current else current
+    last = add_months(current, months_ahead)
+    while month <= last:
+        connection.execute(text(
+            f'CREATE TABLE {partition_name(month)} PARTITION OF {PARENT_TABLE} {_bounds(month)}'
+        ))
+        month = add_months(month, 1)
+
+    connection.execute(text(f'INSERT INTO {PARENT_TABLE} SELECT * FROM {LEGACY_TABLE}'))
+    if sequence:
+        connection.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.id'))
+    connection.execute(text(f'DROP TABLE {LEGACY_TABLE}'))
+
+    # Chave primária e constraints únicas precisam incluir a coluna de partição
+    connection.execute(text(f'ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT appointment_pkey PRIMARY KEY (id, date)'))
+    connection.execute(text(
+        f'ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT uq_appointment_number_company '
+        'UNIQUE (appointment_number, company_id, date)'
+    ))
+    for foreign_key in Appointment.__table__.foreign_keys:
+        connection.execute(text(
+            f'ALTER TABLE {PARENT_TABLE} ADD FOREIGN KEY ({foreign_key.parent.name}) '
+            f'REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})'
+        ))
+    for index in Appointment.__table__.indexes:
+        connection.execute(CreateIndex(index))
+
+    _recreate_archive_table(connection)
+    return True
+
+
+def _publish_archived(session, company_ids):
+    """Eventos 'appointment' das companies com agendamentos arquivados (despachados no commit)"""
+    for company_id in company_ids:
+        publish(session, 'appointment', company_id)
+
+
+def detach_old_partitions(session, cutoff):
+    """
+    Move as partições mensais anteriores ao corte de appointment para appointment_archive
+
+    Roda na transação da sessão; os eventos de invalidação saem no commit.
+
+    Returns:
+        list: Nomes das partições arquivadas
+    """
+    connection = session.connection()
+    archived = []
+    for month, name in sorted(list_month_partitions(connection).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        _publish_archived(session, connection.execute(text(f'SELECT DISTINCT company_id FROM {name}')).scalars())
+        connection.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}'))
+        # Agendamentos do mês já arquivados linha a linha passam para a partição
+        _move_rows(connection, ARCHIVE_DEFAULT_PARTITION, name, month)
+        connection.execute(text(f'ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {name} {_bounds(month)}'))
+        archived.append(name)
+        logger.info(f"[partitions] Partição {name} movida para {ARCHIVE_TABLE}")
+    return archived
+
+
+def archive_rows(engine, cutoff, statuses=ARCHIVABLE_STATUSES, batch_size=5000):
+    """
+    Move para appointment_archive os agendamentos anteriores ao corte com os status informados
+
+    Cada lote é uma transação própria, para não manter bloqueios durante todo o arquivamento,
+    e publica os eventos de invalidação das companies do lote.
+
+    Returns:
+        int: Quantidade de agendamentos arquivados
+    """
+    table = Appointment.__table__
+    columns = [column.name for column in table.columns]
+    total = 0
+    while True:
+        with Session(bind=engine) as session, session.begin():
+            connection = session.connection()
+            ids = connection.execute(
+                select(table.c.id).where(table.c.date < cutoff, table.c.status.in_(statuses)).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return total
+            batch = (table.c.id.in_(ids), table.c.date < cutoff)
+            _publish_archived(session, connection.execute(select(table.c.company_id).where(*batch).distinct()).scalars())
+            connection.execute(insert(AppointmentArchive.__table__).from_select(
+                columns, select(*[table.c[name] for name in columns]).where(*batch)
+            ))
+            connection.execute(delete(table).where(*batch))
+        total += len(ids)
+        logger.info(f"[archive] {total} agendamentos arquivados")
+
+
+def appointment_source(company_id, start_date=None):
+    """
+    Entidade para consultas de relatório sobre agendamentos individuais
+
+    Retorna Appointment ou, quando a company tem agendamentos arquivados a partir de
+    start_date, um alias de Appointment sobre appointment UNION ALL appointment_archive.
+    Os filtros aplicados ao alias chegam às duas tabelas (e ao pruning das partições).
+    """
+    archived = db.session.query(AppointmentArchive.id).filter(AppointmentArchive.company_id == company_id)
+    if start_date is not None:
+        archived = archived.filter(AppointmentArchive.date >= start_date)
+    if archived.first() is None:
+        return Appointment
+
+    columns = [column.name for column in Appointment.__table__.columns]
+    combined = union_all(
+        select(*[Appointment.__table__.c[name] for name in columns]),
+        select(*[AppointmentArchive.__table__.c[name] for name in columns])
+    ).subquery('appointment_with_archive')
+    return aliased(Appointment, combined)
+
+
+def _scanned_relations(plan):
+    relations = set()
+    if 'Relation Name' in plan:
+        relations.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        relations |= _scanned_relations(child)
+    return relations
+
+
+def check_partition_pruning(connection, today=None):
+    """
+    Partições lidas (EXPLAIN) pelas consultas típicas de listagem, disponibilidade e relatório
+
+    Returns:
+        dict: {consulta: [tabelas/partições no plano]}
+    """
+    today = today or date.today()
+    month_end = add_months(today, 1)
+    table = Appointment.__table__
+    statements = {
+        # Listagem semanal de agendamentos da company
+        'listing': select(table.c.id).where(
+            table.c.company_id == 0, table.c.date >= today, table.c.date <= today + timedelta(days=6)
+        ),
+        # Capacidade/horários ocupados de uma planta em uma data
+        'availability': select(table.c.id).where(
+            table.c.company_id == 0, table.c.plant_id == 0, table.c.date == today
+        ),
+        # Relatório do mês (status confirmados)
+        'report': select(table.c.plant_id).where(
+            table.c.company_id == 0, table.c.date >= today.replace(day=1), table.c.date < month_end,
+            table.c.status.in_(('scheduled', 'checked_in', 'checked_out'))
+        )
+    }
+    result = {}
+    for name, statement in statements.items():
+        compiled = statement.compile(dialect=connection.dialect)
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+        result[name] = sorted(_scanned_relations(plan[0]['Plan']))
+    return result
@@ -0,0 +1,361 @@
+"""
+Camada de cache com backend plugável: LRU em memória (padrão) ou servidor compatível com Redis
+
+Configuração:
+    CACHE_URL: vazio ou 'memory://' para o cache em memória do processo,
+               'redis://host:porta/db' para um servidor compatível com Redis
+    CACHE_DEFAULT_TTL: TTL padrão em segundos (padrão: 300)
+    CACHE_MAX_ENTRIES: Máximo de entradas do cache em memória (padrão: 10000)
+"""
+import os
+import json
+import math
+import time
+import logging
+import threading
+from decimal import Decimal
+from datetime import date, datetime, time as time_class
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'cargoflow')
+
+# Sentinela para diferenciar "não encontrado" de um valor None armazenado
+_MISSING = object()
+
+# Tipos preservados pela serialização (marcados com '__type__' no JSON)
+_ENCODERS = {
+    datetime: ('datetime', lambda value: value.isoformat()),
+    date: ('date', lambda value: value.isoformat()),
+    time_class: ('time', lambda value: value.isoformat()),
+    Decimal: ('decimal', str)
+}
+_DECODERS = {
+    'datetime': datetime.fromisoformat,
+    'date': date.fromisoformat,
+    'time': time_class.fromisoformat,
+    'decimal': Decimal
+}
+
+
+def _encode_value(value):
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f"Tipo não suportado pelo cache: {type(value).__name__}")
+    type_name, to_str = encoder
+    return {'__type__': type_name, 'value': to_str(value)}
+
+
+def _decode_object(obj):
+    type_name = obj.get('__type__')
+    if type_name in _DECODERS and len(obj) == 2:
+        return _DECODERS[type_name](obj['value'])
+    return obj
+
+
+def dumps(value):
+    """
+    Serializa um valor do cache (JSON; datas, horários e Decimal preservados)
+
+    Os dois backends usam a mesma serialização: o valor lido tem os mesmos tipos
+    no cache em memória e no Redis (tuplas voltam como listas em ambos), e quem lê
+    nunca recebe a instância armazenada.
+    """
+    return json.dumps(value, default=_encode_value, separators=(',', ':'))
+
+
+def loads(raw):
+    """Desserializa um valor gravado por dumps()"""
+    return json.loads(raw, object_hook=_decode_object)
+
+
+class CacheBackend:
+    """
+    Interface comum dos backends de cache
+
+    Subclasses implementam _get/_set/_delete e as versões de namespace. Os valores
+    chegam a _set já serializados por dumps() e _get devolve o texto serializado.
+    As chaves são montadas como '<namespace>:v<versão>:<chave>', então incrementar a
+    versão de um namespace invalida todas as suas entradas de uma vez.
+    """
+
+    def __init__(self, default_ttl=CACHE_DEFAULT_TTL):
+        self.default_ttl = default_ttl
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'deletes': 0, 'loads': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        # Single-flight: um lock por chave em carregamento
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    # ---- Operações do backend ----
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def get_namespace_version(self, namespace):
+        raise NotImplementedError
+
+    def bump_namespace(self, namespace):
+        """Invalida todas as entradas do namespace. Retorna a nova versão"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    # ---- API pública ----
+
+    def _incr(self, stat):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    def make_key(self, namespace, key):
+        return f"{namespace}:v{self.get_namespace_version(namespace)}:{key}"
+
+    def get(self, namespace, key, default=None):
+        """Retorna o valor em cache ou default"""
+        return self._read(namespace, key, default)
+
+    def set(self, namespace, key, value, ttl=None):
+        """Armazena um valor (ttl em segundos; None usa o TTL padrão, 0 não expira)"""
+        self._write(namespace, key, value, ttl)
+
+    def _read(self, namespace, key, default, versioned_key=None):
+        """get() com a chave versionada opcionalmente já calculada (make_key)"""
+        try:
+            raw = self._get(versioned_key or self.make_key(namespace, key))
+            value = raw if raw is _MISSING else loads(raw)
+        except Exception as e:
+            self._incr('errors')
+            logger.warning(f"[cache] Erro ao ler {namespace}:{key}: {e}")
+            value = _MISSING
+
+        if value is _MISSING:
+            self._incr('misses')
+            return default
+        self._incr('hits')
+        return value
+
+    def _write(self, namespace, key, value, ttl, versioned_key=None):
+        """set() com a chave versionada opcionalmente já calculada (make_key)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self._set(versioned_key or self.make_key(namespace, key), dumps(value), ttl)
+            self._incr('sets')
+        except Exception as e:
+            self._incr('errors')
+            logger.warning(f"[cache] Erro ao gravar {namespace}:{key}: {e}")
+
+    def delete(self, namespace, key):
+        """Remove uma entrada do cache"""
+        try:
+            self._delete(self.make_key(namespace, key))
+            self._incr('deletes')
+        except Exception as e:
+            self._incr('errors')
+            logger.warning(f"[cache] Erro ao remover {namespace}:{key}: {e}")
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """
+        Retorna o valor em cache ou o carrega com loader()
+
+        Requisições simultâneas pela mesma chave aguardam um único carregamento
+        (single-flight) em vez de consultarem o banco cada uma.
+        """
+        value = self.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        full_key = (namespace, key)
+        with self._inflight_lock:
+            lock = self._inflight.get(full_key)
+            if lock is None:
+                lock = threading.Lock()
+                self._inflight[full_key] = lock
+
+        with lock:
+            try:
+                # A chave é versionada antes do carregamento: se o namespace for invalidado
+                # durante loader(), o valor (possivelmente antigo) fica na versão anterior
+                try:
+                    versioned_key = self.make_key(namespace, key)
+                except Exception as e:
+                    # Sem a versão não há onde gravar com segurança: só carrega
+                    self._incr('errors')
+                    logger.warning(f"[cache] Erro ao ler {namespace}:{key}: {e}")
+                    self._incr('loads')
+                    return loader()
+
+                # Outra thread pode ter carregado enquanto aguardávamos o lock
+                value = self._read(namespace, key, _MISSING, versioned_key)
+                if value is not _MISSING:
+                    return value
+                self._incr('loads')
+                value = loader()
+                self._write(namespace, key, value, ttl, versioned_key)
+                return value
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(full_key, None)
+
+    def stats(self):
+        """Métricas de acerto/erro do cache"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['backend'] = self.__class__.__name__
+        return stats
+
+
+class LocalCache(CacheBackend):
+    """Cache LRU com TTL por chave, em memória do processo"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, default_ttl=CACHE_DEFAULT_TTL):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def _delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_namespace_version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def bump_namespace(self, namespace):
+        with self._lock:
+            version = self._versions.get(namespace, 0) + 1
+            self._versions[namespace] = version
+            # As entradas da versão anterior não serão mais lidas; removê-las libera memória
+            prefix = f"{namespace}:v"
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+        return version
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    """
+    Adaptador para servidores compatíveis com o protocolo Redis
+
+    O cliente pode ser injetado (qualquer objeto com get/set/delete/incr/scan_iter),
+    o que permite usar um servidor local ou um substituto em memória nos testes.
+    Todas as chaves levam o prefixo CACHE_KEY_PREFIX, e clear() remove apenas elas.
+    """
+
+    def __init__(self, url=None, client=None, default_ttl=CACHE_DEFAULT_TTL, prefix=CACHE_KEY_PREFIX):
+        super().__init__(default_ttl)
+        self.prefix = prefix
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("Pacote 'redis' não instalado - necessário para CACHE_URL=redis://")
+            client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return _MISSING
+        return raw
+
+    def _set(self, key, raw, ttl):
+        if ttl:
+            self.client.set(self._key(key), raw, ex=max(1, math.ceil(ttl)))
+        else:
+            self.client.set(self._key(key), raw)
+
+    def _delete(self, key):
+        self.client.delete(self._key(key))
+
+    def get_namespace_version(self, namespace):
+        try:
+            version = self.client.get(self._key(f"ns:{namespace}"))
+        except Exception as e:
+            self._incr('errors')
+            logger.warning(f"[cache] Erro ao ler versão do namespace {namespace}: {e}")
+            return 0
+        return int(version) if version is not None else 0
+
+    def bump_namespace(self, namespace):
+        # Entradas antigas expiram pelo TTL; não é preciso varrer as chaves
+        return int(self.client.incr(self._key(f"ns:{namespace}")))
+
+    def clear(self):
+        # O banco do Redis pode ser compartilhado: remove só as chaves desta aplicação
+        batch = []
+        for key in self.client.scan_iter(match=f"{self.prefix}:*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+
+def create_cache(url=None):
+    """Cria o backend de cache a partir da URL (vazia/'memory://' = em memória)"""
+    url = url if url is not None else CACHE_URL
+    if not url or url.startswith('memory://'):
+        return LocalCache()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url)
+    raise ValueError(f"CACHE_URL com esquema não suportado: {url}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Retorna o cache global do processo, criado na primeira chamada"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache()
+                logger.info(f"[cache] Backend de cache: {_cache.__class__.__name__}")
+    return _cache
@@ -0,0 +1,369 @@
+"""
+Barramento de invalidação de cache entre workers
+
+As escritas nos modelos rastreados publicam eventos (entity, company_id, id):
+- Modo 'listen' (padrão no PostgreSQL): pg_notify dentro da transação, entregue somente
+  após o commit; uma thread LISTEN em cada worker recebe e despacha os eventos
+- Modo 'poll': os eventos são gravados em cache_invalidation_events e lidos periodicamente
+- Modo 'off': apenas invalidação local no próprio processo
+
+O worker que fez a escrita invalida seu cache local logo após o commit e ignora o eco
+do próprio evento. Handlers recebem (company_id, entity_id); valores None significam
+"invalidar todas as entradas da entidade" (usado também após reconexão do listener).
+
+Configuração:
+    CACHE_BUS_MODE: 'listen', 'poll' ou 'off' (padrão: 'listen' no PostgreSQL, 'off' nos demais)
+    CACHE_BUS_POLL_INTERVAL: Intervalo do polling em segundos (padrão: 2)
+    CACHE_BUS_POLL_LOOKBACK: Janela relida a cada polling, em segundos (padrão: 60)
+    CACHE_BUS_RETENTION: Tempo de retenção dos eventos do polling em segundos (padrão: 3600)
+
+A thread do barramento e o identificador do worker são criados por processo, na
+primeira requisição: com `gunicorn --preload` o app é importado no processo mestre e
+cada worker criado por fork inicia a sua própria thread, com o seu próprio ID.
+"""
+import os
+import json
+import uuid
+import time
+import select
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event, text, insert, select as sa_select
+from sqlalchemy.orm import Session, object_session
+
+logger = logging.getLogger(__name__)
+
+CACHE_BUS_CHANNEL = 'cache_invalidation'
+CACHE_BUS_MODE = os.environ.get('CACHE_BUS_MODE', '').lower()
+CACHE_BUS_POLL_INTERVAL = float(os.environ.get('CACHE_BUS_POLL_INTERVAL', 2))
+CACHE_BUS_POLL_LOOKBACK = float(os.environ.get('CACHE_BUS_POLL_LOOKBACK', 60))
+CACHE_BUS_RETENTION = int(os.environ.get('CACHE_BUS_RETENTION', 3600))
+
+# entity -> [handler(company_id, entity_id)]
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+# Classe do modelo -> (entity, função obj -> (company_id, entity_id))
+_tracked_models = {}
+
+_mode = 'off'
+_initialized = False
+_stop = threading.Event()
+
+# Processo dono do ID do worker e da thread do barramento (mudam após um fork)
+_worker_pid = None
+_worker_id = None
+_thread_pid = None
+_thread_lock = threading.Lock()
+
+
+def worker_id():
+    """Identificador deste processo, para ignorar o eco dos próprios eventos"""
+    global _worker_pid, _worker_id
+    pid = os.getpid()
+    if _worker_pid != pid:
+        _worker_id = f"{pid}-{uuid.uuid4().hex[:8]}"
+        _worker_pid = pid
+    return _worker_id
+
+
+def register_invalidation_handler(entity, handler):
+    """
+    Registra uma função chamada quando a entidade é alterada em qualquer worker
+
+    Args:
+        entity (str): Nome da entidade (ex: 'plant') ou '*' para todos os eventos
+        handler: Função handler(company_id, entity_id)
+    """
+    with _handlers_lock:
+        _handlers.setdefault(entity, []).append(handler)
+
+
+def track_model(model, entity, key=None):
+    """
+    Passa a publicar eventos de invalidação nas escritas do modelo
+
+    Args:
+        model: Classe do modelo SQLAlchemy
+        entity (str): Nome da entidade publicada
+        key: Função obj -> (company_id, entity_id); padrão (obj.company_id, obj.id)
+    """
+    _tracked_models[model] = (entity, key or (lambda obj: (getattr(obj, 'company_id', None), obj.id)))
+
+
+def dispatch(entity, company_id=None, entity_id=None):
+    """Executa os handlers locais registrados para a entidade"""
+    with _handlers_lock:
+        handlers = list(_handlers.get(entity, [])) + list(_handlers.get('*', []))
+    for handler in handlers:
+        try:
+            handler(company_id, entity_id)
+        except Exception as e:
+            logger.error(f"[cache_bus] Erro no handler de invalidação de {entity}: {e}")
+
+
+def _reset_all():
+    """Invalida tudo - usado quando eventos podem ter sido perdidos"""
+    with _handlers_lock:
+        entities = [entity for entity in _handlers if entity != '*']
+    for entity in entities:
+        dispatch(entity)
+
+
+def _handle_payload(payload):
+    if payload.get('origin') == worker_id():
+        return
+    dispatch(payload['entity'], payload.get('company_id'), payload.get('id'))
+
+
+def publish(session, entity, company_id=None, entity_id=None):
+    """
+    Publica um evento de invalidação na transação da sessão
+
+    O evento só é entregue aos outros workers após o commit e é descartado no rollback.
+    """
+    entity_id = str(entity_id) if entity_id is not None else None
+    pending = session.info.setdefault('cache_bus_pending', set())
+    if (entity, company_id, entity_id) in pending:
+        return
+    pending.add((entity, company_id, entity_id))
+
+    if _mode == 'listen':
+        payload = json.dumps({'entity': entity, 'company_id': company_id, 'id': entity_id, 'origin': worker_id()})
+        session.connection().execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {'channel': CACHE_BUS_CHANNEL, 'payload': payload}
+        )
+    elif _mode == 'poll':
+        from src.models.cache_invalidation_event import CacheInvalidationEvent
+        session.connection().execute(insert(CacheInvalidationEvent.__table__).values(
+            entity=entity, company_id=company_id, entity_id=entity_id,
+            origin=worker_id(), created_at=datetime.utcnow()
+        ))
+
+
+def _on_after_flush(session, flush_context):
+    if not _tracked_models:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tracked = _tracked_models.get(type(obj))
+        if not tracked:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        entity, key = tracked
+        company_id, entity_id = key(obj)
+        publish(session, entity, company_id, entity_id)
+
+
+def _on_after_commit(session):
+    pending = session.info.pop('cache_bus_pending', None)
+    for entity, company_id, entity_id in pending or ():
+        dispatch(entity, company_id, entity_id)
+
+
+def _on_after_rollback(session):
+    session.info.pop('cache_bus_pending', None)
+
+
+def _listen_loop(engine, connect_args):
+    """Thread LISTEN: mantém uma conexão dedicada (fora do pool) e despacha as notificações"""
+    backoff = 1
+    first_connection = True
+    while not _stop.is_set():
+        connection = None
+        try:
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            cparams.update(connect_args)
+            connection = engine.dialect.dbapi.connect(*cargs, **cparams)
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CACHE_BUS_CHANNEL}")
+            logger.info("[cache_bus] Listener de invalidação conectado")
+            if not first_connection:
+                # Eventos publicados enquanto estávamos desconectados foram perdidos
+                _reset_all()
+            first_connection = False
+            backoff = 1
+
+            while not _stop.is_set():
+                if select.select([connection], [], [], 5) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    try:
+                        _handle_payload(json.loads(notification.payload))
+                    except (ValueError, KeyError) as e:
+                        logger.warning(f"[cache_bus] Notificação inválida ignorada: {e}")
+        except Exception as e:
+            logger.error(f"[cache_bus] Erro no listener de invalidação: {e} - reconectando em {backoff}s")
+            first_connection = False
+            _stop.wait(backoff)
+            backoff = min(backoff * 2, 60)
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+
+class EventPoller:
+    """
+    Lê os eventos de cache_invalidation_events (modo 'poll')
+
+    Os ids vêm de uma sequência, mas uma transação que obteve um id menor pode fazer
+    commit depois de outra com id maior; acompanhar só "id > último lido" perderia esse
+    evento para sempre. Cada leitura relê a janela dos últimos CACHE_BUS_POLL_LOOKBACK
+    segundos (por created_at) e ignora os ids já despachados. Um evento cujo commit
+    demore mais que a janela (somada à diferença de relógio entre os workers) se perde.
+    """
+
+    def __init__(self, lookback=CACHE_BUS_POLL_LOOKBACK):
+        self.lookback = lookback
+        # id -> created_at dos eventos já vistos dentro da janela
+        self.seen = {}
+        self.primed = False
+
+    def poll(self, session):
+        """Despacha os eventos novos da janela. Retorna quantos foram despachados"""
+        from src.models.cache_invalidation_event import CacheInvalidationEvent
+
+        window_start = datetime.utcnow() - timedelta(seconds=self.lookback)
+        events = session.query(CacheInvalidationEvent).filter(
+            CacheInvalidationEvent.created_at >= window_start
+        ).order_by(CacheInvalidationEvent.id).all()
+
+        dispatched = 0
+        for invalidation in events:
+            if invalidation.id in self.seen:
+                continue
+            self.seen[invalidation.id] = invalidation.created_at
+            # Na primeira leitura o cache do worker ainda está vazio: só marca como visto
+            if self.primed:
+                _handle_payload(invalidation.to_dict())
+                dispatched += 1
+        self.primed = True
+
+        for event_id in [event_id for event_id, created_at in self.seen.items() if created_at < window_start]:
+            del self.seen[event_id]
+        return dispatched
+
+
+def _poll_loop(app, db):
+    """Thread de polling: lê os eventos novos da tabela cache_invalidation_events"""
+    from src.models.cache_invalidation_event import CacheInvalidationEvent
+
+    poller = EventPoller()
+    last_cleanup = 0
+    while not _stop.is_set():
+        try:
+            with app.app_context():
+                poller.poll(db.session)
+
+                if time.monotonic() - last_cleanup > 60:
+                    last_cleanup = time.monotonic()
+                    CacheInvalidationEvent.query.filter(
+                        CacheInvalidationEvent.created_at < datetime.utcnow() - timedelta(seconds=CACHE_BUS_RETENTION)
+                    ).delete(synchronize_session=False)
+                    db.session.commit()
+                db.session.remove()
+        except Exception as e:
+            logger.error(f"[cache_bus] Erro no polling de invalidação: {e}")
+            # Eventos podem ter sido perdidos; invalida tudo
+            _reset_all()
+        _stop.wait(CACHE_BUS_POLL_INTERVAL)
+
+
+def _start_bus_thread(app, db):
+    """Inicia a thread do barramento deste processo (uma vez por processo)"""
+    global _thread_pid
+    if _thread_pid == os.getpid() or _mode not in ('listen', 'poll'):
+        return
+    with _thread_lock:
+        if _thread_pid == os.getpid():
+            return
+        _thread_pid = os.getpid()
+        if _mode == 'listen':
+            with app.app_context():
+                engine = db.engine
+            connect_args = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).get('connect_args', {})
+            thread = threading.Thread(target=_listen_loop, args=(engine, connect_args), name='cache-bus-listen', daemon=True)
+        else:
+            thread = threading.Thread(target=_poll_loop, args=(app, db), name='cache-bus-poll', daemon=True)
+        thread.start()
+    logger.info(f"[cache_bus] Thread do barramento iniciada no modo '{_mode}' (worker {worker_id()})")
+
+
+def _plant_company_id(obj):
+    """
+    company_id da planta do objeto (bloqueios não têm company_id próprio)
+
+    Bloqueios sem planta valem para todas as plantas: None invalida todas as companies.
+    Roda dentro do flush, então consulta direto pela conexão da sessão (sem autoflush).
+    """
+    if obj.plant_id is None:
+        return None
+    from src.models.plant import Plant
+    session = object_session(obj)
+    if session is None:
+        return None
+    return session.connection().execute(
+        sa_select(Plant.company_id).where(Plant.id == obj.plant_id)
+    ).scalar()
+
+
+def init_cache_bus(app, db):
+    """Registra os eventos de sessão e inicia a thread do barramento conforme CACHE_BUS_MODE"""
+    global _mode, _initialized
+    if _initialized:
+        return
+    _initialized = True
+
+    from src.models.plant import Plant
+    from src.models.supplier import Supplier
+    from src.models.system_config import SystemConfig
+    from src.models.permission import Permission
+    from src.models.operating_hours import OperatingHours
+    from src.models.default_schedule import DefaultSchedule
+    from src.models.schedule_config import ScheduleConfig
+    from src.models.appointment import Appointment
+
+    track_model(Plant, 'plant')
+    track_model(Supplier, 'supplier')
+    track_model(SystemConfig, 'system_config', lambda obj: (obj.company_id, obj.key))
+    track_model(Permission, 'permission', lambda obj: (obj.company_id, obj.role))
+    # Horários são invalidados por planta (NULL = configuração que vale para todas)
+    track_model(OperatingHours, 'operating_hours', lambda obj: (obj.company_id, obj.plant_id))
+    track_model(DefaultSchedule, 'default_schedule', lambda obj: (_plant_company_id(obj), obj.plant_id))
+    track_model(ScheduleConfig, 'schedule_config', lambda obj: (_plant_company_id(obj), obj.plant_id))
+    track_model(Appointment, 'appointment')
+
+    with app.app_context():
+        engine = db.engine
+    is_postgres = engine.dialect.name == 'postgresql'
+
+    _mode = CACHE_BUS_MODE or ('listen' if is_postgres else 'off')
+    if _mode == 'listen' and not is_postgres:
+        logger.warning("[cache_bus] Modo 'listen' requer PostgreSQL - usando apenas invalidação local")
+        _mode = 'off'
+
+    event.listen(Session, 'after_flush', _on_after_flush)
+    event.listen(Session, 'after_commit', _on_after_commit)
+    event.listen(Session, 'after_rollback', _on_after_rollback)
+
+    # A thread nasce no processo que atende as requisições (após o fork dos workers),
+    # não no processo que importou o app
+    @app.before_request
+    def _ensure_cache_bus_thread():
+        if _thread_pid != os.getpid():
+            _start_bus_thread(app, db)
+
+    logger.info(f"[cache_bus] Barramento de invalidação no modo '{_mode}'")
+
+
+def stop_cache_bus():
+    """Encerra a thread do barramento"""
+    _stop.set()
@@ -5,6 +5,7 @@ from functools import wraps
 from flask import request, jsonify
 import jwt
 from src.models.user import User
+from src.utils.db_routing import set_request_company
 from src.models.company import Company
 
 # SECRET_KEY: usar variável de ambiente em produção
@@ -24,6 +25,8 @@ def get_current_user_from_token():
         
         payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
         current_user = User.query.get(payload['user_id'])
+        if current_user:
+            set_request_company(current_user.company_id)
         
         return current_user
     except:
@@ -0,0 +1,184 @@
+"""
+Manutenção incremental do agregado diário de agendamentos (appointment_daily_stats)
+
+Cada flush que cria, altera ou remove agendamentos aplica os deltas de contagem e de
+minutos reservados na mesma transação, via INSERT ... ON CONFLICT DO UPDATE.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.appointment_daily_stat import AppointmentDailyStat
+from src.models.appointment_archive import AppointmentArchive
+from src.utils.appointment_archive import appointment_source
+
+logger = logging.getLogger(__name__)
+
+# Duração assumida para agendamentos sem horário final (1 slot)
+DEFAULT_SLOT_MINUTES = 60
+
+# Atributos que mudam a chave ou os minutos do agregado
+_TRACKED_ATTRS = ('company_id', 'plant_id', 'supplier_id', 'date', 'status', 'time', 'time_end')
+
+_initialized = False
+
+
+def booked_minutes(start_time, end_time):
+    """Duração do agendamento em minutos (1 slot quando não há horário final válido)"""
+    if not start_time or not end_time:
+        return DEFAULT_SLOT_MINUTES
+    minutes = (end_time.hour * 60 + end_time.minute) - (start_time.hour * 60 + start_time.minute)
+    return minutes if minutes > 0 else DEFAULT_SLOT_MINUTES
+
+
+def _stat_key(values):
+    return (values['company_id'], values['plant_id'] or 0, values['supplier_id'], values['date'], values['status'])
+
+
+def _current_values(obj):
+    return {attr: getattr(obj, attr) for attr in _TRACKED_ATTRS}
+
+
+def _previous_values(obj):
+    """Valores anteriores ao flush (para agendamentos alterados)"""
+    state = inspect(obj)
+    values = {}
+    for attr in _TRACKED_ATTRS:
+        history = state.attrs[attr].history
+        if history.deleted:
+            values[attr] = history.deleted[0]
+        elif history.unchanged:
+            values[attr] = history.unchanged[0]
+        else:
+            values[attr] = getattr(obj, attr)
+    return values
+
+
+def _add_delta(deltas, values, sign):
+    if values['company_id'] is None or values['supplier_id'] is None or values['date'] is None or not values['status']:
+        return
+    key = _stat_key(values)
+    count, minutes = deltas.get(key, (0, 0))
+    deltas[key] = (count + sign, minutes + sign * booked_minutes(values['time'], values['time_end']))
+
+
+def apply_deltas(connection, deltas):
+    """Aplica deltas {(company_id, plant_id, supplier_id, date, status): (count, minutes)} no agregado"""
+    rows = [
+        {
+            'company_id': company_id, 'plant_id': plant_id, 'supplier_id': supplier_id,
+            'date': date, 'status': status, 'count': count, 'booked_minutes': minutes
+        }
+        for (company_id, plant_id, supplier_id, date, status), (count, minutes) in deltas.items()
+        if count or minutes
+    ]
+    if not rows:
+        return
+
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = AppointmentDailyStat.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['company_id', 'plant_id', 'supplier_id', 'date', 'status'],
+        set_={
+            'count': table.c.count + statement.excluded.count,
+            'booked_minutes': table.c.booked_minutes + statement.excluded.booked_minutes
+        }
+    )
+    connection.execute(statement, rows)
+
+
+def _on_after_flush(session, flush_context):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            _add_delta(deltas, _current_values(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            _add_delta(deltas, _previous_values(obj), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj):
+            state = inspect(obj)
+            if not any(state.attrs[attr].history.has_changes() for attr in _TRACKED_ATTRS):
+                continue
+            _add_delta(deltas, _previous_values(obj), -1)
+            _add_delta(deltas, _current_values(obj), 1)
+
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _noop_set(target, value, oldvalue, initiator):
+    return value
+
+
+def init_daily_stats():
+    """Registra a manutenção do agregado nos flushes da sessão"""
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+    # active_history garante o valor anterior mesmo quando o agendamento estava expirado (ex: após um commit)
+    for attr in _TRACKED_ATTRS:
+        event.listen(getattr(Appointment, attr), 'set', _noop_set, active_history=True)
+    event.listen(Session, 'after_flush', _on_after_flush)
+
+
+def backfill_daily_stats(company_id=None, batch_size=5000):
+    """
+    Recalcula o agregado a partir dos agendamentos existentes
+
+    Args:
+        company_id: Recalcular apenas esta company (None = todas)
+        batch_size: Linhas lidas por lote
+
+    Returns:
+        int: Quantidade de linhas gravadas no agregado
+    """
+    company_ids = [company_id] if company_id is not None else sorted(
+        {row[0] for row in db.session.query(Appointment.company_id).distinct()} |
+        {row[0] for row in db.session.query(AppointmentArchive.company_id).distinct()}
+    )
+
+    total_rows = 0
+    for current_company_id in company_ids:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Bloqueia escritas de agendamentos até o commit para o recálculo não perder deltas concorrentes
+            db.session.execute(text('LOCK TABLE appointment IN SHARE MODE'))
+        deltas = {}
+        # Inclui os agendamentos arquivados, que continuam contando no agregado
+        source = appointment_source(current_company_id)
+        query = db.session.query(
+            source.company_id, source.plant_id, source.supplier_id,
+            source.date, source.status, source.time, source.time_end
+        ).filter(source.company_id == current_company_id).execution_options(yield_per=batch_size)
+        for row in query:
+            _add_delta(deltas, dict(zip(_TRACKED_ATTRS, (
+                row.company_id, row.plant_id, row.supplier_id, row.date, row.status, row.time, row.time_end
+            ))), 1)
+
+        # Substitui o agregado da company na mesma transação
+        AppointmentDailyStat.query.filter_by(company_id=current_company_id).delete(synchronize_session=False)
+        apply_deltas(db.session.connection(), deltas)
+        db.session.commit()
+        total_rows += len(deltas)
+        logger.info(f"[daily_stats] Company {current_company_id}: {len(deltas)} linhas no agregado")
+
+    return total_rows
+
+
+def ensure_daily_stats():
+    """Preenche o agregado na primeira inicialização (tabela vazia com agendamentos existentes)"""
+    if db.session.query(AppointmentDailyStat.id).first() is not None:
+        return
+    if db.session.query(Appointment.id).first() is None:
+        return
+    started = datetime.utcnow()
+    rows = backfill_daily_stats()
+    logger.info(f"[daily_stats] Agregado diário preenchido com {rows} linhas em {(datetime.utcnow() - started).total_seconds():.1f}s")
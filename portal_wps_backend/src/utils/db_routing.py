@@ -0,0 +1,155 @@
+"""
+Roteamento de leituras para a réplica do banco de dados
+
+Com DATABASE_READ_URL configurada, a sessão escolhe o banco de cada comando:
+- requisições GET/HEAD e relatórios em segundo plano leem da réplica
+- escritas (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE e SQL textual) vão
+  para o primário, e a partir da primeira escrita a requisição fica no primário
+  até o fim ("stick to primary after write")
+- rotas decoradas com @use_primary sempre leem do primário
+- por DATABASE_READ_STICKY_SECONDS após uma gravação da company (neste ou em outro
+  worker, recebida pelo barramento de invalidação) as leituras da company vão para o
+  primário, cobrindo o atraso de replicação no "gravar e recarregar a tela" e evitando
+  que caches invalidados sejam repreenchidos com dados antigos da réplica
+
+Sem DATABASE_READ_URL todo o tráfego usa o banco principal, como antes.
+
+Configuração:
+    DATABASE_READ_URL: URL da réplica de leitura (opcional)
+    DATABASE_READ_STICKY_SECONDS: Janela de leitura no primário após gravações (padrão: 5)
+"""
+import os
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from flask import g, request, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from src.utils.cache_bus import register_invalidation_handler
+
+DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL', '').strip()
+DATABASE_READ_STICKY_SECONDS = float(os.environ.get('DATABASE_READ_STICKY_SECONDS', 5))
+
+REPLICA_BIND_KEY = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+# company_id -> instante (monotonic) da última gravação; None = gravação sem company
+_last_write = {}
+_last_write_lock = threading.Lock()
+
+
+def _is_write(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, (UpdateBase, TextClause)):
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+def _recently_written(company_id):
+    now = time.monotonic()
+    with _last_write_lock:
+        last_global = _last_write.get(None)
+        last_company = _last_write.get(company_id) if company_id is not None else None
+    return any(
+        last is not None and now - last < DATABASE_READ_STICKY_SECONDS
+        for last in (last_global, last_company)
+    )
+
+
+def _use_replica(session, clause):
+    """Decide se o comando pode ir para a réplica (e marca a requisição após escritas)"""
+    if not has_app_context():
+        return False
+    if session._flushing or _is_write(clause):
+        g.db_wrote = True
+        return False
+    if g.get('db_force_replica'):
+        return True
+    if not g.get('db_read_replica') or g.get('db_wrote'):
+        return False
+    # Sem company identificada (ex: carregamento do usuário na autenticação) vale só a janela global
+    return not _recently_written(g.get('db_company_id'))
+
+
+class RoutingSession(Session):
+    """Sessão que envia leituras elegíveis para a réplica (bind 'replica')"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return engine
+        engines = self._db.engines
+        replica = engines.get(REPLICA_BIND_KEY)
+        if replica is None or engine is not engines.get(None):
+            return engine
+        return replica if _use_replica(self, clause) else engine
+
+
+def replica_bind_config(engine_options):
+    """
+    Configuração do bind da réplica para SQLALCHEMY_BINDS ({} sem DATABASE_READ_URL)
+
+    Args:
+        engine_options: Opções do engine principal (pool, connect_args) reaproveitadas na réplica
+    """
+    if not DATABASE_READ_URL:
+        return {}
+    url = DATABASE_READ_URL
+    if url.startswith('postgresql://') and '+psycopg2' not in url:
+        url = url.replace('postgresql://', 'postgresql+psycopg2://', 1)
+    connect_args = dict(engine_options.get('connect_args', {}))
+    if 'application_name' in connect_args:
+        connect_args['application_name'] = f"{connect_args['application_name']}_replica"
+    return {REPLICA_BIND_KEY: {**engine_options, 'url': url, 'connect_args': connect_args}}
+
+
+def set_request_company(company_id):
+    """Informa a company da requisição (chamado pelos decorators de autenticação)"""
+    if has_app_context():
+        g.db_company_id = company_id
+
+
+def use_primary(f):
+    """Decorator para rotas GET que precisam ler o que acabou de ser gravado"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_read_replica = False
+        return f(*args, **kwargs)
+    return decorated
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Envia as leituras do bloco para a réplica, mesmo após escritas no contexto
+
+    Usado por processamentos que toleram o atraso de replicação (ex: relatórios em
+    segundo plano, que gravam o próprio status antes de gerar o resultado).
+    """
+    previous = g.get('db_force_replica', False)
+    g.db_force_replica = True
+    try:
+        yield
+    finally:
+        g.db_force_replica = previous
+
+
+def _on_data_changed(company_id, entity_id):
+    with _last_write_lock:
+        _last_write[company_id] = time.monotonic()
+
+
+def init_read_routing(app):
+    """Marca as requisições de leitura como elegíveis para a réplica"""
+    if not DATABASE_READ_URL:
+        return
+
+    @app.before_request
+    def _route_reads():
+        g.db_read_replica = request.method in READ_METHODS
+        g.db_wrote = False
+
+    register_invalidation_handler('*', _on_data_changed)
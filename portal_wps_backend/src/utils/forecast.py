@@ -0,0 +1,152 @@
+"""
+Previsão de demanda de agendamentos por planta
+
+A previsão de cada dia é a média móvel das últimas `history_weeks` ocorrências do
+mesmo dia da semana (sazonalidade semanal), lida do agregado diário. A ocupação
+esperada por hora vem do mapa de calor do mesmo histórico. Dias em que as horas
+reservadas previstas excedem as horas disponíveis (funcionamento - bloqueios x
+capacidade máxima) são sinalizados.
+
+Todas as plantas são calculadas em lote com um número fixo de consultas.
+"""
+from datetime import timedelta
+from sqlalchemy import func, cast, Integer
+from src.models.user import db
+from src.models.appointment_daily_stat import AppointmentDailyStat
+from src.utils.daily_stats import booked_minutes
+from src.utils.appointment_archive import appointment_source
+from src.utils.occupancy import load_schedules, available_minutes, occupancy_heatmap
+from src.utils.reports import CONFIRMED_STATUSES, HEATMAP_DAY_NAMES
+
+
+def _db_day_of_week(day):
+    """Dia da semana no formato do banco (0=Domingo, 6=Sábado)"""
+    return (day.weekday() + 1) % 7
+
+
+def _load_daily_history(company_id, plant_ids, start_date, end_date, history_weeks):
+    """Média de agendamentos e minutos reservados por planta e dia da semana"""
+    appointments = {plant_id: [0.0] * 7 for plant_id in plant_ids}
+    minutes = {plant_id: [0.0] * 7 for plant_id in plant_ids}
+    rows = db.session.query(
+        AppointmentDailyStat.plant_id,
+        AppointmentDailyStat.date,
+        func.sum(AppointmentDailyStat.count),
+        func.sum(AppointmentDailyStat.booked_minutes)
+    ).filter(
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.plant_id.in_(plant_ids),
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date,
+        AppointmentDailyStat.status.in_(CONFIRMED_STATUSES)
+    ).group_by(AppointmentDailyStat.plant_id, AppointmentDailyStat.date)
+
+    # Dias sem agendamentos não têm linha no agregado e entram na média como zero
+    for plant_id, day, count, booked in rows:
+        day_of_week = _db_day_of_week(day)
+        appointments[plant_id][day_of_week] += (count or 0) / history_weeks
+        minutes[plant_id][day_of_week] += (booked or 0) / history_weeks
+    return appointments, minutes
+
+
+def _load_hourly_history(company_id, plant_ids, start_date, end_date, history_weeks):
+    """Ocupação média por dia da semana x hora (agendamentos simultâneos) de cada planta"""
+    source = appointment_source(company_id, start_date)
+    day_of_week = cast(func.extract('dow', source.date), Integer)
+    rows = db.session.query(
+        source.plant_id, day_of_week, source.time, source.time_end, func.count()
+    ).filter(
+        source.company_id == company_id,
+        source.plant_id.in_(plant_ids),
+        source.date >= start_date,
+        source.date <= end_date,
+        source.status.in_(CONFIRMED_STATUSES)
+    ).group_by(source.plant_id, day_of_week, source.time, source.time_end)
+
+    intervals = {plant_id: [] for plant_id in plant_ids}
+    for plant_id, dow, start_time, end_time, count in rows:
+        start_minutes = start_time.hour * 60 + start_time.minute
+        intervals[plant_id].append((int(dow), start_minutes, start_minutes + booked_minutes(start_time, end_time), count))
+
+    occurrences = [history_weeks] * 7
+    return {
+        plant_id: occupancy_heatmap(plant_intervals, occurrences, 60)['average']
+        for plant_id, plant_intervals in intervals.items()
+    }
+
+
+def build_demand_forecast(company_id, plants, today, weeks=4, history_weeks=8):
+    """
+    Previsão de agendamentos por planta para as próximas semanas
+
+    Args:
+        company_id: ID da company
+        plants: Plantas (já validadas como pertencentes à company)
+        today: Primeiro dia da previsão (date); o histórico são as semanas completas anteriores
+        weeks: Semanas previstas
+        history_weeks: Semanas de histórico da média móvel
+
+    Returns:
+        dict: plants (previsão diária, ocupação esperada por hora e dias acima da capacidade),
+              period e history
+    """
+    history_start = today - timedelta(weeks=history_weeks)
+    history_end = today - timedelta(days=1)
+    forecast_end = today + timedelta(weeks=weeks) - timedelta(days=1)
+
+    plant_ids = [plant.id for plant in plants]
+    daily_appointments, daily_minutes = _load_daily_history(
+        company_id, plant_ids, history_start, history_end, history_weeks
+    )
+    hourly = _load_hourly_history(company_id, plant_ids, history_start, history_end, history_weeks)
+    schedules, date_blocks = load_schedules(plant_ids, today, forecast_end)
+
+    forecast_days = [today + timedelta(days=offset) for offset in range(weeks * 7)]
+
+    result = []
+    for plant in plants:
+        max_capacity = plant.max_capacity or 1
+        profile = hourly[plant.id]
+        days = []
+        for day in forecast_days:
+            day_of_week = _db_day_of_week(day)
+            capacity_minutes = available_minutes(schedules[plant.id], day, day, date_blocks[plant.id]) * max_capacity
+            expected_minutes = daily_minutes[plant.id][day_of_week]
+            days.append({
+                'date': day.isoformat(),
+                'weekday': HEATMAP_DAY_NAMES[day_of_week],
+                'expected_appointments': round(daily_appointments[plant.id][day_of_week], 2),
+                'expected_booked_hours': round(expected_minutes / 60, 2),
+                'capacity_hours': round(capacity_minutes / 60, 2),
+                'utilization': round(expected_minutes / capacity_minutes * 100, 2) if capacity_minutes > 0 else None,
+                'over_capacity': expected_minutes > capacity_minutes,
+                # Horas em que a ocupação média esperada supera a capacidade por horário
+                'hours_over_capacity': [
+                    f'{hour:02d}:00' for hour, value in enumerate(profile[day_of_week]) if value > max_capacity
+                ]
+            })
+
+        result.append({
+            'plant': {
+                'id': plant.id,
+                'name': plant.name,
+                'max_capacity': plant.max_capacity
+            },
+            'days': days,
+            'over_capacity_days': sum(1 for day in days if day['over_capacity'] or day['hours_over_capacity']),
+            # Ocupação esperada (agendamentos simultâneos) por dia da semana (0=Domingo) x hora
+            'hourly_profile': [[round(value, 2) for value in hours] for hours in profile]
+        })
+
+    return {
+        'plants': result,
+        'period': {
+            'start_date': today.isoformat(),
+            'end_date': forecast_end.isoformat()
+        },
+        'history': {
+            'start_date': history_start.isoformat(),
+            'end_date': history_end.isoformat(),
+            'weeks': history_weeks
+        }
+    }
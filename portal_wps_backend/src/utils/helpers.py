@@ -19,18 +19,25 @@ def generate_temp_password(length=8):
     return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(length))
 
 
-def generate_appointment_number(appointment_date=None):
+def generate_appointment_number(company_id, appointment_date=None):
     """
-    Gera um número único de agendamento no formato AG-YYYYMMDD-XXXX
-    onde XXXX é um número sequencial baseado na data
+    Gera e reserva um número único de agendamento no formato AG-YYYYMMDD-XXXX
+    onde XXXX é um número sequencial da company baseado na data
+    
+    O número é gravado em appointment_numbers (em um savepoint da sessão atual), cuja
+    chave primária impede a repetição na company, inclusive de números de agendamentos
+    reagendados ou arquivados. Se a transação do agendamento for desfeita, a reserva
+    também é.
     
     Args:
+        company_id (int): ID da company do agendamento
         appointment_date (date, optional): Data do agendamento. Se None, usa a data atual.
     
     Returns:
         str: Número único do agendamento (ex: AG-20260114-0001)
     """
-    from src.models.appointment import Appointment
+    from sqlalchemy.exc import IntegrityError
+    from src.models.appointment_number import AppointmentNumber
     from src.models.user import db
     
     # Usar a data do agendamento ou data atual
@@ -41,33 +48,27 @@ def generate_appointment_number(appointment_date=None):
     
     date_str = date_obj.strftime('%Y%m%d')
     
-    # Buscar o último número usado para esta data
     # Formato: AG-YYYYMMDD-XXXX
     prefix = f"AG-{date_str}-"
     
-    # Buscar o maior número sequencial para esta data
-    last_appointment = Appointment.query.filter(
-        Appointment.appointment_number.like(f"{prefix}%")
-    ).order_by(Appointment.appointment_number.desc()).first()
+    # Buscar o maior número sequencial da company para esta data (ativos e arquivados)
+    last_number = db.session.query(db.func.max(AppointmentNumber.appointment_number)).filter(
+        AppointmentNumber.company_id == company_id,
+        AppointmentNumber.appointment_number.like(f"{prefix}%")
+    ).scalar()
     
-    if last_appointment and last_appointment.appointment_number:
-        # Extrair o número sequencial do último agendamento
-        try:
-            last_number_str = last_appointment.appointment_number.split('-')[-1]
-            last_number = int(last_number_str)
-            next_number = last_number + 1
-        except (ValueError, IndexError):
-            next_number = 1
-    else:
+    try:
+        next_number = int(last_number.split('-')[-1]) + 1 if last_number else 1
+    except (ValueError, IndexError):
         next_number = 1
     
-    # Gerar número no formato AG-YYYYMMDD-XXXX
-    appointment_number = f"{prefix}{next_number:04d}"
-    
-    # Verificar se já existe (proteção contra race conditions)
-    while Appointment.query.filter_by(appointment_number=appointment_number).first():
-        next_number += 1
+    # Reservar o número; em caso de corrida com outra requisição, tenta o próximo
+    while True:
         appointment_number = f"{prefix}{next_number:04d}"
-    
-    return appointment_number
-
+        try:
+            with db.session.begin_nested():
+                db.session.add(AppointmentNumber(company_id=company_id, appointment_number=appointment_number))
+        except IntegrityError:
+            next_number += 1
+            continue
+        return appointment_number
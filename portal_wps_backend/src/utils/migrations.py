@@ -0,0 +1,163 @@
+"""
+Migrações versionadas do banco de dados
+
+Cada migração é um módulo em src/migrations com nome NNNN_descricao.py que define:
+    DESCRIPTION: Descrição curta
+    TRANSACTIONAL: False quando usa comandos que não rodam em transação
+                   (ex: CREATE INDEX CONCURRENTLY) - padrão: True
+    upgrade(connection): Aplica a migração
+
+As versões aplicadas ficam na tabela schema_migrations. As migrações rodam pelo
+comando `python manage.py migrate` (antes do deploy), nunca na inicialização dos
+workers. No PostgreSQL um advisory lock impede execuções simultâneas.
+"""
+import re
+import pkgutil
+import logging
+import importlib
+from datetime import datetime
+from sqlalchemy import text
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PACKAGE = 'src.migrations'
+MIGRATION_NAME_PATTERN = re.compile(r'^(\d{4})_\w+$')
+
+# Chave do advisory lock das migrações (valor arbitrário e fixo)
+MIGRATIONS_LOCK_KEY = 727274001
+
+
+def discover_migrations():
+    """Lista as migrações disponíveis em ordem: [(versão, módulo)]"""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    migrations = []
+    for module_info in pkgutil.iter_modules(package.__path__):
+        match = MIGRATION_NAME_PATTERN.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{MIGRATIONS_PACKAGE}.{module_info.name}')
+        migrations.append((module_info.name, module))
+    return sorted(migrations, key=lambda item: item[0])
+
+
+def _ensure_migrations_table(connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        ' version VARCHAR(100) PRIMARY KEY,'
+        ' description VARCHAR(255),'
+        ' applied_at TIMESTAMP NOT NULL'
+        ')'
+    ))
+
+
+def _applied_versions(connection):
+    return {row[0] for row in connection.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def _record_version(connection, version, description):
+    connection.execute(
+        text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:version, :description, :applied_at)'),
+        {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+    )
+
+
+def pending_migrations(engine=None):
+    """Versões ainda não aplicadas (sem criar a tabela de controle)"""
+    engine = engine or db.engine
+    available = [version for version, _ in discover_migrations()]
+    with engine.connect() as connection:
+        if not engine.dialect.has_table(connection, 'schema_migrations'):
+            return available
+        applied = _applied_versions(connection)
+    return [version for version in available if version not in applied]
+
+
+def migration_status(engine=None):
+    """Situação de cada migração: [{'version', 'description', 'applied'}]"""
+    engine = engine or db.engine
+    with engine.connect() as connection:
+        applied = _applied_versions(connection) if engine.dialect.has_table(connection, 'schema_migrations') else set()
+    return [
+        {'version': version, 'description': getattr(module, 'DESCRIPTION', ''), 'applied': version in applied}
+        for version, module in discover_migrations()
+    ]
+
+
+def run_migrations(engine=None):
+    """
+    Aplica as migrações pendentes em ordem
+
+    Returns:
+        list: Versões aplicadas nesta execução
+    """
+    engine = engine or db.engine
+    is_postgres = engine.dialect.name == 'postgresql'
+
+    with engine.connect() as lock_connection:
+        if is_postgres:
+            lock_connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATIONS_LOCK_KEY})
+            lock_connection.commit()
+        try:
+            with engine.begin() as connection:
+                _ensure_migrations_table(connection)
+                applied = _applied_versions(connection)
+
+            executed = []
+            for version, module in discover_migrations():
+                if version in applied:
+                    continue
+                description = getattr(module, 'DESCRIPTION', '')
+                logger.info(f"[migrations] Aplicando {version}: {description}")
+                started = datetime.utcnow()
+
+                if getattr(module, 'TRANSACTIONAL', True):
+                    with engine.begin() as connection:
+                        module.upgrade(connection)
+                        _record_version(connection, version, description)
+                else:
+                    # Cada comando é confirmado imediatamente (necessário para CONCURRENTLY)
+                    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                        module.upgrade(connection)
+                    with engine.begin() as connection:
+                        _record_version(connection, version, description)
+
+                elapsed = (datetime.utcnow() - started).total_seconds()
+                logger.info(f"[migrations] {version} aplicada em {elapsed:.1f}s")
+                executed.append(version)
+            return executed
+        finally:
+            if is_postgres:
+                lock_connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATIONS_LOCK_KEY})
+                lock_connection.commit()
+
+
+def create_index(connection, name, table, columns, unique=False):
+    """
+    Cria um índice se ainda não existir
+
+    No PostgreSQL usa CREATE INDEX CONCURRENTLY (sem bloquear escritas na tabela);
+    a conexão precisa estar em AUTOCOMMIT (migração com TRANSACTIONAL = False).
+    Um índice inválido deixado por uma tentativa anterior interrompida é recriado.
+
+    Args:
+        connection: Conexão da migração
+        name: Nome do índice
+        table: Nome da tabela
+        columns: Expressão das colunas (ex: 'company_id, date' ou 'lower(email), company_id')
+        unique: Cria índice único
+    """
+    unique_sql = 'UNIQUE ' if unique else ''
+    if connection.dialect.name != 'postgresql':
+        connection.execute(text(f'CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
+        return
+
+    invalid = connection.execute(text(
+        'SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid '
+        'WHERE c.relname = :name AND NOT i.indisvalid'
+    ), {'name': name}).first()
+    if invalid:
+        logger.warning(f"[migrations] Índice inválido {name} encontrado; recriando")
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+
+    connection.execute(text(f'CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})'))
@@ -0,0 +1,266 @@
+"""
+Cálculo da taxa de ocupação das plantas sobre as janelas reais de funcionamento
+
+A capacidade disponível de uma planta em um dia é o tempo de funcionamento
+(OperatingHours) menos os bloqueios semanais (DefaultSchedule) e de datas
+específicas (ScheduleConfig), multiplicado pela capacidade máxima por horário.
+A ocupação é a soma da duração dos agendamentos confirmados (agregado diário)
+dividida por essa capacidade (src.utils.reports fornece os minutos reservados).
+
+O período não é percorrido dia a dia: a capacidade de cada dia da semana é
+calculada uma vez e multiplicada pela quantidade de ocorrências desse dia no
+período; apenas as datas com bloqueios específicos são recalculadas. Um ano de
+dados custa o mesmo que uma semana mais as datas bloqueadas.
+"""
+from itertools import accumulate
+from src.models.user import db
+from src.models.operating_hours import OperatingHours
+from src.models.default_schedule import DefaultSchedule
+from src.models.schedule_config import ScheduleConfig
+from src.utils.plant_cache import build_schedule
+
+SLOT_MINUTES = 60
+DAY_MINUTES = 24 * 60
+
+
+def _db_day_of_week(python_weekday):
+    """Converte weekday do Python (0=Segunda) para o formato do banco (0=Domingo, 6=Sábado)"""
+    return 0 if python_weekday == 6 else python_weekday + 1
+
+
+def _operating_window(schedule, db_day):
+    """
+    Janela de funcionamento (início, fim) em minutos, ou None se a planta não abre no dia
+
+    Segue as regras da validação de agendamentos: dias úteis sem configuração
+    funcionam 24h; sábados e domingos sem configuração ativa ficam fechados.
+    """
+    if db_day in (0, 6):
+        entry = schedule['operating_hours']['weekend']['6' if db_day == 0 else '5']
+        if not entry:
+            return None
+    else:
+        entry = schedule['operating_hours']['weekdays']
+        if not entry:
+            return (0, DAY_MINUTES)
+    return (entry['start_minutes'], entry['end_minutes'])
+
+
+def _block_intervals(block_minutes):
+    """
+    Converte horários bloqueados em intervalos (início, fim) em minutos
+
+    Um bloqueio isolado ocupa o slot inteiro. Em uma sequência de slots consecutivos
+    (ex: 12:00 e 13:00 para um intervalo de almoço das 12:00 às 13:00) o último
+    horário marca o fim do intervalo, como na validação de agendamentos.
+    """
+    intervals = []
+    run = []
+    for minutes in sorted(set(block_minutes)):
+        if run and minutes == run[-1] + SLOT_MINUTES:
+            run.append(minutes)
+            continue
+        if run:
+            intervals.append(_run_interval(run))
+        run = [minutes]
+    if run:
+        intervals.append(_run_interval(run))
+    return intervals
+
+
+def _run_interval(run):
+    if len(run) == 1:
+        return (run[0], run[0] + SLOT_MINUTES)
+    return (run[0], run[-1])
+
+
+def _available_minutes(window, block_minutes):
+    """Minutos da janela de funcionamento que não estão bloqueados"""
+    if window is None:
+        return 0
+    start, end = window
+    if end <= start:
+        return 0
+    available = end - start
+    for block_start, block_end in _block_intervals(block_minutes):
+        overlap = min(end, block_end) - max(start, block_start)
+        if overlap > 0:
+            available -= overlap
+    return max(available, 0)
+
+
+def _weekly_block_minutes(schedule, db_day):
+    return [
+        block['minutes'] for block in schedule['weekly_blocks']
+        if block['day_of_week'] is None or block['day_of_week'] == db_day
+    ]
+
+
+def _weekday_counts(start_date, end_date):
+    """Quantidade de ocorrências de cada weekday do Python (0=Segunda) no período"""
+    total_days = (end_date - start_date).days + 1
+    if total_days <= 0:
+        return [0] * 7
+    full_weeks, remainder = divmod(total_days, 7)
+    counts = [full_weeks] * 7
+    first_weekday = start_date.weekday()
+    for offset in range(remainder):
+        counts[(first_weekday + offset) % 7] += 1
+    return counts
+
+
+def available_minutes(schedule, start_date, end_date, date_blocks=None):
+    """
+    Minutos de funcionamento disponíveis no período (por posição de atendimento)
+
+    Args:
+        schedule: Configuração de horários da planta (src.utils.plant_cache.build_schedule)
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+        date_blocks: Bloqueios de datas específicas {date: [minutos]} (opcional)
+
+    Returns:
+        int: Minutos disponíveis no período
+    """
+    counts = _weekday_counts(start_date, end_date)
+    day_minutes = []
+    total = 0
+    for python_weekday in range(7):
+        db_day = _db_day_of_week(python_weekday)
+        minutes = _available_minutes(_operating_window(schedule, db_day), _weekly_block_minutes(schedule, db_day))
+        day_minutes.append(minutes)
+        total += minutes * counts[python_weekday]
+
+    # Datas com bloqueios específicos: substitui o valor do dia da semana pelo valor recalculado
+    for day, minutes_list in (date_blocks or {}).items():
+        if day < start_date or day > end_date:
+            continue
+        python_weekday = day.weekday()
+        db_day = _db_day_of_week(python_weekday)
+        minutes = _available_minutes(
+            _operating_window(schedule, db_day),
+            _weekly_block_minutes(schedule, db_day) + list(minutes_list)
+        )
+        total += minutes - day_minutes[python_weekday]
+
+    return total
+
+
+def load_schedules(plant_ids, start_date, end_date):
+    """
+    Carrega horários, bloqueios semanais e bloqueios de datas de várias plantas
+
+    Usa três consultas, independentemente da quantidade de plantas.
+
+    Returns:
+        tuple: ({plant_id: schedule}, {plant_id: {date: [minutos]}})
+    """
+    plant_ids = list(plant_ids)
+    if not plant_ids:
+        return {}, {}
+
+    configs_by_plant = {plant_id: [] for plant_id in plant_ids}
+    for config in OperatingHours.query.filter(
+        OperatingHours.plant_id.in_(plant_ids),
+        OperatingHours.schedule_type.in_(['weekdays', 'weekend'])
+    ).order_by(OperatingHours.id):
+        configs_by_plant[config.plant_id].append(config)
+
+    blocks_by_plant = {plant_id: [] for plant_id in plant_ids}
+    for block in DefaultSchedule.query.filter(
+        DefaultSchedule.plant_id.in_(plant_ids),
+        DefaultSchedule.is_available == False
+    ).order_by(DefaultSchedule.id):
+        blocks_by_plant[block.plant_id].append(block)
+
+    date_blocks = {plant_id: {} for plant_id in plant_ids}
+    rows = db.session.query(
+        ScheduleConfig.plant_id, ScheduleConfig.date, ScheduleConfig.time
+    ).filter(
+        ScheduleConfig.plant_id.in_(plant_ids),
+        ScheduleConfig.date >= start_date,
+        ScheduleConfig.date <= end_date,
+        ScheduleConfig.is_available == False
+    )
+    for plant_id, day, block_time in rows:
+        date_blocks[plant_id].setdefault(day, []).append(block_time.hour * 60 + block_time.minute)
+
+    schedules = {
+        plant_id: build_schedule(configs_by_plant[plant_id], blocks_by_plant[plant_id])
+        for plant_id in plant_ids
+    }
+    return schedules, date_blocks
+
+
+def occupancy_rates(plant_capacities, booked_by_plant, start_date, end_date):
+    """
+    Taxa de ocupação (%) de cada planta no período
+
+    Args:
+        plant_capacities: {plant_id: max_capacity}
+        booked_by_plant: {plant_id: minutos reservados}
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+
+    Returns:
+        dict: {plant_id: {'rate', 'booked_hours', 'available_hours'}}. Plantas sem
+              horário disponível no período ficam com taxa 0.
+    """
+    schedules, date_blocks = load_schedules(plant_capacities.keys(), start_date, end_date)
+    result = {}
+    for plant_id, max_capacity in plant_capacities.items():
+        capacity_minutes = available_minutes(
+            schedules[plant_id], start_date, end_date, date_blocks[plant_id]
+        ) * (max_capacity or 1)
+        booked = booked_by_plant.get(plant_id, 0)
+        result[plant_id] = {
+            'rate': booked / capacity_minutes * 100 if capacity_minutes > 0 else 0,
+            'booked_hours': booked / 60,
+            'available_hours': capacity_minutes / 60
+        }
+    return result
+
+
+def occupancy_heatmap(intervals, weekday_occurrences, resolution=60):
+    """
+    Matriz dia da semana x horário com a ocupação acumulada dos agendamentos
+
+    Cada intervalo soma +count no minuto inicial e -count no minuto final de um array
+    de diferenças por dia da semana; a soma acumulada dá a quantidade de agendamentos
+    simultâneos em cada minuto, agregada depois em faixas de `resolution` minutos.
+    O custo depende da quantidade de intervalos distintos, não de agendamentos.
+
+    Args:
+        intervals: Iterável de (dia da semana 0=Domingo..6=Sábado, minuto inicial, minuto final, count)
+        weekday_occurrences: Ocorrências de cada dia da semana no período (0=Domingo..6=Sábado)
+        resolution: Tamanho da faixa em minutos (divisor de 1440)
+
+    Returns:
+        dict: absolute (agendamentos-faixa somados no período) e average (média por dia)
+    """
+    diffs = [[0] * (DAY_MINUTES + 1) for _ in range(7)]
+    for day_of_week, start_minutes, end_minutes, count in intervals:
+        start_minutes = max(0, min(start_minutes, DAY_MINUTES))
+        end_minutes = max(start_minutes, min(end_minutes, DAY_MINUTES))
+        diffs[day_of_week][start_minutes] += count
+        diffs[day_of_week][end_minutes] -= count
+
+    absolute = []
+    average = []
+    for day_of_week in range(7):
+        concurrent = list(accumulate(diffs[day_of_week][:DAY_MINUTES]))
+        slots = [
+            sum(concurrent[start:start + resolution]) / resolution
+            for start in range(0, DAY_MINUTES, resolution)
+        ]
+        occurrences = weekday_occurrences[day_of_week]
+        absolute.append(slots)
+        average.append([value / occurrences if occurrences else 0 for value in slots])
+
+    return {'absolute': absolute, 'average': average}
+
+
+def weekday_occurrences(start_date, end_date):
+    """Ocorrências de cada dia da semana no período no formato do banco (0=Domingo..6=Sábado)"""
+    counts = _weekday_counts(start_date, end_date)
+    return [counts[6]] + counts[:6]
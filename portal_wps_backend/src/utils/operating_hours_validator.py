@@ -2,14 +2,14 @@
 Utilitário para validar horários de funcionamento das plantas
 """
 from datetime import datetime, timedelta
-from src.models.operating_hours import OperatingHours
-from src.models.default_schedule import DefaultSchedule
 from src.models.schedule_config import ScheduleConfig
-from src.models.user import db
+from src.utils.plant_cache import get_plant_descriptor
+from src.utils.server_timing import timed_phase
 import logging
 
 logger = logging.getLogger(__name__)
 
+@timed_phase('operating_hours')
 def validate_operating_hours(plant_id, appointment_date, appointment_time, appointment_time_end):
     """
     Valida se os horários do agendamento estão dentro do horário de funcionamento da planta.
@@ -35,40 +35,28 @@ def validate_operating_hours(plant_id, appointment_date, appointment_time, appoi
         
         logger.info(f"🔍 [VALIDATE] Iniciando validação - plant_id={plant_id}, data={appointment_date}, weekday={db_day_of_week}, is_weekend={is_weekend}")
         
+        # Horários e bloqueios semanais vêm do descritor em cache da planta
+        plant = get_plant_descriptor(plant_id) if plant_id else None
         operating_hours_config = None
         
         # Buscar configuração específica da planta primeiro
         if plant_id:
             logger.info(f"🔍 [VALIDATE] Buscando configuração específica da planta {plant_id} para schedule_type={'weekend' if is_weekend else 'weekdays'}")
-            if is_weekend:
-                # CORREÇÃO: Para weekend, OperatingHours usa day_of_week: 5=Sábado, 6=Domingo
-                # Mas db_day_of_week para Domingo é 0 e para Sábado é 6
-                # Precisamos converter: Domingo (db_day_of_week=0) -> OperatingHours.day_of_week=6
-                #                      Sábado (db_day_of_week=6) -> OperatingHours.day_of_week=5
-                operating_hours_day = 6 if db_day_of_week == 0 else 5  # Domingo=6, Sábado=5
-                
-                operating_hours_config = OperatingHours.query.filter_by(
-                    plant_id=plant_id,
-                    schedule_type='weekend',
-                    day_of_week=operating_hours_day,
-                    is_active=True
-                ).first()
-            else:
-                operating_hours_config = OperatingHours.query.filter_by(
-                    plant_id=plant_id,
-                    schedule_type='weekdays',
-                    day_of_week=None,
-                    is_active=True
-                ).first()
+            if plant:
+                if is_weekend:
+                    # CORREÇÃO: Para weekend, OperatingHours usa day_of_week: 5=Sábado, 6=Domingo
+                    # Mas db_day_of_week para Domingo é 0 e para Sábado é 6
+                    # Precisamos converter: Domingo (db_day_of_week=0) -> OperatingHours.day_of_week=6
+                    #                      Sábado (db_day_of_week=6) -> OperatingHours.day_of_week=5
+                    operating_hours_day = 6 if db_day_of_week == 0 else 5  # Domingo=6, Sábado=5
+                    operating_hours_config = plant['operating_hours']['weekend'][str(operating_hours_day)]
+                else:
+                    operating_hours_config = plant['operating_hours']['weekdays']
             
             if operating_hours_config:
-                logger.info(f"✅ [VALIDATE] Configuração específica encontrada: {operating_hours_config.operating_start} às {operating_hours_config.operating_end} (plant_id={operating_hours_config.plant_id})")
+                logger.info(f"✅ [VALIDATE] Configuração específica encontrada: {operating_hours_config['start']} às {operating_hours_config['end']} (plant_id={plant_id})")
             else:
                 logger.warning(f"⚠️ [VALIDATE] Nenhuma configuração específica encontrada para plant_id={plant_id}")
-                
-                # Listar todas as configurações desta planta para debug
-                all_configs = OperatingHours.query.filter_by(plant_id=plant_id).all()
-                logger.info(f"🔍 [VALIDATE] Todas as configurações da planta {plant_id}: {[(c.id, c.schedule_type, c.day_of_week, c.operating_start, c.operating_end, c.is_active) for c in all_configs]}")
         else:
             logger.warning(f"⚠️ [VALIDATE] plant_id é None - não há planta para validar")
         
@@ -84,16 +72,8 @@ def validate_operating_hours(plant_id, appointment_date, appointment_time, appoi
                 operating_hours_day = 6 if db_day_of_week == 0 else 5  # Domingo=6, Sábado=5
                 day_name_pt = 'Domingo' if db_day_of_week == 0 else 'Sábado'
                 
-                # Verificar se existe configuração inativa específica da planta para este dia
-                inactive_config_plant = OperatingHours.query.filter_by(
-                    plant_id=plant_id,
-                    schedule_type='weekend',
-                    day_of_week=operating_hours_day,
-                    is_active=False
-                ).first()
-                
                 # Se há configuração inativa específica da planta, bloquear com mensagem específica do dia
-                if inactive_config_plant:
+                if plant and operating_hours_day in plant['weekend_inactive']:
                     error_msg = f'Agendamentos não são permitidos aos {day_name_pt}s para esta planta (horários de {day_name_pt} desativados).'
                     logger.warning(f"❌ [VALIDATE] Bloqueando agendamento em {day_name_pt} - configuração específica da planta existe mas está inativa")
                     return (False, error_msg)
@@ -116,20 +96,20 @@ def validate_operating_hours(plant_id, appointment_date, appointment_time, appoi
                 logger.info(f"Nenhuma configuração encontrada. Permitindo 24h (padrão).")
             return (True, None)
         
-        logger.info(f"✅ [VALIDATE] Usando configuração: {operating_hours_config.operating_start} às {operating_hours_config.operating_end} (plant_id={operating_hours_config.plant_id}, schedule_type={operating_hours_config.schedule_type})")
+        logger.info(f"✅ [VALIDATE] Usando configuração: {operating_hours_config['start']} às {operating_hours_config['end']} (plant_id={plant_id}, schedule_type={'weekend' if is_weekend else 'weekdays'})")
         
         # Validar horário inicial e final
         time_str = appointment_time.strftime('%H:%M')
         time_end_str = appointment_time_end.strftime('%H:%M')
-        start_time_str = operating_hours_config.operating_start.strftime('%H:%M')
-        end_time_str = operating_hours_config.operating_end.strftime('%H:%M')
+        start_time_str = operating_hours_config['start']
+        end_time_str = operating_hours_config['end']
         
         # Converter para minutos para comparação
         def time_to_minutes(time_obj):
             return time_obj.hour * 60 + time_obj.minute
         
-        start_minutes = time_to_minutes(operating_hours_config.operating_start)
-        end_minutes = time_to_minutes(operating_hours_config.operating_end)
+        start_minutes = operating_hours_config['start_minutes']
+        end_minutes = operating_hours_config['end_minutes']
         appointment_start_minutes = time_to_minutes(appointment_time)
         appointment_end_minutes = time_to_minutes(appointment_time_end)
         
@@ -172,10 +152,8 @@ def validate_operating_hours(plant_id, appointment_date, appointment_time, appoi
         logger.info(f"Validação passou - todos os horários estão dentro do intervalo {start_time_str}-{end_time_str}")
         
         # VALIDAR BLOQUEIOS: Verificar se há bloqueios semanais (DefaultSchedule) ou de data específica (ScheduleConfig)
-        # Multi-tenant: buscar company_id da planta para garantir isolamento
-        from src.models.plant import Plant
-        plant = Plant.query.get(plant_id) if plant_id else None
-        company_id = plant.company_id if plant else None
+        # Multi-tenant: company_id vem do descritor da planta para garantir isolamento
+        company_id = plant['company_id'] if plant else None
         
         if not company_id:
             logger.warning(f"Planta {plant_id} não encontrada ou sem company_id. Pulando validação de bloqueios.")
@@ -212,26 +190,20 @@ def validate_operating_hours(plant_id, appointment_date, appointment_time, appoi
             # Se o agendamento começar EXATAMENTE no horário final do bloqueio, é permitido
             logger.info(f"🔍 [VALIDATE] Verificando bloqueios semanais para plant_id={plant_id}, weekday={db_day_of_week}")
             
-            # Buscar todos os bloqueios semanais para este dia/planta
-            from sqlalchemy import or_, and_
-            all_weekly_blocks = DefaultSchedule.query.filter(
-                and_(
-                    DefaultSchedule.plant_id == plant_id,
-                    or_(
-                        DefaultSchedule.day_of_week == db_day_of_week,
-                        DefaultSchedule.day_of_week.is_(None)
-                    ),
-                    DefaultSchedule.is_available == False
-                )
-            ).all()
+            # Bloqueios semanais deste dia (ou de todos os dias) já carregados no descritor
+            all_weekly_blocks = [
+                block for block in plant['weekly_blocks']
+                if block['day_of_week'] is None or block['day_of_week'] == db_day_of_week
+            ]
+            blocked_minutes = {block['minutes'] for block in all_weekly_blocks}
             
             # Converter appointment_time para minutos
             appointment_start_minutes = appointment_time.hour * 60 + appointment_time.minute
             day_name = ['Domingo', 'Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado'][db_day_of_week if db_day_of_week > 0 else 0]
             
             for block in all_weekly_blocks:
-                block_time_minutes = block.time.hour * 60 + block.time.minute
-                block_time_str = block.time.strftime('%H:%M')
+                block_time_minutes = block['minutes']
+                block_time_str = block['time']
                 
                 # LÓGICA: Um bloqueio em X bloqueia agendamentos começando de X até X+59 minutos
                 # Mas NÃO bloqueia agendamentos começando em X+1 hora (mesma lógica dos horários de funcionamento)
@@ -250,31 +222,19 @@ def validate_operating_hours(plant_id, appointment_date, appointment_time, appoi
                     # Se começa exatamente no horário do bloqueio, verificar se é o horário final de um intervalo
                     if appointment_start_minutes == block_time_minutes:
                         # Verificar se há bloqueio no horário anterior (isso indicaria que este é o final de um intervalo)
-                        prev_hour_time = block.time.hour - 1
+                        prev_hour_time = block_time_minutes // 60 - 1
                         if prev_hour_time < 0:
                             prev_hour_time = 23
                         
-                        from datetime import time as time_class
-                        prev_hour_block = DefaultSchedule.query.filter(
-                            and_(
-                                DefaultSchedule.plant_id == plant_id,
-                                or_(
-                                    DefaultSchedule.day_of_week == db_day_of_week,
-                                    DefaultSchedule.day_of_week.is_(None)
-                                ),
-                                DefaultSchedule.time == time_class(prev_hour_time, 0),
-                                DefaultSchedule.is_available == False
-                            )
-                        ).first()
-                        
                         # Se há bloqueio no horário anterior, este é o horário final do intervalo - PERMITIR
-                        if prev_hour_block:
+                        if prev_hour_time * 60 in blocked_minutes:
                             logger.info(f"✅ [VALIDATE] Agendamento em {appointment_time.strftime('%H:%M')} permitido - horário final do bloqueio (bloqueio anterior em {(prev_hour_time):02d}:00)")
                             continue  # Este bloqueio não bloqueia porque é o final de um intervalo
                     
                     # Caso contrário, bloquear
-                    error_msg = f'O horário {block_time_str} de {day_name} está bloqueado semanalmente. Motivo: {block.reason or "Bloqueio semanal"}'
-                    logger.warning(f"❌ [VALIDATE] Bloqueio semanal detectado: {block_time_str} em {day_name} bloqueia agendamento em {appointment_time.strftime('%H:%M')} - {block.reason}")
+                    reason = block['reason']
+                    error_msg = f'O horário {block_time_str} de {day_name} está bloqueado semanalmente. Motivo: {reason or "Bloqueio semanal"}'
+                    logger.warning(f"❌ [VALIDATE] Bloqueio semanal detectado: {block_time_str} em {day_name} bloqueia agendamento em {appointment_time.strftime('%H:%M')} - {reason}")
                     return (False, error_msg)
         
         logger.info(f"✅ [VALIDATE] Validação completa passou - nenhum bloqueio detectado")
@@ -0,0 +1,117 @@
+"""
+Utilitário para hash e verificação de senhas em pool limitado de threads
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Método de hash no formato do werkzeug (ex: 'scrypt', 'scrypt:32768:8:1', 'pbkdf2:sha256:600000')
+# Ao alterar o método, os hashes antigos continuam válidos e são refeitos no próximo login
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+
+# Pool de verificação do login: threads dedicadas + fila limitada
+# hashlib libera o GIL durante scrypt/pbkdf2, então o pool usa núcleos reais sem bloquear os workers HTTP
+LOGIN_HASH_WORKERS = int(os.environ.get('LOGIN_HASH_WORKERS', 4))
+LOGIN_HASH_QUEUE_DEPTH = int(os.environ.get('LOGIN_HASH_QUEUE_DEPTH', 16))
+LOGIN_HASH_TIMEOUT = float(os.environ.get('LOGIN_HASH_TIMEOUT', 10))
+LOGIN_HASH_RETRY_AFTER = int(os.environ.get('LOGIN_HASH_RETRY_AFTER', 2))
+
+_executor = ThreadPoolExecutor(max_workers=LOGIN_HASH_WORKERS, thread_name_prefix='login-hash')
+# Vagas = threads em execução + itens aguardando na fila
+_slots = threading.BoundedSemaphore(LOGIN_HASH_WORKERS + LOGIN_HASH_QUEUE_DEPTH)
+
+_method_prefix = None
+_method_prefix_lock = threading.Lock()
+
+
+class HashingPoolSaturated(Exception):
+    """Pool de hashing sem capacidade para aceitar novas verificações"""
+
+    def __init__(self, retry_after=LOGIN_HASH_RETRY_AFTER):
+        super().__init__('Pool de verificação de senhas saturado')
+        self.retry_after = retry_after
+
+
+def hash_password(password):
+    """
+    Gera o hash de uma senha com os parâmetros configurados
+
+    Args:
+        password (str): Senha em texto puro
+
+    Returns:
+        str: Hash no formato do werkzeug (método$salt$hash)
+    """
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH)
+
+
+def get_method_prefix():
+    """Retorna o prefixo completo (com parâmetros) gerado pelo método configurado"""
+    global _method_prefix
+    if _method_prefix is None:
+        with _method_prefix_lock:
+            if _method_prefix is None:
+                # O werkzeug completa os parâmetros padrão (ex: 'scrypt' -> 'scrypt:32768:8:1'),
+                # então o prefixo é obtido de um hash real uma única vez por processo
+                _method_prefix = hash_password('').split('$', 1)[0]
+    return _method_prefix
+
+
+def needs_rehash(password_hash):
+    """Verifica se o hash foi gerado com parâmetros diferentes dos configurados"""
+    if not password_hash:
+        return False
+    return password_hash.split('$', 1)[0] != get_method_prefix()
+
+
+def _verify(password_hash, password):
+    """Executado no pool: verifica a senha e, se necessário, gera o novo hash"""
+    if not password_hash:
+        return False, None
+    try:
+        is_valid = check_password_hash(password_hash, password)
+    except ValueError:
+        # Hash em formato inválido ou corrompido
+        return False, None
+
+    if is_valid and needs_rehash(password_hash):
+        return True, hash_password(password)
+    return is_valid, None
+
+
+def verify_password(password_hash, password):
+    """
+    Verifica uma senha no pool limitado, sem ocupar a thread da requisição com o hash
+
+    Args:
+        password_hash (str): Hash armazenado do usuário
+        password (str): Senha informada
+
+    Returns:
+        tuple: (is_valid: bool, new_hash: str or None) - new_hash é preenchido quando
+               a senha é válida mas o hash usa parâmetros antigos
+
+    Raises:
+        HashingPoolSaturated: Se a fila estiver cheia ou a verificação exceder o timeout
+    """
+    if not _slots.acquire(blocking=False):
+        logger.warning("Pool de verificação de senhas saturado - rejeitando login")
+        raise HashingPoolSaturated()
+
+    try:
+        future = _executor.submit(_verify, password_hash, password)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+
+    try:
+        return future.result(timeout=LOGIN_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        logger.warning(f"Verificação de senha excedeu {LOGIN_HASH_TIMEOUT}s - rejeitando login")
+        raise HashingPoolSaturated()
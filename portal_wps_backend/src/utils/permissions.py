@@ -5,6 +5,8 @@ from functools import wraps
 from flask import request, jsonify
 import jwt
 from src.models.user import User
+from src.utils.db_routing import set_request_company
+from src.utils.server_timing import timed, timed_phase
 from src.models.permission import Permission
 
 # SECRET_KEY: usar variável de ambiente em produção
@@ -22,13 +24,17 @@ def get_current_user_from_token():
         if token.startswith('Bearer '):
             token = token[7:]
         
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        current_user = User.query.get(payload['user_id'])
+        with timed('auth'):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            current_user = User.query.get(payload['user_id'])
+        if current_user:
+            set_request_company(current_user.company_id)
         
         return current_user
     except:
         return None
 
+@timed_phase('permission')
 def has_permission(function_id, required_permission='editor', current_user=None):
     """
     Verifica se o usuário atual tem a permissão necessária para uma funcionalidade
@@ -0,0 +1,153 @@
+"""
+Cache de metadados das plantas usados nas validações de agendamento
+
+O descritor de uma planta reúne o que as rotas consultam a cada requisição:
+status, capacidade máxima, horários de funcionamento e bloqueios semanais.
+É invalidado nas alterações de plantas, horários de funcionamento e bloqueios
+semanais (localmente e nos outros workers pelo barramento de invalidação).
+"""
+import json
+import hashlib
+import logging
+from src.models.user import db
+from src.utils.cache import get_cache
+from src.utils.cache_bus import register_invalidation_handler
+
+logger = logging.getLogger(__name__)
+
+PLANT_CACHE_NAMESPACE = 'plant_descriptor'
+
+
+def _time_entry(time_obj):
+    return time_obj.strftime('%H:%M'), time_obj.hour * 60 + time_obj.minute
+
+
+def build_schedule(configs, blocks):
+    """
+    Monta a configuração de horários de uma planta
+
+    Args:
+        configs: OperatingHours da planta ('weekdays'/'weekend'), ordenados por id
+        blocks: DefaultSchedule indisponíveis da planta, ordenados por id
+
+    Returns:
+        dict: operating_hours, weekend_inactive e weekly_blocks
+    """
+    operating_hours = {'weekdays': None, 'weekend': {'5': None, '6': None}}
+    weekend_inactive = []
+    for config in configs:
+        start_str, start_minutes = _time_entry(config.operating_start)
+        end_str, end_minutes = _time_entry(config.operating_end)
+        entry = {
+            'start': start_str,
+            'end': end_str,
+            'start_minutes': start_minutes,
+            'end_minutes': end_minutes
+        }
+        if config.schedule_type == 'weekdays':
+            if config.day_of_week is None and config.is_active and operating_hours['weekdays'] is None:
+                operating_hours['weekdays'] = entry
+        elif config.day_of_week in (5, 6):
+            day_key = str(config.day_of_week)
+            if not config.is_active:
+                if config.day_of_week not in weekend_inactive:
+                    weekend_inactive.append(config.day_of_week)
+            elif operating_hours['weekend'][day_key] is None:
+                operating_hours['weekend'][day_key] = entry
+
+    weekly_blocks = []
+    for block in blocks:
+        time_str, minutes = _time_entry(block.time)
+        weekly_blocks.append({
+            'day_of_week': block.day_of_week,
+            'time': time_str,
+            'minutes': minutes,
+            'reason': block.reason
+        })
+
+    return {
+        'operating_hours': operating_hours,
+        'weekend_inactive': sorted(weekend_inactive),
+        'weekly_blocks': weekly_blocks
+    }
+
+
+def _load_descriptor(plant_id):
+    """Monta o descritor da planta a partir do banco (None se a planta não existir)"""
+    from src.models.plant import Plant
+    from src.models.operating_hours import OperatingHours
+    from src.models.default_schedule import DefaultSchedule
+
+    plant = db.session.get(Plant, plant_id)
+    if not plant:
+        return None
+
+    configs = OperatingHours.query.filter(
+        OperatingHours.plant_id == plant_id,
+        OperatingHours.schedule_type.in_(['weekdays', 'weekend'])
+    ).order_by(OperatingHours.id).all()
+    blocks = DefaultSchedule.query.filter(
+        DefaultSchedule.plant_id == plant_id,
+        DefaultSchedule.is_available == False
+    ).order_by(DefaultSchedule.id).all()
+
+    schedule = build_schedule(configs, blocks)
+    version = hashlib.sha1(json.dumps(schedule, sort_keys=True).encode()).hexdigest()[:12]
+
+    return {
+        'id': plant.id,
+        'company_id': plant.company_id,
+        'name': plant.name,
+        'is_active': plant.is_active,
+        'max_capacity': plant.max_capacity or 1,
+        **schedule,
+        'operating_hours_version': version
+    }
+
+
+def get_plant_descriptor(plant_id, company_id=None):
+    """
+    Retorna o descritor em cache da planta
+
+    Args:
+        plant_id: ID da planta
+        company_id: Se fornecido, retorna None quando a planta não pertence à company
+
+    Returns:
+        dict: id, company_id, name, is_active, max_capacity, operating_hours,
+              weekend_inactive, weekly_blocks e operating_hours_version - ou None
+    """
+    if not plant_id:
+        return None
+    try:
+        plant_id = int(plant_id)
+    except (TypeError, ValueError):
+        return None
+
+    descriptor = get_cache().get_or_load(PLANT_CACHE_NAMESPACE, plant_id, lambda: _load_descriptor(plant_id))
+    if descriptor is None:
+        return None
+    if company_id is not None and descriptor['company_id'] != company_id:
+        return None
+    return descriptor
+
+
+def invalidate_plant_descriptor(plant_id=None):
+    """Remove o descritor da planta do cache (plant_id=None: todas as plantas)"""
+    if plant_id is None:
+        get_cache().bump_namespace(PLANT_CACHE_NAMESPACE)
+        return
+    try:
+        get_cache().delete(PLANT_CACHE_NAMESPACE, int(plant_id))
+    except (TypeError, ValueError):
+        get_cache().bump_namespace(PLANT_CACHE_NAMESPACE)
+
+
+def _on_plant_changed(company_id, plant_id):
+    invalidate_plant_descriptor(plant_id)
+
+
+# Plantas publicam o próprio id; horários e bloqueios publicam o plant_id
+register_invalidation_handler('plant', _on_plant_changed)
+register_invalidation_handler('operating_hours', _on_plant_changed)
+register_invalidation_handler('default_schedule', _on_plant_changed)
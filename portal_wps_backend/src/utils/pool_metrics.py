@@ -0,0 +1,218 @@
+"""
+Métricas do pool de conexões do banco de dados
+
+O engine usa MeteredQueuePool (um QueuePool que mede o tempo de espera por conexão) e
+os eventos checkout/checkin do pool medem por quanto tempo cada conexão fica emprestada.
+Por processo e por engine (principal e réplica) são mantidos:
+- conexões emprestadas, livres e em overflow no momento, e o pico de emprestadas
+- histograma do tempo de espera por uma conexão e do tempo de uso de cada conexão
+- eventos de overflow (conexão extra aberta além de DB_POOL_SIZE) e timeouts (espera
+  maior que DB_POOL_TIMEOUT)
+
+As métricas ficam em GET /api/health/pool (cada worker responde pelas suas). Com
+METRICS_TOKEN definido, a rota exige o cabeçalho X-Metrics-Token; sem ele, a rota
+só responde fora de produção. A mesma regra (metrics_access_allowed) vale para os demais
+endpoints e cabeçalhos de métricas.
+
+Configuração do pool (SQLALCHEMY_ENGINE_OPTIONS):
+    DB_POOL_SIZE: Conexões mantidas abertas por processo (padrão: 5)
+    DB_MAX_OVERFLOW: Conexões extras abertas sob demanda acima do pool (padrão: 10)
+    DB_POOL_TIMEOUT: Espera máxima por uma conexão, em segundos inteiros (padrão: 30)
+    DB_POOL_RECYCLE: Idade máxima de uma conexão antes de ser reaberta, em segundos (padrão: 300)
+    DB_POOL_PRE_PING: Testa a conexão antes de usá-la (padrão: true)
+"""
+import os
+import hmac
+import time
+import logging
+import threading
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+_is_production = bool(
+    os.environ.get('FLASK_ENV') == 'production' or os.environ.get('ENVIRONMENT') == 'production'
+    or os.environ.get('RAILWAY_ENVIRONMENT')
+)
+
+# Limites superiores (segundos) das faixas dos histogramas
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Tempo de uso inicial (segundos) antes das primeiras medições
+DEFAULT_HOLD_SECONDS = 0.05
+
+
+def metrics_access_allowed():
+    """Se a requisição atual pode ver métricas: X-Metrics-Token válido ou, sem METRICS_TOKEN, fora de produção"""
+    if METRICS_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), METRICS_TOKEN)
+    return not _is_production
+
+
+def pool_engine_options():
+    """Opções de pool do engine a partir das variáveis de ambiente"""
+    return {
+        'poolclass': MeteredQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        # Inteiro: o Flask-SQLAlchemy converte pool_timeout com int() (engine_from_config)
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 300)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+
+
+class Histogram:
+    """Histograma cumulativo de durações (no formato dos histogramas do Prometheus)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(HISTOGRAM_BUCKETS)
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+
+    def to_dict(self):
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(HISTOGRAM_BUCKETS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'buckets': buckets,
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'avg': round(self.total / self.count, 6) if self.count else 0.0
+        }
+
+
+class PoolMetrics:
+    """Contadores e histogramas de um pool de conexões"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wait = Histogram()
+        self.hold = Histogram()
+        self.checkouts = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        # Tempo médio (EWMA, segundos) que uma conexão fica emprestada
+        self.avg_hold = DEFAULT_HOLD_SECONDS
+
+    def record_wait(self, seconds, overflow, checked_out):
+        with self.lock:
+            self.wait.observe(seconds)
+            self.checkouts += 1
+            if overflow:
+                self.overflow_events += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self, seconds):
+        with self.lock:
+            self.wait.observe(seconds)
+            self.timeouts += 1
+
+    def record_hold(self, seconds):
+        with self.lock:
+            self.hold.observe(seconds)
+            self.avg_hold = self.avg_hold * 0.8 + seconds * 0.2
+
+    def snapshot(self, pool):
+        with self.lock:
+            return {
+                'size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'timeout': pool.timeout(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(0, pool.overflow()),
+                'peak_checked_out': self.peak_checked_out,
+                'checkouts': self.checkouts,
+                'overflow_events': self.overflow_events,
+                'timeouts': self.timeouts,
+                'avg_hold_seconds': round(self.avg_hold, 6),
+                'wait_seconds': self.wait.to_dict(),
+                'hold_seconds': self.hold.to_dict()
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool que registra o tempo de espera, overflows e timeouts de cada checkout"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow_before = self.overflow()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            logger.warning(f"[pool] Timeout aguardando conexão ({self.checkedout()} emprestadas)")
+            raise
+        # Uma conexão nova com o pool já cheio é um overflow
+        overflow = self.overflow() > overflow_before and self.overflow() > 0
+        self.metrics.record_wait(time.perf_counter() - started, overflow, self.checkedout())
+        return connection
+
+    def recreate(self):
+        # dispose()/invalidação recriam o pool: as métricas continuam acumulando
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def average_hold(pool):
+    """Tempo médio (segundos) que uma conexão do pool fica emprestada"""
+    metrics = getattr(pool, 'metrics', None)
+    return metrics.avg_hold if metrics else DEFAULT_HOLD_SECONDS
+
+
+def _register_hold_events(pool):
+    @event.listens_for(pool, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+
+    @event.listens_for(pool, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        metrics = getattr(pool, 'metrics', None)
+        if checked_out_at is not None and metrics is not None:
+            metrics.record_hold(time.perf_counter() - checked_out_at)
+
+
+_engines = {}
+
+
+def init_pool_metrics(app, db):
+    """Registra a medição do tempo de uso das conexões nos pools dos engines"""
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            name = bind_key or 'primary'
+            _engines[name] = engine
+            _register_hold_events(engine.pool)
+
+
+def get_pool_metrics():
+    """Métricas atuais dos pools deste processo: {engine: métricas}"""
+    result = {}
+    for name, engine in _engines.items():
+        metrics = getattr(engine.pool, 'metrics', None)
+        if metrics is not None:
+            result[name] = metrics.snapshot(engine.pool)
+    return result
@@ -0,0 +1,206 @@
+"""
+Estatísticas de consultas SQL por requisição e detecção de N+1
+
+Os eventos before/after_cursor_execute do SQLAlchemy contam as consultas, somam o
+tempo no banco e agrupam os comandos por fingerprint (SQL sem valores literais e com
+listas IN reduzidas). Um mesmo fingerprint repetido QUERY_STATS_REPEAT_THRESHOLD vezes
+ou mais na requisição indica um provável N+1 (uma consulta por item de uma lista).
+
+Fora de produção (ou com QUERY_STATS_ENABLED=true) o log registra o resumo de cada
+requisição, com um aviso para cada N+1 detectado, e a resposta recebe:
+    X-DB-Query-Count: Consultas executadas
+    X-DB-Time-Ms: Tempo total no banco (ms)
+    X-DB-Repeated-Queries: Fingerprints repetidos acima do limite
+Os cabeçalhos seguem a regra dos endpoints de métricas (metrics_access_allowed): com
+METRICS_TOKEN definido, só vão para requisições com X-Metrics-Token válido; sem ele,
+só fora de produção.
+
+Para testes e scripts, query_budget() falha quando um trecho excede o orçamento:
+
+    with query_budget(max_queries=5, max_repeats=2):
+        client.get('/api/plant/appointments', headers=headers)
+
+Configuração:
+    QUERY_STATS_ENABLED: Ativa as estatísticas por requisição (padrão: true fora de produção)
+    QUERY_STATS_REPEAT_THRESHOLD: Repetições de um fingerprint que caracterizam N+1 (padrão: 5)
+"""
+import os
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import ContextDecorator
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.utils.pool_metrics import metrics_access_allowed
+
+logger = logging.getLogger(__name__)
+
+_is_production = os.environ.get('FLASK_ENV') == 'production' or os.environ.get('ENVIRONMENT') == 'production'
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'false' if _is_production else 'true').lower() == 'true'
+QUERY_STATS_REPEAT_THRESHOLD = int(os.environ.get('QUERY_STATS_REPEAT_THRESHOLD', 5))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+# Coletores ativos na thread atual (requisição e/ou orçamentos de query_budget)
+_active = threading.local()
+_listeners_lock = threading.Lock()
+
+
+def fingerprint(statement):
+    """SQL normalizado: sem literais, listas IN como IN (...) e espaços colapsados"""
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _IN_LIST.sub('IN (...)', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+class QueryStats:
+    """Consultas executadas, tempo no banco e repetições por fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.duration += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold=None):
+        """Fingerprints executados `threshold` vezes ou mais: [(fingerprint, vezes)]"""
+        threshold = threshold or QUERY_STATS_REPEAT_THRESHOLD
+        return [(sql, times) for sql, times in self.fingerprints.most_common() if times >= threshold]
+
+    @property
+    def duration_ms(self):
+        return round(self.duration * 1000, 2)
+
+
+def _collectors():
+    collectors = getattr(_active, 'collectors', None)
+    if collectors is None:
+        collectors = _active.collectors = []
+    return collectors
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _collectors() and context is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = _collectors()
+    started = getattr(context, '_query_stats_started', None)
+    if not collectors or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for stats in collectors:
+        stats.record(statement, elapsed)
+
+
+def _register_listeners():
+    # Em Engine (classe) para valer em todos os engines: principal, réplica e de scripts
+    with _listeners_lock:
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def start_query_collection():
+    """Passa a contar as consultas desta thread em um novo QueryStats"""
+    _register_listeners()
+    stats = QueryStats()
+    _collectors().append(stats)
+    return stats
+
+
+def stop_query_collection(stats):
+    """Encerra a contagem iniciada por start_query_collection()"""
+    collectors = _collectors()
+    if stats in collectors:
+        collectors.remove(stats)
+
+
+def current_query_stats():
+    """Estatísticas da requisição atual (None se desativadas)"""
+    return g.get('query_stats')
+
+
+def init_query_stats(app):
+    """Registra a coleta por requisição, os cabeçalhos X-DB-* e o log de N+1"""
+    if not QUERY_STATS_ENABLED:
+        return
+    _register_listeners()
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = start_query_collection()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        repeated = stats.repeated()
+        if metrics_access_allowed():
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = str(stats.duration_ms)
+            response.headers['X-DB-Repeated-Queries'] = str(len(repeated))
+
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        logger.info(f"[query_stats] {route} - {stats.count} consultas, {stats.duration_ms} ms no banco")
+        for sql, times in repeated:
+            logger.warning(f"[query_stats] Possível N+1 em {route}: {times}x {sql[:300]}")
+        return response
+
+    @app.teardown_request
+    def _stop_query_stats(exc):
+        stop_query_collection(g.pop('query_stats', None))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Trecho executou mais consultas (ou repetições) que o orçamento"""
+
+
+class query_budget(ContextDecorator):
+    """
+    Falha (QueryBudgetExceeded) quando o trecho excede o orçamento de consultas
+
+    Funciona como context manager ou decorator, independente de QUERY_STATS_ENABLED.
+    As requisições feitas pelo test client do Flask rodam na mesma thread e são contadas.
+
+    Args:
+        max_queries: Máximo de consultas no trecho
+        max_repeats: Máximo de execuções de um mesmo fingerprint (None = sem limite)
+    """
+
+    def __init__(self, max_queries, max_repeats=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.stats = None
+
+    def __enter__(self):
+        self.stats = start_query_collection()
+        return self.stats
+
+    def __exit__(self, exc_type, exc, tb):
+        stop_query_collection(self.stats)
+        if exc_type is not None:
+            return False
+
+        problems = []
+        if self.stats.count > self.max_queries:
+            problems.append(f"{self.stats.count} consultas (orçamento: {self.max_queries})")
+        if self.max_repeats is not None:
+            for sql, times in self.stats.repeated(self.max_repeats + 1):
+                problems.append(f"{times}x (máximo: {self.max_repeats}) {sql[:300]}")
+        if problems:
+            raise QueryBudgetExceeded('Orçamento de consultas excedido:\n' + '\n'.join(problems))
+        return False
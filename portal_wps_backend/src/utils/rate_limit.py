@@ -0,0 +1,260 @@
+"""
+Limitação de taxa (token bucket) e controle de admissão baseado no pool de conexões
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+from src.utils.pool_metrics import average_hold
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Máximo de chaves (IPs, usuários, companies) mantidas em memória por limitador
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))
+
+ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+# Espera máxima estimada (segundos) por uma conexão do pool antes de recusar com 503
+ADMISSION_WAIT_BUDGET = float(os.environ.get('ADMISSION_WAIT_BUDGET', 2.0))
+
+_PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+
+def parse_rate(rate):
+    """
+    Converte uma taxa no formato 'N/período' (ex: '10/minute') em (tokens por segundo, rajada)
+
+    Args:
+        rate (str): Taxa no formato 'N/second', 'N/minute', 'N/hour' ou 'N/day'
+
+    Returns:
+        tuple: (refill_per_second: float, burst: int)
+    """
+    amount, period = rate.strip().split('/')
+    amount = int(amount)
+    if period not in _PERIODS:
+        raise ValueError(f"Período de taxa inválido: {period}")
+    return amount / _PERIODS[period], amount
+
+
+class TokenBucket:
+    """Bucket de tokens com reposição contínua"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self):
+        """Consome um token. Retorna 0 se permitido, ou os segundos até haver token disponível"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Conjunto de token buckets por chave, com descarte LRU das chaves mais antigas"""
+
+    def __init__(self, rate):
+        self.rate, self.burst = parse_rate(rate)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Registra uma requisição para a chave. Retorna 0 se permitida ou o Retry-After em segundos"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[key] = bucket
+                if len(self._buckets) > RATE_LIMIT_MAX_KEYS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.consume()
+
+
+# Limitadores compartilhados por (nome, escopo): rotas com o mesmo nome dividem os mesmos buckets
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, scope, default_rate):
+    """Retorna o limitador do nome/escopo, criando-o com a taxa configurada se necessário"""
+    with _limiters_lock:
+        limiter = _limiters.get((name, scope))
+        if limiter is None:
+            rate = os.environ.get(f'RATE_LIMIT_{name.upper()}_{scope.upper()}', default_rate)
+            limiter = RateLimiter(rate)
+            _limiters[(name, scope)] = limiter
+        return limiter
+
+
+def get_client_ip():
+    """
+    Retorna o IP do cliente
+
+    Atrás do proxy, o ProxyFix (TRUSTED_PROXY_COUNT em main.py) já substitui o
+    remote_addr pelo IP adicionado pelo proxy confiável. O X-Forwarded-For não é lido
+    aqui: as primeiras entradas vêm do próprio cliente e podem ser forjadas.
+    """
+    return request.remote_addr
+
+
+def _request_email():
+    """E-mail informado no corpo da requisição (login e recuperação de senha)"""
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+# Como obter a chave de cada escopo: (current_user) -> chave ou None (escopo ignorado)
+_SCOPE_KEYS = {
+    'ip': lambda user: get_client_ip(),
+    'email': lambda user: _request_email(),
+    # E-mail + IP: tentativas de outro IP não bloqueiam o login do dono da conta
+    'email_ip': lambda user: f'{_request_email()}|{get_client_ip()}' if _request_email() else None,
+    'user': lambda user: user.id if user else None,
+    'company': lambda user: user.company_id if user else None
+}
+
+
+def _too_many_requests(retry_after):
+    response = jsonify({'error': 'Muitas requisições. Tente novamente em instantes.'})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, 429
+
+
+def rate_limit(name, methods=None, **scopes):
+    """
+    Decorator de limitação de taxa por IP, e-mail, usuário e/ou company
+
+    Cada escopo recebe uma taxa padrão no formato 'N/período', que pode ser sobrescrita
+    pela variável de ambiente RATE_LIMIT_<NAME>_<ESCOPO> (ex: RATE_LIMIT_LOGIN_IP=30/minute).
+    Rotas decoradas com o mesmo nome compartilham os buckets.
+    Os escopos 'user' e 'company' usam o current_user passado pelos decorators de autenticação,
+    então este decorator deve ficar abaixo deles.
+
+    Args:
+        name: Nome do limitador (ex: 'login')
+        methods: Métodos HTTP limitados (None = todos)
+        **scopes: Escopos e taxas padrão (ex: ip='30/minute', user='20/minute')
+    """
+    limiters = {}
+    for scope, default_rate in scopes.items():
+        if scope not in _SCOPE_KEYS:
+            raise ValueError(f"Escopo de limitação desconhecido: {scope}")
+        limiters[scope] = get_limiter(name, scope, default_rate)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED or (methods and request.method not in methods):
+                return f(*args, **kwargs)
+
+            current_user = args[0] if args and hasattr(args[0], 'company_id') else None
+            for scope, limiter in limiters.items():
+                key = _SCOPE_KEYS[scope](current_user)
+                if key is None:
+                    continue
+                retry_after = limiter.hit(key)
+                if retry_after:
+                    logger.warning(f"[rate_limit] {name} - limite do escopo {scope} atingido para {key}")
+                    return _too_many_requests(retry_after)
+
+            return f(*args, **kwargs)
+
+        return decorated
+    return decorator
+
+
+class _PoolLoad:
+    """Requisições em andamento neste processo (candidatas a uma conexão do pool)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+
+
+_pool_load = _PoolLoad()
+
+
+def init_admission_control(app):
+    """
+    Registra o contador de requisições em andamento
+
+    O tempo médio de uso das conexões vem das métricas do pool (src.utils.pool_metrics).
+    """
+    @app.before_request
+    def _track_request_start():
+        with _pool_load.lock:
+            _pool_load.in_flight += 1
+
+    @app.teardown_request
+    def _track_request_end(exc):
+        with _pool_load.lock:
+            _pool_load.in_flight -= 1
+
+
+def estimate_pool_wait(pool):
+    """
+    Estima a espera (segundos) por uma conexão do pool
+
+    Se há conexões livres, a espera é zero. Caso contrário, as requisições em andamento
+    além da capacidade formam uma fila atendida na velocidade de devolução das conexões.
+    """
+    if not hasattr(pool, 'checkedout') or not hasattr(pool, '_max_overflow'):
+        return 0.0
+    if pool._max_overflow < 0:
+        # Overflow ilimitado: nunca há espera pelo pool
+        return 0.0
+
+    capacity = pool.size() + pool._max_overflow
+    if pool.checkedout() < capacity:
+        return 0.0
+
+    queued = max(0, _pool_load.in_flight - capacity)
+    return (queued + 1) / capacity * average_hold(pool)
+
+
+def admission_control(methods=None):
+    """
+    Decorator que recusa a requisição com 503 + Retry-After quando a espera estimada
+    pelo pool de conexões excede ADMISSION_WAIT_BUDGET
+
+    Args:
+        methods: Métodos HTTP controlados (None = todos)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not ADMISSION_CONTROL_ENABLED or (methods and request.method not in methods):
+                return f(*args, **kwargs)
+
+            from src.models.user import db
+            expected_wait = estimate_pool_wait(db.engine.pool)
+            if expected_wait > ADMISSION_WAIT_BUDGET:
+                logger.warning(f"[admission_control] {f.__name__} recusada - espera estimada pelo pool {expected_wait:.2f}s")
+                response = jsonify({'error': 'Servidor sobrecarregado. Tente novamente em instantes.'})
+                response.headers['Retry-After'] = str(max(1, math.ceil(expected_wait)))
+                return response, 503
+
+            return f(*args, **kwargs)
+
+        return decorated
+    return decorator
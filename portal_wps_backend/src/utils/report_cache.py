@@ -0,0 +1,112 @@
+"""
+Cache de respostas dos relatórios
+
+A chave combina endpoint, company, papel/planta do usuário, parâmetros da requisição e a
+versão dos dados da company. A versão muda a cada gravação de agendamentos, plantas,
+fornecedores, horários de funcionamento ou bloqueios da company (localmente e nos outros
+workers pelo barramento de invalidação), então uma resposta em cache nunca é servida
+depois de uma alteração. Horários e bloqueios sem planta (valem para todas) avançam a
+versão de todas as companies.
+
+Configuração:
+    REPORT_CACHE_ENABLED: Habilita o cache de relatórios (padrão: true)
+    REPORT_CACHE_TTL: Tempo máximo de uma resposta em cache, em segundos (padrão: 600)
+"""
+import os
+import uuid
+import logging
+from datetime import date
+from functools import wraps
+from flask import request, current_app
+from src.utils.cache import get_cache
+from src.utils.cache_bus import register_invalidation_handler
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE_ENABLED', 'true').lower() == 'true'
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 600))
+
+REPORT_CACHE_NAMESPACE = 'report'
+DATA_VERSION_NAMESPACE = 'report_data_version'
+
+
+def get_data_version(company_id):
+    """Versão atual dos dados da company (criada na primeira consulta)"""
+    cache = get_cache()
+    version = cache.get(DATA_VERSION_NAMESPACE, company_id)
+    if version is None:
+        version = bump_data_version(company_id)
+    return version
+
+
+def bump_data_version(company_id=None):
+    """
+    Avança a versão dos dados da company (company_id=None: todas as companies)
+
+    A versão é um identificador único, e não um contador, para que dois workers
+    avançando ao mesmo tempo nunca gerem a mesma versão.
+    """
+    cache = get_cache()
+    if company_id is None:
+        cache.bump_namespace(DATA_VERSION_NAMESPACE)
+        return None
+    version = uuid.uuid4().hex[:16]
+    # Sem expiração: a versão só muda quando os dados mudam
+    cache.set(DATA_VERSION_NAMESPACE, company_id, version, ttl=0)
+    return version
+
+
+def _cache_key(current_user):
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    return ':'.join(str(part) for part in (
+        request.endpoint,
+        current_user.company_id,
+        current_user.role,
+        current_user.plant_id or '',
+        params,
+        # Períodos padrão ("últimos 30 dias") dependem da data atual
+        date.today().isoformat(),
+        get_data_version(current_user.company_id)
+    ))
+
+
+def cached_report(f):
+    """
+    Decorator que armazena a resposta (status 200) do relatório em cache
+
+    Deve ficar abaixo do decorator de autenticação, que fornece o current_user.
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if not REPORT_CACHE_ENABLED:
+            return f(current_user, *args, **kwargs)
+
+        cache = get_cache()
+        key = _cache_key(current_user)
+        cached = cache.get(REPORT_CACHE_NAMESPACE, key)
+        if cached is not None:
+            response = current_app.response_class(cached, status=200, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        result = f(current_user, *args, **kwargs)
+        response = current_app.make_response(result)
+        if response.status_code == 200:
+            cache.set(REPORT_CACHE_NAMESPACE, key, response.get_data(as_text=True), ttl=REPORT_CACHE_TTL)
+            response.headers['X-Cache'] = 'MISS'
+        return response
+
+    return decorated
+
+
+def _on_data_changed(company_id, entity_id):
+    bump_data_version(company_id)
+
+
+register_invalidation_handler('appointment', _on_data_changed)
+register_invalidation_handler('plant', _on_data_changed)
+register_invalidation_handler('supplier', _on_data_changed)
+# Ocupação, capacidade, mapa de calor, visão geral e previsão dependem dos horários e bloqueios
+register_invalidation_handler('operating_hours', _on_data_changed)
+register_invalidation_handler('default_schedule', _on_data_changed)
+register_invalidation_handler('schedule_config', _on_data_changed)
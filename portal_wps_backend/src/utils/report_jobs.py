@@ -0,0 +1,246 @@
+"""
+Execução de relatórios em segundo plano
+
+O cliente cria o job (POST /reports/jobs), recebe o id e consulta o status até a
+conclusão; o resultado fica gravado na tabela report_jobs. Os jobs rodam em um pool
+de threads pequeno e limitado para que relatórios pesados não disputem as conexões
+do banco com o tráfego de agendamentos:
+- no máximo REPORT_JOBS_WORKERS relatórios executando ao mesmo tempo por processo
+- a fila recusa novos jobs (503) acima de REPORT_JOBS_MAX_QUEUE
+- cada company tem no máximo REPORT_JOBS_MAX_PER_COMPANY jobs em andamento (429)
+- com o pool de conexões saturado, o job espera até REPORT_JOBS_MAX_DEFER segundos antes de começar
+
+Configuração:
+    REPORT_JOBS_WORKERS: Threads que executam relatórios (padrão: 2)
+    REPORT_JOBS_MAX_QUEUE: Jobs pendentes + em execução por processo (padrão: 20)
+    REPORT_JOBS_MAX_PER_COMPANY: Jobs em andamento por company (padrão: 3)
+    REPORT_JOBS_TIMEOUT: Segundos após os quais um job não concluído é considerado interrompido (padrão: 3600)
+    REPORT_JOBS_RETENTION_HOURS: Horas que os jobs concluídos ficam disponíveis (padrão: 24)
+    REPORT_JOBS_MAX_DEFER: Espera máxima (segundos) pelo pool de conexões antes de iniciar (padrão: 10)
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from src.models.user import db
+from src.models.report_job import ReportJob
+from src.models.plant import Plant
+from src.models.supplier import Supplier
+from src.utils.reports import build_dashboard_summary, build_plant_stats, build_supplier_stats
+from src.utils.rate_limit import estimate_pool_wait
+from src.utils.db_routing import read_from_replica
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOBS_WORKERS = int(os.environ.get('REPORT_JOBS_WORKERS', 2))
+REPORT_JOBS_MAX_QUEUE = int(os.environ.get('REPORT_JOBS_MAX_QUEUE', 20))
+REPORT_JOBS_MAX_PER_COMPANY = int(os.environ.get('REPORT_JOBS_MAX_PER_COMPANY', 3))
+REPORT_JOBS_TIMEOUT = int(os.environ.get('REPORT_JOBS_TIMEOUT', 3600))
+REPORT_JOBS_RETENTION_HOURS = int(os.environ.get('REPORT_JOBS_RETENTION_HOURS', 24))
+REPORT_JOBS_MAX_DEFER = float(os.environ.get('REPORT_JOBS_MAX_DEFER', 10))
+
+ACTIVE_STATUSES = ('pending', 'running')
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = 0
+
+
+def parse_period(params):
+    """
+    Período do relatório a partir de start_date/end_date (padrão: últimos 30 dias)
+
+    Returns:
+        tuple: (start_date, end_date) - levanta ValueError se as datas forem inválidas
+    """
+    start_date_str = params.get('start_date')
+    end_date_str = params.get('end_date')
+    if not start_date_str or not end_date_str:
+        end_date = datetime.now().date()
+        return end_date - timedelta(days=30), end_date
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    if end_date < start_date:
+        raise ValueError('end_date deve ser posterior a start_date')
+    return start_date, end_date
+
+
+def _build_dashboard_summary(company_id, params):
+    start_date, end_date = parse_period(params)
+    return {
+        **build_dashboard_summary(company_id, start_date, end_date),
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }
+    }
+
+
+def _build_plant_stats(company_id, params):
+    start_date, end_date = parse_period(params)
+    plant = Plant.query.filter_by(id=params['plant_id'], company_id=company_id).first()
+    if not plant:
+        raise ValueError('Planta não encontrada')
+    return build_plant_stats(company_id, plant, start_date, end_date)
+
+
+def _build_supplier_stats(company_id, params):
+    start_date, end_date = parse_period(params)
+    supplier = Supplier.query.filter_by(id=params['supplier_id'], company_id=company_id).first()
+    if not supplier:
+        raise ValueError('Fornecedor não encontrado')
+    return build_supplier_stats(company_id, supplier, start_date, end_date)
+
+
+# Tipos de relatório: (parâmetros obrigatórios, função que gera o resultado)
+REPORT_TYPES = {
+    'dashboard-summary': ((), _build_dashboard_summary),
+    'plant-stats': (('plant_id',), _build_plant_stats),
+    'supplier-stats': (('supplier_id',), _build_supplier_stats)
+}
+
+
+def validate_job_request(company_id, report_type, params):
+    """
+    Valida o tipo e os parâmetros do relatório antes de criar o job
+
+    Returns:
+        tuple: (params normalizados, None) ou (None, (mensagem, status HTTP))
+    """
+    if report_type not in REPORT_TYPES:
+        return None, (f"Tipo de relatório inválido. Use: {', '.join(sorted(REPORT_TYPES))}", 400)
+
+    required, _ = REPORT_TYPES[report_type]
+    normalized = {}
+    for field in required:
+        try:
+            normalized[field] = int(params.get(field))
+        except (TypeError, ValueError):
+            return None, (f'{field} é obrigatório', 400)
+
+    try:
+        start_date, end_date = parse_period(params)
+    except ValueError as e:
+        return None, (f'Período inválido: {str(e)}', 400)
+    # Datas resolvidas na criação: o resultado não depende de quando o job executa
+    normalized['start_date'] = start_date.isoformat()
+    normalized['end_date'] = end_date.isoformat()
+
+    if 'plant_id' in normalized and not Plant.query.filter_by(id=normalized['plant_id'], company_id=company_id).first():
+        return None, ('Planta não encontrada', 404)
+    if 'supplier_id' in normalized and not Supplier.query.filter_by(id=normalized['supplier_id'], company_id=company_id).first():
+        return None, ('Fornecedor não encontrado', 404)
+
+    return normalized, None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=REPORT_JOBS_WORKERS, thread_name_prefix='report-job')
+    return _executor
+
+
+def cleanup_report_jobs():
+    """Marca como falhos os jobs interrompidos e remove os jobs concluídos antigos"""
+    now = datetime.utcnow()
+    ReportJob.query.filter(
+        ReportJob.status.in_(ACTIVE_STATUSES),
+        ReportJob.created_at < now - timedelta(seconds=REPORT_JOBS_TIMEOUT)
+    ).update({
+        'status': 'failed',
+        'error': 'Relatório interrompido (tempo limite excedido ou reinício do servidor)',
+        'finished_at': now
+    }, synchronize_session=False)
+    ReportJob.query.filter(
+        ReportJob.status.notin_(ACTIVE_STATUSES),
+        ReportJob.created_at < now - timedelta(hours=REPORT_JOBS_RETENTION_HOURS)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def submit_report_job(current_user, report_type, params):
+    """
+    Cria o job e agenda a execução
+
+    Returns:
+        tuple: (ReportJob, None) ou (None, (mensagem, status HTTP))
+    """
+    global _queued
+    cleanup_report_jobs()
+
+    active_jobs = ReportJob.query.filter(
+        ReportJob.company_id == current_user.company_id,
+        ReportJob.status.in_(ACTIVE_STATUSES)
+    ).count()
+    if active_jobs >= REPORT_JOBS_MAX_PER_COMPANY:
+        return None, ('Limite de relatórios em andamento atingido. Aguarde a conclusão dos anteriores.', 429)
+
+    with _executor_lock:
+        if _queued >= REPORT_JOBS_MAX_QUEUE:
+            return None, ('Fila de relatórios cheia. Tente novamente em instantes.', 503)
+        _queued += 1
+
+    try:
+        job = ReportJob(
+            company_id=current_user.company_id,
+            user_id=current_user.id,
+            report_type=report_type,
+            params=json.dumps(params, sort_keys=True)
+        )
+        db.session.add(job)
+        db.session.commit()
+        _get_executor().submit(_run_job, current_app._get_current_object(), job.id)
+    except Exception:
+        with _executor_lock:
+            _queued -= 1
+        raise
+
+    logger.info(f"[report_jobs] Job {job.id} ({report_type}) criado para company {current_user.company_id}")
+    return job, None
+
+
+def _wait_for_pool():
+    """Cede lugar ao tráfego de agendamentos enquanto o pool de conexões está saturado"""
+    deadline = time.monotonic() + REPORT_JOBS_MAX_DEFER
+    while time.monotonic() < deadline and estimate_pool_wait(db.engine.pool) > 0:
+        time.sleep(0.5)
+
+
+def _run_job(app, job_id):
+    global _queued
+    try:
+        with app.app_context():
+            _wait_for_pool()
+            job = db.session.get(ReportJob, job_id)
+            if not job or job.status != 'pending':
+                return
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+
+            started = time.monotonic()
+            try:
+                _, builder = REPORT_TYPES[job.report_type]
+                with read_from_replica():
+                    result = builder(job.company_id, json.loads(job.params or '{}'))
+                job.result = json.dumps(result)
+                job.status = 'done'
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"[report_jobs] Erro no job {job_id}: {str(e)}", exc_info=True)
+                job = db.session.get(ReportJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            logger.info(f"[report_jobs] Job {job_id} {job.status} em {time.monotonic() - started:.2f}s")
+    except Exception as e:
+        logger.error(f"[report_jobs] Falha ao executar o job {job_id}: {str(e)}", exc_info=True)
+    finally:
+        with _executor_lock:
+            _queued -= 1
@@ -0,0 +1,690 @@
+"""
+Consultas agregadas dos relatórios
+
+Configuração:
+    APP_TIMEZONE: Fuso horário dos horários agendados (padrão: America/Sao_Paulo)
+    PUNCTUALITY_TOLERANCE_MINUTES: Atraso tolerado no check-in, em minutos (padrão: 15)
+"""
+import os
+from datetime import timedelta
+from sqlalchemy import select, func, literal, null, cast, union_all, tuple_, Integer, String, Date
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.appointment_daily_stat import AppointmentDailyStat
+from src.models.plant import Plant
+from src.models.supplier import Supplier
+from src.models.schedule_config import ScheduleConfig
+from src.utils.occupancy import (
+    occupancy_rates, occupancy_heatmap, weekday_occurrences, available_minutes, load_schedules
+)
+from src.utils.daily_stats import booked_minutes
+from src.utils.appointment_archive import appointment_source
+
+# Status que ocupam capacidade da planta
+CONFIRMED_STATUSES = ('scheduled', 'checked_in', 'checked_out')
+# Status que indicam comparecimento do fornecedor
+ATTENDED_STATUSES = ('checked_in', 'checked_out')
+
+# Data/horário dos agendamentos são locais; check-in/check-out são gravados em UTC
+APP_TIMEZONE = os.environ.get('APP_TIMEZONE', 'America/Sao_Paulo')
+PUNCTUALITY_TOLERANCE_MINUTES = int(os.environ.get('PUNCTUALITY_TOLERANCE_MINUTES', 15))
+
+# Percentis calculados nos relatórios de permanência e pontualidade
+PERCENTILES = (0.5, 0.9, 0.95)
+
+
+def build_dashboard_summary(company_id, start_date, end_date):
+    """
+    Calcula o resumo do dashboard de relatórios em uma única consulta
+
+    A consulta devolve três tipos de linha (UNION ALL):
+    - 'status': contagem e minutos reservados por planta e status no período (agregado diário)
+    - 'plant': plantas ativas com a capacidade máxima
+    - 'suppliers': total de fornecedores ativos
+
+    Args:
+        company_id: ID da company
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+
+    Returns:
+        dict: total_appointments, appointments_by_status, active_suppliers,
+              active_plants e average_occupation_rate
+    """
+    # Contagens lidas do agregado diário (uma linha por dia/planta/fornecedor/status)
+    status_rows = select(
+        literal('status').label('kind'),
+        AppointmentDailyStat.plant_id.label('plant_id'),
+        AppointmentDailyStat.status.label('status'),
+        func.sum(AppointmentDailyStat.count).label('value'),
+        func.sum(AppointmentDailyStat.booked_minutes).label('minutes')
+    ).where(
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date
+    ).group_by(
+        AppointmentDailyStat.plant_id, AppointmentDailyStat.status
+    ).having(func.sum(AppointmentDailyStat.count) != 0)
+
+    plant_rows = select(
+        literal('plant'),
+        Plant.id,
+        cast(null(), String),
+        func.coalesce(Plant.max_capacity, 1),
+        cast(null(), Integer)
+    ).where(
+        Plant.company_id == company_id,
+        Plant.is_active == True
+    )
+
+    supplier_rows = select(
+        literal('suppliers'),
+        cast(null(), Integer),
+        cast(null(), String),
+        func.count(Supplier.id),
+        cast(null(), Integer)
+    ).where(
+        Supplier.company_id == company_id,
+        Supplier.is_active == True,
+        Supplier.is_deleted == False
+    )
+
+    rows = db.session.execute(union_all(status_rows, plant_rows, supplier_rows)).all()
+
+    status_counts = {}
+    booked_by_plant = {}
+    plant_capacities = {}
+    active_suppliers = 0
+    for kind, plant_id, status, value, minutes in rows:
+        if kind == 'status':
+            status_counts[status] = status_counts.get(status, 0) + value
+            if status in CONFIRMED_STATUSES:
+                booked_by_plant[plant_id] = booked_by_plant.get(plant_id, 0) + (minutes or 0)
+        elif kind == 'plant':
+            plant_capacities[plant_id] = value
+        else:
+            active_suppliers = value
+
+    # Taxa de ocupação média (horas reservadas / horas disponíveis) das plantas ativas
+    occupancy = occupancy_rates(plant_capacities, booked_by_plant, start_date, end_date)
+    occupation_rates = [item['rate'] for item in occupancy.values() if item['available_hours'] > 0]
+
+    avg_occupation_rate = sum(occupation_rates) / len(occupation_rates) if occupation_rates else 0
+
+    return {
+        'total_appointments': sum(status_counts.values()),
+        'appointments_by_status': status_counts,
+        'active_suppliers': active_suppliers,
+        'active_plants': len(plant_capacities),
+        'average_occupation_rate': round(avg_occupation_rate, 2)
+    }
+
+
+def build_plant_dashboard_summary(company_id, plant, start_date, end_date):
+    """
+    Resumo do dashboard de relatórios de uma planta em uma única consulta
+
+    A planta (nome, capacidade e horários) vem do descritor em cache; a consulta
+    devolve três tipos de linha (UNION ALL):
+    - 'status': contagem e minutos reservados por status no período (agregado diário)
+    - 'suppliers': fornecedores ativos com agendamentos na planta no período
+    - 'block': bloqueios de datas específicas da planta no período (para a ocupação)
+
+    Args:
+        company_id: ID da company
+        plant: Descritor da planta (src.utils.plant_cache.get_plant_descriptor)
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+
+    Returns:
+        dict: total_appointments, appointments_by_status, active_suppliers,
+              occupation_rate, booked_hours, available_hours e plant
+    """
+    period_filter = (
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.plant_id == plant['id'],
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date
+    )
+
+    status_rows = select(
+        literal('status').label('kind'),
+        AppointmentDailyStat.status.label('label'),
+        cast(null(), Date).label('day'),
+        func.sum(AppointmentDailyStat.count).label('value'),
+        func.sum(AppointmentDailyStat.booked_minutes).label('minutes')
+    ).where(*period_filter).group_by(
+        AppointmentDailyStat.status
+    ).having(func.sum(AppointmentDailyStat.count) != 0)
+
+    supplier_ids = select(AppointmentDailyStat.supplier_id).where(
+        *period_filter, AppointmentDailyStat.count > 0
+    )
+    supplier_rows = select(
+        literal('suppliers'),
+        cast(null(), String),
+        cast(null(), Date),
+        func.count(Supplier.id),
+        cast(null(), Integer)
+    ).where(
+        Supplier.id.in_(supplier_ids),
+        Supplier.company_id == company_id,
+        Supplier.is_active == True,
+        Supplier.is_deleted == False
+    )
+
+    block_rows = select(
+        literal('block'),
+        cast(null(), String),
+        ScheduleConfig.date,
+        cast(func.extract('hour', ScheduleConfig.time), Integer) * 60 + cast(func.extract('minute', ScheduleConfig.time), Integer),
+        cast(null(), Integer)
+    ).where(
+        ScheduleConfig.plant_id == plant['id'],
+        ScheduleConfig.date >= start_date,
+        ScheduleConfig.date <= end_date,
+        ScheduleConfig.is_available == False
+    )
+
+    rows = db.session.execute(union_all(status_rows, supplier_rows, block_rows)).all()
+
+    status_counts = {}
+    confirmed_minutes = 0
+    active_suppliers = 0
+    date_blocks = {}
+    for kind, label, day, value, minutes in rows:
+        if kind == 'status':
+            status_counts[label] = status_counts.get(label, 0) + value
+            if label in CONFIRMED_STATUSES:
+                confirmed_minutes += minutes or 0
+        elif kind == 'suppliers':
+            active_suppliers = value
+        else:
+            date_blocks.setdefault(day, []).append(value)
+
+    # Taxa de ocupação: horas reservadas / horas disponíveis (funcionamento - bloqueios) x capacidade
+    capacity_minutes = available_minutes(plant, start_date, end_date, date_blocks) * plant['max_capacity']
+    occupation_rate = confirmed_minutes / capacity_minutes * 100 if capacity_minutes > 0 else 0
+
+    return {
+        'total_appointments': sum(status_counts.values()),
+        'appointments_by_status': status_counts,
+        'active_suppliers': active_suppliers,
+        'occupation_rate': round(occupation_rate, 2),
+        'booked_hours': round(confirmed_minutes / 60, 2),
+        'available_hours': round(capacity_minutes / 60, 2),
+        'plant': {
+            'id': plant['id'],
+            'name': plant['name'],
+            'max_capacity': plant['max_capacity']
+        }
+    }
+
+
+def get_period_stats(company_id, start_date, end_date, plant_id=None, supplier_id=None):
+    """
+    Contagens por status e série diária do período, agregadas no banco a partir do agregado diário
+
+    Args:
+        company_id: ID da company
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+        plant_id: Filtrar por planta (opcional)
+        supplier_id: Filtrar por fornecedor (opcional)
+
+    Returns:
+        dict: total_appointments, appointments_by_status, daily_appointments,
+              confirmed (status que ocupam capacidade), confirmed_minutes (minutos
+              reservados pelos confirmados) e attended (check-in/check-out)
+    """
+    query = db.session.query(
+        AppointmentDailyStat.date,
+        AppointmentDailyStat.status,
+        func.sum(AppointmentDailyStat.count),
+        func.sum(AppointmentDailyStat.booked_minutes)
+    ).filter(
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date
+    )
+    if plant_id is not None:
+        query = query.filter(AppointmentDailyStat.plant_id == plant_id)
+    if supplier_id is not None:
+        query = query.filter(AppointmentDailyStat.supplier_id == supplier_id)
+
+    rows = query.group_by(
+        AppointmentDailyStat.date, AppointmentDailyStat.status
+    ).having(func.sum(AppointmentDailyStat.count) != 0).order_by(AppointmentDailyStat.date)
+
+    status_counts = {}
+    daily_counts = {}
+    confirmed_minutes = 0
+    for day, status, count, minutes in rows:
+        status_counts[status] = status_counts.get(status, 0) + count
+        daily_counts[day] = daily_counts.get(day, 0) + count
+        if status in CONFIRMED_STATUSES:
+            confirmed_minutes += minutes or 0
+
+    return {
+        'total_appointments': sum(status_counts.values()),
+        'appointments_by_status': status_counts,
+        'daily_appointments': [{'date': day.isoformat(), 'count': count} for day, count in daily_counts.items()],
+        'confirmed': sum(status_counts.get(status, 0) for status in CONFIRMED_STATUSES),
+        'confirmed_minutes': confirmed_minutes,
+        'attended': sum(status_counts.get(status, 0) for status in ATTENDED_STATUSES)
+    }
+
+
+def get_top_suppliers(company_id, plant_id, start_date, end_date, limit=10):
+    """Fornecedores com mais agendamentos na planta no período"""
+    total = func.sum(AppointmentDailyStat.count)
+    rows = db.session.query(
+        AppointmentDailyStat.supplier_id,
+        Supplier.description,
+        total
+    ).join(
+        Supplier, AppointmentDailyStat.supplier_id == Supplier.id
+    ).filter(
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.plant_id == plant_id,
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date
+    ).group_by(
+        AppointmentDailyStat.supplier_id, Supplier.description
+    ).having(total > 0).order_by(total.desc()).limit(limit).all()
+
+    return [{'supplier_id': sid, 'supplier_name': name, 'count': count} for sid, name, count in rows]
+
+
+def get_top_plants(company_id, supplier_id, start_date, end_date, limit=10):
+    """Plantas com mais agendamentos do fornecedor no período"""
+    total = func.sum(AppointmentDailyStat.count)
+    rows = db.session.query(
+        AppointmentDailyStat.plant_id,
+        Plant.name,
+        total
+    ).join(
+        Plant, AppointmentDailyStat.plant_id == Plant.id
+    ).filter(
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.supplier_id == supplier_id,
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date
+    ).group_by(
+        AppointmentDailyStat.plant_id, Plant.name
+    ).having(total > 0).order_by(total.desc()).limit(limit).all()
+
+    return [{'plant_id': pid, 'plant_name': name, 'count': count} for pid, name, count in rows]
+
+
+def build_plant_stats(company_id, plant, start_date, end_date):
+    """
+    Estatísticas de uma planta no período (relatório plant-stats)
+
+    Args:
+        company_id: ID da company
+        plant: Planta (já validada como pertencente à company)
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+    """
+    # Contagens por status e por dia agregadas no banco
+    stats = get_period_stats(company_id, start_date, end_date, plant_id=plant.id)
+
+    # Taxa de ocupação: horas reservadas / horas disponíveis (funcionamento - bloqueios) x capacidade
+    occupancy = occupancy_rates(
+        {plant.id: plant.max_capacity or 1}, {plant.id: stats['confirmed_minutes']}, start_date, end_date
+    )[plant.id]
+
+    return {
+        'plant': {
+            'id': plant.id,
+            'name': plant.name,
+            'max_capacity': plant.max_capacity
+        },
+        'total_appointments': stats['total_appointments'],
+        'appointments_by_status': stats['appointments_by_status'],
+        'daily_appointments': stats['daily_appointments'],
+        'occupation_rate': round(occupancy['rate'], 2),
+        'booked_hours': round(occupancy['booked_hours'], 2),
+        'available_hours': round(occupancy['available_hours'], 2),
+        # Top fornecedores (mais agendamentos)
+        'top_suppliers': get_top_suppliers(company_id, plant.id, start_date, end_date),
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }
+    }
+
+
+def build_supplier_stats(company_id, supplier, start_date, end_date):
+    """
+    Estatísticas de um fornecedor no período (relatório supplier-stats)
+
+    Args:
+        company_id: ID da company
+        supplier: Fornecedor (já validado como pertencente à company)
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+    """
+    # Contagens por status e por dia agregadas no banco
+    stats = get_period_stats(company_id, start_date, end_date, supplier_id=supplier.id)
+
+    # Taxa de comparecimento (checked_in + checked_out / total)
+    total_appointments = stats['total_appointments']
+    attendance_rate = (stats['attended'] / total_appointments * 100) if total_appointments > 0 else 0
+
+    return {
+        'supplier': {
+            'id': supplier.id,
+            'description': supplier.description
+        },
+        'total_appointments': total_appointments,
+        'appointments_by_status': stats['appointments_by_status'],
+        'daily_appointments': stats['daily_appointments'],
+        'attendance_rate': round(attendance_rate, 2),
+        # Top plantas (mais agendamentos)
+        'top_plants': get_top_plants(company_id, supplier.id, start_date, end_date),
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }
+    }
+
+
+def _round(value):
+    return round(float(value), 1) if value is not None else None
+
+
+def _percentile_report(source, company_id, start_date, end_date, group_by, minutes, conditions,
+                       extra_columns=(), plant_id=None, supplier_id=None):
+    """
+    Média e percentis de uma duração em minutos por planta ou fornecedor, com o total geral
+
+    Executa uma única consulta com percentile_cont e GROUPING SETS (grupo + total).
+    `source` é a entidade dos agendamentos (appointment_source: inclui o arquivo).
+
+    Returns:
+        tuple: (linhas por grupo, linha do total) - linhas como Row do SQLAlchemy
+    """
+    if group_by == 'supplier':
+        group_id, group_name = source.supplier_id, Supplier.description
+        join_model, onclause = Supplier, source.supplier_id == Supplier.id
+    else:
+        group_id, group_name = source.plant_id, Plant.name
+        join_model, onclause = Plant, source.plant_id == Plant.id
+
+    columns = [
+        group_id.label('group_id'),
+        group_name.label('group_name'),
+        func.grouping(group_id).label('is_total'),
+        func.count().label('count'),
+        func.avg(minutes).label('avg'),
+        func.max(minutes).label('max')
+    ]
+    columns += [
+        func.percentile_cont(pct).within_group(minutes).label(f'p{int(pct * 100)}')
+        for pct in PERCENTILES
+    ]
+    columns += list(extra_columns)
+
+    query = db.session.query(*columns).select_from(source).join(join_model, onclause).filter(
+        source.company_id == company_id,
+        source.date >= start_date,
+        source.date <= end_date,
+        *conditions
+    )
+    if plant_id is not None:
+        query = query.filter(source.plant_id == plant_id)
+    if supplier_id is not None:
+        query = query.filter(source.supplier_id == supplier_id)
+
+    rows = query.group_by(func.grouping_sets(tuple_(group_id, group_name), tuple_())).all()
+
+    groups = sorted((row for row in rows if not row.is_total), key=lambda row: row.count, reverse=True)
+    total = next((row for row in rows if row.is_total), None)
+    return groups, total
+
+
+def _duration_entry(row):
+    entry = {
+        'count': row.count if row else 0,
+        'avg_minutes': _round(row.avg) if row else None,
+        'max_minutes': _round(row.max) if row else None
+    }
+    for pct in PERCENTILES:
+        label = f'p{int(pct * 100)}'
+        entry[f'{label}_minutes'] = _round(getattr(row, label)) if row else None
+    return entry
+
+
+def get_dwell_time_stats(company_id, start_date, end_date, group_by='plant', plant_id=None, supplier_id=None):
+    """
+    Tempo de permanência (check-out - check-in) por planta ou fornecedor
+
+    Args:
+        company_id: ID da company
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+        group_by: 'plant' ou 'supplier'
+        plant_id: Filtrar por planta (opcional)
+        supplier_id: Filtrar por fornecedor (opcional)
+
+    Returns:
+        dict: groups (id, name, count, avg/max/percentis em minutos) e overall
+    """
+    source = appointment_source(company_id, start_date)
+    dwell_minutes = func.extract('epoch', source.check_out_time - source.check_in_time) / 60
+    groups, total = _percentile_report(
+        source, company_id, start_date, end_date, group_by, dwell_minutes,
+        conditions=(
+            source.check_in_time.isnot(None),
+            source.check_out_time.isnot(None),
+            source.check_out_time >= source.check_in_time
+        ),
+        plant_id=plant_id, supplier_id=supplier_id
+    )
+
+    return {
+        'groups': [{'id': row.group_id, 'name': row.group_name, **_duration_entry(row)} for row in groups],
+        'overall': _duration_entry(total)
+    }
+
+
+def _punctuality_buckets(lateness_minutes, tolerance):
+    """Condições disjuntas das faixas de pontualidade (on_time, late, early) sobre o atraso em minutos"""
+    return {
+        'on_time': lateness_minutes.between(-tolerance, tolerance),
+        'late': lateness_minutes > tolerance,
+        'early': lateness_minutes < -tolerance
+    }
+
+
+def get_punctuality_stats(company_id, start_date, end_date, group_by='plant', plant_id=None, supplier_id=None):
+    """
+    Atraso na chegada (check-in - data/horário agendado) por planta ou fornecedor
+
+    Atrasos negativos são chegadas antecipadas. As faixas são disjuntas: chegadas até
+    PUNCTUALITY_TOLERANCE_MINUTES antes ou depois do horário agendado são pontuais; fora
+    dessa janela, antecipadas ou atrasadas (on_time + late + early = count).
+
+    Returns:
+        dict: groups (id, name, count, avg/max/percentis do atraso em minutos, on_time,
+              late, early e on_time_rate) e overall
+    """
+    source = appointment_source(company_id, start_date)
+    # date + time é o horário local agendado; convertido para timestamptz em APP_TIMEZONE
+    scheduled_at = func.timezone(APP_TIMEZONE, source.date + source.time)
+    checked_in_at = func.timezone('UTC', source.check_in_time)
+    lateness_minutes = func.extract('epoch', checked_in_at - scheduled_at) / 60
+
+    tolerance = PUNCTUALITY_TOLERANCE_MINUTES
+    groups, total = _percentile_report(
+        source, company_id, start_date, end_date, group_by, lateness_minutes,
+        conditions=(source.check_in_time.isnot(None),),
+        extra_columns=tuple(
+            func.count().filter(condition).label(bucket)
+            for bucket, condition in _punctuality_buckets(lateness_minutes, tolerance).items()
+        ),
+        plant_id=plant_id, supplier_id=supplier_id
+    )
+
+    def entry(row):
+        result = _duration_entry(row)
+        on_time = row.on_time if row else 0
+        result.update({
+            'on_time': on_time,
+            'late': row.late if row else 0,
+            'early': row.early if row else 0,
+            'on_time_rate': round(on_time / row.count * 100, 2) if row and row.count else 0
+        })
+        return result
+
+    return {
+        'groups': [{'id': row.group_id, 'name': row.group_name, **entry(row)} for row in groups],
+        'overall': entry(total),
+        'tolerance_minutes': tolerance,
+        'timezone': APP_TIMEZONE
+    }
+
+
+HEATMAP_DAY_NAMES = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
+
+
+def build_occupancy_heatmap(company_id, plant, start_date, end_date, resolution=60):
+    """
+    Mapa de calor dia da semana x horário da ocupação de uma planta
+
+    O banco devolve os intervalos distintos (dia da semana, horário inicial, horário final)
+    com a quantidade de agendamentos confirmados; a matriz é montada em memória.
+
+    Args:
+        company_id: ID da company
+        plant: Planta (já validada como pertencente à company)
+        start_date: Data inicial (date)
+        end_date: Data final (date)
+        resolution: Tamanho da faixa em minutos (divisor de 1440)
+
+    Returns:
+        dict: absolute (agendamentos somados no período), average (média por dia),
+              normalized (% da capacidade máxima), days, slots e weekday_occurrences
+    """
+    source = appointment_source(company_id, start_date)
+    day_of_week = cast(func.extract('dow', source.date), Integer)
+    rows = db.session.query(
+        day_of_week, source.time, source.time_end, func.count()
+    ).filter(
+        source.company_id == company_id,
+        source.plant_id == plant.id,
+        source.date >= start_date,
+        source.date <= end_date,
+        source.status.in_(CONFIRMED_STATUSES)
+    ).group_by(day_of_week, source.time, source.time_end).all()
+
+    intervals = []
+    for dow, start_time, end_time, count in rows:
+        start_minutes = start_time.hour * 60 + start_time.minute
+        intervals.append((int(dow), start_minutes, start_minutes + booked_minutes(start_time, end_time), count))
+
+    occurrences = weekday_occurrences(start_date, end_date)
+    matrix = occupancy_heatmap(intervals, occurrences, resolution)
+    max_capacity = plant.max_capacity or 1
+
+    return {
+        'plant': {
+            'id': plant.id,
+            'name': plant.name,
+            'max_capacity': plant.max_capacity
+        },
+        'resolution_minutes': resolution,
+        'days': HEATMAP_DAY_NAMES,
+        'slots': [f'{start // 60:02d}:{start % 60:02d}' for start in range(0, 24 * 60, resolution)],
+        'weekday_occurrences': occurrences,
+        'absolute': [[round(value, 2) for value in day] for day in matrix['absolute']],
+        'average': [[round(value, 2) for value in day] for day in matrix['average']],
+        'normalized': [[round(value / max_capacity * 100, 2) for value in day] for day in matrix['average']],
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }
+    }
+
+
+def build_week_overview(company_id, start_date, today):
+    """
+    Matriz plantas x dias da semana com agendados, capacidade, check-ins e não comparecimentos
+
+    As contagens vêm de uma consulta agrupada ao agregado diário; a capacidade de cada
+    dia (slots de 1 hora) vem dos horários de funcionamento menos os bloqueios, vezes
+    a capacidade máxima da planta.
+
+    Args:
+        company_id: ID da company
+        start_date: Primeiro dia da semana (date)
+        today: Data atual - agendamentos ainda 'scheduled' em dias anteriores contam como não comparecimento
+
+    Returns:
+        dict: days, plants (linha por planta com os dias e o total da semana) e totals (por dia)
+    """
+    days = [start_date + timedelta(days=offset) for offset in range(7)]
+    end_date = days[-1]
+
+    plants = Plant.query.filter_by(company_id=company_id, is_active=True).order_by(Plant.name).all()
+    plant_ids = [plant.id for plant in plants]
+
+    counts = {}
+    rows = db.session.query(
+        AppointmentDailyStat.plant_id,
+        AppointmentDailyStat.date,
+        AppointmentDailyStat.status,
+        func.sum(AppointmentDailyStat.count)
+    ).filter(
+        AppointmentDailyStat.company_id == company_id,
+        AppointmentDailyStat.plant_id.in_(plant_ids),
+        AppointmentDailyStat.date >= start_date,
+        AppointmentDailyStat.date <= end_date
+    ).group_by(
+        AppointmentDailyStat.plant_id, AppointmentDailyStat.date, AppointmentDailyStat.status
+    ) if plant_ids else []
+    for plant_id, day, status, count in rows:
+        counts.setdefault((plant_id, day), {})[status] = count or 0
+
+    schedules, date_blocks = load_schedules(plant_ids, start_date, end_date)
+
+    def empty_cell():
+        return {'booked': 0, 'capacity': 0, 'checked_in': 0, 'no_show': 0}
+
+    totals = [empty_cell() for _ in days]
+    result = []
+    for plant in plants:
+        max_capacity = plant.max_capacity or 1
+        week_total = empty_cell()
+        cells = []
+        for index, day in enumerate(days):
+            status_counts = counts.get((plant.id, day), {})
+            minutes = available_minutes(schedules[plant.id], day, day, date_blocks[plant.id])
+            cell = {
+                'booked': sum(status_counts.get(status, 0) for status in CONFIRMED_STATUSES),
+                'capacity': int(minutes // 60) * max_capacity,
+                'checked_in': sum(status_counts.get(status, 0) for status in ATTENDED_STATUSES),
+                'no_show': status_counts.get('scheduled', 0) if day < today else 0
+            }
+            for key, value in cell.items():
+                week_total[key] += value
+                totals[index][key] += value
+            cells.append({'date': day.isoformat(), **cell})
+
+        result.append({
+            'plant': {
+                'id': plant.id,
+                'name': plant.name,
+                'max_capacity': plant.max_capacity
+            },
+            'days': cells,
+            'total': week_total
+        })
+
+    return {
+        'days': [day.isoformat() for day in days],
+        'plants': result,
+        'totals': [{'date': day.isoformat(), **totals[index]} for index, day in enumerate(days)]
+    }
@@ -0,0 +1,144 @@
+"""
+Tempo por fase das requisições (cabeçalho Server-Timing e histogramas por rota)
+
+Fases medidas:
+    auth: decodificação do JWT e carregamento do usuário
+    permission: verificação de permissões granulares (has_permission)
+    operating_hours: validate_operating_hours
+    capacity: verificação de capacidade máxima por horário
+    serialize: to_dict dos agendamentos
+    db: tempo total das consultas SQL (inclui as feitas dentro das outras fases)
+    total: duração da requisição
+
+Uma fase chamada dentro dela mesma (ex: to_dict de uma lista) é medida uma vez só.
+A resposta recebe `Server-Timing: auth;dur=1.2, db;dur=8.4, ...` (ms, visível no
+DevTools) e cada (rota, fase) alimenta um histograma no formato de
+src.utils.pool_metrics, exposto em GET /api/health/timing.
+
+Desativado, timed() devolve um context manager vazio e timed_phase() não envolve a
+função: o custo é o de um `with` sem efeito.
+
+Configuração:
+    SERVER_TIMING_ENABLED: Ativa as medições (padrão: true fora de produção)
+"""
+import os
+import time
+import threading
+from functools import wraps
+from contextlib import nullcontext
+from flask import g, request, has_request_context
+from src.utils.pool_metrics import Histogram
+from src.utils.query_stats import start_query_collection, stop_query_collection
+
+_is_production = os.environ.get('FLASK_ENV') == 'production' or os.environ.get('ENVIRONMENT') == 'production'
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'false' if _is_production else 'true').lower() == 'true'
+
+_NOOP = nullcontext()
+
+# (rota, fase) -> Histogram
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+class _PhaseTimer:
+    """Soma a duração do bloco na fase da requisição atual"""
+
+    __slots__ = ('phase', 'started')
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.started = None
+
+    def __enter__(self):
+        active = g.get('server_timing_active')
+        # Fase aninhada nela mesma: o bloco externo já está medindo
+        if active is None or self.phase in active:
+            return self
+        active.add(self.phase)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.started is None:
+            return False
+        elapsed = time.perf_counter() - self.started
+        g.server_timing_active.discard(self.phase)
+        phases = g.server_timing
+        phases[self.phase] = phases.get(self.phase, 0.0) + elapsed
+        return False
+
+
+def timed(phase):
+    """Context manager que mede o bloco como a fase `phase` da requisição"""
+    if not SERVER_TIMING_ENABLED or not has_request_context():
+        return _NOOP
+    return _PhaseTimer(phase)
+
+
+def timed_phase(phase):
+    """Decorator que mede cada chamada da função como a fase `phase`"""
+    def decorator(f):
+        if not SERVER_TIMING_ENABLED:
+            return f
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with timed(phase):
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def _observe(route, phase, seconds):
+    with _histograms_lock:
+        histogram = _histograms.get((route, phase))
+        if histogram is None:
+            histogram = _histograms[(route, phase)] = Histogram()
+        histogram.observe(seconds)
+
+
+def get_route_timings():
+    """Histogramas por rota e fase deste processo: {rota: {fase: histograma}}"""
+    with _histograms_lock:
+        result = {}
+        for (route, phase), histogram in sorted(_histograms.items()):
+            result.setdefault(route, {})[phase] = histogram.to_dict()
+    return result
+
+
+def init_server_timing(app):
+    """Registra as medições por requisição e o cabeçalho Server-Timing"""
+    if not SERVER_TIMING_ENABLED:
+        return
+
+    @app.before_request
+    def _start_server_timing():
+        g.server_timing = {}
+        g.server_timing_active = set()
+        g.server_timing_started = time.perf_counter()
+        # Reaproveita a contagem de consultas da requisição quando QUERY_STATS_ENABLED
+        g.server_timing_queries = g.get('query_stats') or start_query_collection()
+
+    @app.after_request
+    def _emit_server_timing(response):
+        phases = g.get('server_timing')
+        if phases is None:
+            return response
+        phases = dict(phases)
+        phases['db'] = g.server_timing_queries.duration
+        phases['total'] = time.perf_counter() - g.server_timing_started
+
+        response.headers['Server-Timing'] = ', '.join(
+            f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in phases.items()
+        )
+        if request.url_rule is not None:
+            route = f'{request.method} {request.url_rule.rule}'
+            for phase, seconds in phases.items():
+                _observe(route, phase, seconds)
+        return response
+
+    @app.teardown_request
+    def _stop_server_timing(exc):
+        queries = g.pop('server_timing_queries', None)
+        if queries is not None and queries is not g.get('query_stats'):
+            stop_query_collection(queries)
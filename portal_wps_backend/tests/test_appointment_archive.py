@@ -0,0 +1,65 @@
+"""
+Testes do arquivamento de agendamentos (src/utils/appointment_archive.py)
+"""
+from datetime import date, time
+import pytest
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.appointment_archive import AppointmentArchive
+from src.models.company import Company
+from src.models.supplier import Supplier
+from src.utils import cache_bus
+from src.utils.appointment_archive import archive_rows
+from src.utils.report_cache import get_data_version
+
+
+@pytest.fixture
+def received(app):
+    cache_bus.init_cache_bus(app, db)
+    events = []
+    cache_bus.register_invalidation_handler('appointment', lambda company_id, entity_id: events.append(company_id))
+    yield events
+    with cache_bus._handlers_lock:
+        cache_bus._handlers['appointment'].pop()
+
+
+def _appointment(company_id, supplier_id, day, status='checked_out'):
+    return Appointment(
+        date=day, time=time(8), purchase_order='PO', truck_plate='ABC1D23', driver_name='Motorista',
+        status=status, company_id=company_id, supplier_id=supplier_id
+    )
+
+
+def test_archive_rows_moves_rows_and_publishes_per_company(app, company, received):
+    with app.app_context():
+        other = Company(name='Outra', cnpj='44.444.444/0001-44')
+        db.session.add(other)
+        db.session.commit()
+        other_supplier = Supplier(cnpj='55.555.555/0001-55', description='Fornecedor 2', company_id=other.id)
+        db.session.add(other_supplier)
+        db.session.commit()
+        db.session.add_all([
+            _appointment(company['company_id'], company['supplier_id'], date(2023, 1, 10)),
+            _appointment(company['company_id'], company['supplier_id'], date(2023, 1, 11), status='scheduled'),
+            _appointment(other.id, other_supplier.id, date(2023, 2, 1)),
+            _appointment(company['company_id'], company['supplier_id'], date(2026, 1, 10))
+        ])
+        db.session.commit()
+        other_id = other.id
+        received.clear()
+        versions = [get_data_version(company['company_id']), get_data_version(other_id)]
+        # SQLite em memória: uma única conexão, compartilhada com a sessão do arquivamento
+        db.session.commit()
+
+        assert archive_rows(db.engine, date(2024, 1, 1), batch_size=1) == 2
+        assert AppointmentArchive.query.count() == 2
+        assert Appointment.query.count() == 2
+        assert sorted(received) == sorted([company['company_id'], other_id])
+        assert get_data_version(company['company_id']) != versions[0]
+        assert get_data_version(other_id) != versions[1]
+
+        # Nada a arquivar: nenhum evento
+        received.clear()
+        db.session.commit()
+        assert archive_rows(db.engine, date(2024, 1, 1)) == 0
+    assert received == []
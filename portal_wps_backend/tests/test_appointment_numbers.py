@@ -0,0 +1,101 @@
+"""
+Testes da numeração dos agendamentos (generate_appointment_number e appointment_numbers)
+"""
+from datetime import date, time, timedelta
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.appointment_archive import AppointmentArchive
+from src.models.appointment_number import AppointmentNumber
+from src.models.company import Company
+from src.utils.helpers import generate_appointment_number
+from conftest import auth_headers
+
+DAY = date(2026, 3, 2)
+
+
+def _archived(company, number):
+    return AppointmentArchive(
+        id=900, appointment_number=number, date=DAY, time=time(8), purchase_order='PO',
+        truck_plate='ABC1D23', driver_name='Motorista', status='checked_out',
+        company_id=company['company_id'], supplier_id=company['supplier_id'], plant_id=company['plant_id']
+    )
+
+
+def test_sequence_skips_numbers_of_archived_appointments(app, company):
+    with app.app_context():
+        first = generate_appointment_number(company['company_id'], DAY)
+        db.session.commit()
+        # O agendamento foi arquivado: o número continua reservado no registro
+        db.session.add(_archived(company, first))
+        db.session.commit()
+        second = generate_appointment_number(company['company_id'], DAY)
+        db.session.commit()
+    assert first == 'AG-20260302-0001'
+    assert second == 'AG-20260302-0002'
+
+
+def test_rescheduled_number_is_not_reused(app, company):
+    with app.app_context():
+        number = generate_appointment_number(company['company_id'], DAY)
+        appointment = Appointment(
+            appointment_number=number, date=DAY, time=time(8), purchase_order='PO', truck_plate='ABC1D23',
+            driver_name='Motorista', company_id=company['company_id'], supplier_id=company['supplier_id'],
+            plant_id=company['plant_id']
+        )
+        db.session.add(appointment)
+        db.session.commit()
+        appointment.date = DAY + timedelta(days=7)
+        db.session.commit()
+        assert generate_appointment_number(company['company_id'], DAY) == 'AG-20260302-0002'
+
+
+def test_reservation_collision_takes_next_number(app, company, monkeypatch):
+    with app.app_context():
+        # Reserva concorrente gravada depois da leitura do maior número
+        db.session.add(AppointmentNumber(company_id=company['company_id'], appointment_number='AG-20260302-0001'))
+        db.session.commit()
+        original_query = db.session.query
+
+        def stale_max(*args, **kwargs):
+            query = original_query(*args, **kwargs)
+            return query.filter(AppointmentNumber.appointment_number == 'inexistente')
+
+        monkeypatch.setattr(db.session, 'query', stale_max)
+        number = generate_appointment_number(company['company_id'], DAY)
+        monkeypatch.undo()
+        db.session.commit()
+        assert number == 'AG-20260302-0002'
+
+
+def test_numbers_are_sequenced_per_company(app, company):
+    with app.app_context():
+        other = Company(name='Outra', cnpj='44.444.444/0001-44')
+        db.session.add(other)
+        db.session.commit()
+        numbers = [
+            generate_appointment_number(company['company_id'], DAY),
+            generate_appointment_number(other.id, DAY),
+            generate_appointment_number(company['company_id'], DAY)
+        ]
+        db.session.commit()
+    assert numbers == ['AG-20260302-0001', 'AG-20260302-0001', 'AG-20260302-0002']
+
+
+def test_failed_creation_releases_reservation(app, company):
+    with app.app_context():
+        generate_appointment_number(company['company_id'], DAY)
+        db.session.rollback()
+        assert AppointmentNumber.query.count() == 0
+
+
+def test_created_appointment_is_registered(app, company):
+    monday = date.today() + timedelta(days=7 - date.today().weekday())
+    response = app.test_client().post('/api/admin/appointments', headers=auth_headers(company['admin_id']), json={
+        'date': monday.isoformat(), 'time': '09:00', 'time_end': '10:00', 'purchase_order': 'PO1',
+        'truck_plate': 'abc1d23', 'driver_name': 'Motorista', 'supplier_id': company['supplier_id'],
+        'plant_id': company['plant_id']
+    })
+    assert response.status_code == 201, response.get_json()
+    number = response.get_json()['appointment']['appointment_number']
+    with app.app_context():
+        assert db.session.get(AppointmentNumber, (company['company_id'], number)) is not None
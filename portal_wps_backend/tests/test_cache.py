@@ -0,0 +1,133 @@
+"""
+Testes da camada de cache (src/utils/cache.py)
+
+O RedisCache roda contra FakeRedis, um substituto em memória com os comandos usados
+pelo adaptador. Com REDIS_TEST_URL definida (ex: redis://localhost:6379/15), os mesmos
+testes rodam também contra o servidor real.
+"""
+import os
+import fnmatch
+from decimal import Decimal
+from datetime import date, datetime, time
+import pytest
+from src.utils.cache import LocalCache, RedisCache, create_cache, dumps, loads
+
+
+class FakeRedis:
+    """Substituto em memória do cliente redis (get/set/delete/incr/scan_iter)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def incr(self, key):
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def scan_iter(self, match='*', count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+
+def _redis_clients():
+    clients = [pytest.param(FakeRedis, id='fake')]
+    if os.environ.get('REDIS_TEST_URL'):
+        import redis
+        clients.append(pytest.param(lambda: redis.Redis.from_url(os.environ['REDIS_TEST_URL']), id='redis'))
+    return clients
+
+
+@pytest.fixture(params=['local'] + [param for param in _redis_clients()])
+def cache(request):
+    if request.param == 'local':
+        backend = LocalCache()
+    else:
+        backend = RedisCache(client=request.param(), prefix='cargoflow_test')
+    yield backend
+    backend.clear()
+
+
+def test_roundtrip_preserves_types(cache):
+    value = {
+        'date': date(2026, 3, 1),
+        'datetime': datetime(2026, 3, 1, 8, 30, 15),
+        'time': time(8, 30),
+        'amount': Decimal('12.50'),
+        'items': [1, 'a', None, True],
+        'nested': {'when': date(2025, 12, 31)}
+    }
+    cache.set('ns', 'key', value)
+    assert cache.get('ns', 'key') == value
+    assert isinstance(cache.get('ns', 'key')['amount'], Decimal)
+
+
+def test_backends_return_the_same_types():
+    local = LocalCache()
+    remote = RedisCache(client=FakeRedis())
+    value = {'day': date(2026, 1, 2), 'pair': (1, 2), 'total': Decimal('3.10')}
+    local.set('ns', 'key', value)
+    remote.set('ns', 'key', value)
+    assert local.get('ns', 'key') == remote.get('ns', 'key') == loads(dumps(value))
+
+
+def test_local_cache_returns_copies():
+    cache = LocalCache()
+    cache.set('ns', 'key', {'a': [1]})
+    cache.get('ns', 'key')['a'].append(2)
+    assert cache.get('ns', 'key') == {'a': [1]}
+
+
+def test_bump_namespace_invalidates(cache):
+    cache.set('ns', 'key', 1)
+    cache.set('other', 'key', 2)
+    cache.bump_namespace('ns')
+    assert cache.get('ns', 'key') is None
+    assert cache.get('other', 'key') == 2
+
+
+def test_get_or_load_caches_none_and_loads_once(cache):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_load('ns', 'missing', loader) is None
+    assert cache.get_or_load('ns', 'missing', loader) is None
+    assert len(calls) == 1
+
+
+def test_redis_clear_keeps_foreign_keys():
+    client = FakeRedis()
+    client.set('other_app:session', 'x')
+    cache = RedisCache(client=client, prefix='cargoflow')
+    cache.set('ns', 'key', 1)
+    cache.bump_namespace('ns')
+    cache.clear()
+    assert client.data == {'other_app:session': b'x'}
+
+
+def test_create_cache_rejects_unknown_scheme():
+    assert isinstance(create_cache('memory://'), LocalCache)
+    with pytest.raises(ValueError):
+        create_cache('memcached://localhost')
+
+
+def test_get_or_load_keeps_value_loaded_before_a_bump(cache):
+    def loader():
+        # Escrita concorrente invalida o namespace enquanto o valor antigo é carregado
+        cache.bump_namespace('ns')
+        return 'antigo'
+
+    assert cache.get_or_load('ns', 'key', loader) == 'antigo'
+    assert cache.get('ns', 'key') is None
+    assert cache.get_or_load('ns', 'key', lambda: 'novo') == 'novo'
+    assert cache.get('ns', 'key') == 'novo'
@@ -0,0 +1,149 @@
+"""
+Testes do barramento de invalidação de cache (src/utils/cache_bus.py)
+
+Os testes marcados com requires_postgres rodam contra um PostgreSQL local
+(TEST_DATABASE_URL): entrega por LISTEN/NOTIFY e eventos com commit fora de ordem.
+"""
+import os
+import json
+import time
+import select
+import threading
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from src.models.user import db
+from src.models.cache_invalidation_event import CacheInvalidationEvent
+from src.utils import cache_bus
+from conftest import make_app, requires_postgres, TEST_DATABASE_URL
+
+
+@pytest.fixture
+def received():
+    """Eventos recebidos por um handler de teste na entidade 'test_entity'"""
+    events = []
+    cache_bus.register_invalidation_handler('test_entity', lambda company_id, entity_id: events.append((company_id, entity_id)))
+    yield events
+    with cache_bus._handlers_lock:
+        cache_bus._handlers.pop('test_entity', None)
+
+
+def _event(event_id=None, entity_id='1', origin='other-worker'):
+    values = {
+        'entity': 'test_entity', 'company_id': 1, 'entity_id': entity_id,
+        'origin': origin, 'created_at': datetime.utcnow()
+    }
+    if event_id is not None:
+        values['id'] = event_id
+    return values
+
+
+def test_poller_sees_event_committed_after_a_higher_id(app, received):
+    with app.app_context():
+        poller = cache_bus.EventPoller(lookback=60)
+        poller.poll(db.session)
+
+        # O id 2 chega primeiro; o id 1 (transação mais antiga) só depois
+        db.session.execute(CacheInvalidationEvent.__table__.insert().values(**_event(2, 'b')))
+        db.session.commit()
+        assert poller.poll(db.session) == 1
+        db.session.execute(CacheInvalidationEvent.__table__.insert().values(**_event(1, 'a')))
+        db.session.commit()
+        assert poller.poll(db.session) == 1
+
+        # Eventos já despachados não se repetem
+        assert poller.poll(db.session) == 0
+    assert received == [(1, 'b'), (1, 'a')]
+
+
+def test_poller_ignores_own_events_and_backlog(app, received):
+    with app.app_context():
+        db.session.execute(CacheInvalidationEvent.__table__.insert().values(**_event(entity_id='old')))
+        db.session.commit()
+        poller = cache_bus.EventPoller(lookback=60)
+        assert poller.poll(db.session) == 0
+
+        db.session.execute(CacheInvalidationEvent.__table__.insert().values(**_event(origin=cache_bus.worker_id())))
+        db.session.commit()
+        poller.poll(db.session)
+    assert received == []
+
+
+def test_listener_uses_stdlib_select():
+    # O listener espera as notificações com select.select; a função select do SQLAlchemy
+    # não pode sobrescrever o módulo
+    assert cache_bus.select is select
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requer fork')
+def test_worker_id_changes_after_fork():
+    parent_id = cache_bus.worker_id()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, cache_bus.worker_id().encode())
+        os._exit(0)
+    os.close(write_fd)
+    child_id = os.read(read_fd, 100).decode()
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    assert child_id and child_id != parent_id
+    assert cache_bus.worker_id() == parent_id
+
+
+@requires_postgres
+def test_poller_with_concurrent_transactions(received):
+    app = make_app(TEST_DATABASE_URL)
+    engine = create_engine(TEST_DATABASE_URL)
+    insert = CacheInvalidationEvent.__table__.insert()
+    try:
+        with app.app_context():
+            poller = cache_bus.EventPoller(lookback=60)
+            poller.poll(db.session)
+            db.session.remove()
+
+        slow = engine.connect()
+        slow_tx = slow.begin()
+        slow.execute(insert.values(**_event(entity_id='slow')))  # id menor, commit depois
+        with engine.begin() as fast:
+            fast.execute(insert.values(**_event(entity_id='fast')))
+
+        with app.app_context():
+            assert poller.poll(db.session) == 1
+            db.session.remove()
+        slow_tx.commit()
+        slow.close()
+        with app.app_context():
+            assert poller.poll(db.session) == 1
+            db.session.remove()
+        assert sorted(entity_id for _, entity_id in received) == ['fast', 'slow']
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM cache_invalidation_events WHERE entity = 'test_entity'"))
+        engine.dispose()
+
+
+@requires_postgres
+def test_listen_loop_dispatches_notifications(received):
+    engine = create_engine(TEST_DATABASE_URL)
+    cache_bus._stop.clear()
+    thread = threading.Thread(target=cache_bus._listen_loop, args=(engine, {}), daemon=True)
+    thread.start()
+    try:
+        payload = {'entity': 'test_entity', 'company_id': 7, 'id': '42', 'origin': 'other-worker'}
+        own = dict(payload, id='own', origin=cache_bus.worker_id())
+        deadline = time.monotonic() + 10
+        # Repete até o listener estar conectado (LISTEN é assíncrono ao início da thread)
+        while not received and time.monotonic() < deadline:
+            with engine.begin() as connection:
+                for message in (own, payload):
+                    connection.execute(text('SELECT pg_notify(:channel, :payload)'),
+                                       {'channel': cache_bus.CACHE_BUS_CHANNEL, 'payload': json.dumps(message)})
+            time.sleep(0.2)
+        assert received and set(received) == {(7, '42')}
+    finally:
+        cache_bus._stop.set()
+        thread.join(timeout=10)
+        cache_bus._stop.clear()
+        engine.dispose()
@@ -0,0 +1,143 @@
+"""
+Testes do roteamento de leituras para a réplica (src/utils/db_routing.py)
+
+Rodam contra dois bancos PostgreSQL locais: TEST_DATABASE_URL no papel do primário e
+TEST_DATABASE_READ_URL no da réplica. Sem replicação entre eles, cada banco recebe as
+mesmas plantas com nomes diferentes, e o nome lido mostra qual banco atendeu.
+"""
+import time
+import pytest
+from flask import jsonify
+from sqlalchemy import create_engine, select, text
+from src.models.user import db
+from src.models.company import Company
+from src.models.plant import Plant
+from src.utils import cache_bus, db_routing
+from src.utils.db_routing import REPLICA_BIND_KEY, init_read_routing, set_request_company, use_primary, read_from_replica
+from conftest import make_app, requires_postgres, TEST_DATABASE_URL, TEST_DATABASE_READ_URL
+
+pytestmark = [
+    requires_postgres,
+    pytest.mark.skipif(not TEST_DATABASE_READ_URL, reason='TEST_DATABASE_READ_URL não definida')
+]
+
+STICKY_SECONDS = 0.5
+
+
+def _reset_schema(url):
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text('DROP SCHEMA public CASCADE'))
+        connection.execute(text('CREATE SCHEMA public'))
+    engine.dispose()
+
+
+def _seed(engine, plant_name):
+    with engine.begin() as connection:
+        connection.execute(Company.__table__.insert(), [
+            {'id': company_id, 'name': f'Empresa {company_id}', 'cnpj': f'{company_id}', 'is_active': True}
+            for company_id in (1, 2)
+        ])
+        connection.execute(Plant.__table__.insert(), [
+            {'id': plant_id, 'name': plant_name, 'cnpj': f'{plant_id}', 'company_id': plant_id,
+             'max_capacity': 1, 'is_active': True}
+            for plant_id in (1, 2)
+        ])
+
+
+def _plant_name(plant_id):
+    # Consulta direta (sem o identity map), atendida pelo banco escolhido pela sessão
+    return db.session.execute(select(Plant.name).where(Plant.id == plant_id)).scalar()
+
+
+def _stored_name(engine, plant_id):
+    with engine.connect() as connection:
+        return connection.execute(select(Plant.name).where(Plant.id == plant_id)).scalar()
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(db_routing, 'DATABASE_READ_URL', TEST_DATABASE_READ_URL)
+    monkeypatch.setattr(db_routing, 'DATABASE_READ_STICKY_SECONDS', STICKY_SECONDS)
+    # Só a invalidação local: entrega a gravação ao roteamento no commit, sem thread LISTEN
+    monkeypatch.setattr(cache_bus, 'CACHE_BUS_MODE', 'off')
+    db_routing._last_write.clear()
+    for url in (TEST_DATABASE_URL, TEST_DATABASE_READ_URL):
+        _reset_schema(url)
+
+    app = make_app(TEST_DATABASE_URL, SQLALCHEMY_BINDS={REPLICA_BIND_KEY: TEST_DATABASE_READ_URL})
+    with app.app_context():
+        db.metadata.create_all(db.engines[REPLICA_BIND_KEY])
+        _seed(db.engine, 'primário')
+        _seed(db.engines[REPLICA_BIND_KEY], 'réplica')
+    cache_bus.init_cache_bus(app, db)
+    init_read_routing(app)
+
+    @app.route('/_routing/plants/<int:plant_id>', methods=['GET'])
+    def read_plant(plant_id):
+        set_request_company(plant_id)
+        return jsonify({'name': _plant_name(plant_id)})
+
+    @app.route('/_routing/plants/<int:plant_id>', methods=['POST'])
+    def write_plant(plant_id):
+        set_request_company(plant_id)
+        before = _plant_name(plant_id)
+        db.session.get(Plant, plant_id).name = 'gravado'
+        db.session.commit()
+        after = _plant_name(plant_id)
+        with read_from_replica():
+            forced = _plant_name(plant_id)
+        return jsonify({'before': before, 'after': after, 'forced': forced})
+
+    @app.route('/_routing/primary/plants/<int:plant_id>', methods=['GET'])
+    @use_primary
+    def read_plant_from_primary(plant_id):
+        set_request_company(plant_id)
+        return jsonify({'name': _plant_name(plant_id)})
+
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # O bind registra um MetaData próprio em db; os apps dos demais testes não têm réplica
+    db.metadatas.pop(REPLICA_BIND_KEY, None)
+
+
+def test_get_reads_from_replica(app):
+    response = app.test_client().get('/_routing/plants/1')
+    assert response.get_json() == {'name': 'réplica'}
+
+
+def test_writes_go_to_primary_and_request_sticks(app):
+    response = app.test_client().post('/_routing/plants/1')
+    # POST lê do primário; depois da gravação a requisição continua no primário
+    assert response.get_json() == {'before': 'primário', 'after': 'gravado', 'forced': 'réplica'}
+    with app.app_context():
+        assert _stored_name(db.engine, 1) == 'gravado'
+        assert _stored_name(db.engines[REPLICA_BIND_KEY], 1) == 'réplica'
+
+
+def test_reads_after_write_stay_on_primary_within_sticky_window(app):
+    client = app.test_client()
+    client.post('/_routing/plants/1')
+
+    assert client.get('/_routing/plants/1').get_json() == {'name': 'gravado'}
+    # A janela vale só para a company que gravou
+    assert client.get('/_routing/plants/2').get_json() == {'name': 'réplica'}
+
+    time.sleep(STICKY_SECONDS + 0.1)
+    assert client.get('/_routing/plants/1').get_json() == {'name': 'réplica'}
+
+
+def test_use_primary_overrides_get_routing(app):
+    response = app.test_client().get('/_routing/primary/plants/1')
+    assert response.get_json() == {'name': 'primário'}
+
+
+def test_read_from_replica_outside_requests(app):
+    with app.app_context():
+        assert _plant_name(1) == 'primário'
+        with read_from_replica():
+            assert _plant_name(1) == 'réplica'
+        assert _plant_name(1) == 'primário'
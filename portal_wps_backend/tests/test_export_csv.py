@@ -0,0 +1,119 @@
+"""
+Testes da exportação CSV de agendamentos (/api/admin/appointments/export.csv)
+
+O teste com um milhão de agendamentos é lento (alguns minutos) e roda com
+RUN_SLOW_TESTS=1; EXPORT_TEST_ROWS altera a quantidade de linhas.
+"""
+import os
+import csv
+import tracemalloc
+from datetime import date, time, timedelta
+import pytest
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.appointment_archive import AppointmentArchive
+from src.routes import admin
+from conftest import auth_headers
+
+URL = '/api/admin/appointments/export.csv'
+
+
+def _rows(company, count, start=date(2026, 1, 1), first_id=1):
+    for index in range(count):
+        yield {
+            'id': first_id + index,
+            'appointment_number': f'AG{first_id + index:08d}',
+            'date': start + timedelta(days=index % 365),
+            'time': time(8 + index % 8),
+            'time_end': time(9 + index % 8),
+            'purchase_order': f'PO{index}',
+            'truck_plate': 'ABC1D23',
+            'driver_name': 'Motorista',
+            'status': 'checked_out',
+            'supplier_id': company['supplier_id'],
+            'plant_id': company['plant_id'],
+            'company_id': company['company_id']
+        }
+
+
+def _seed(app, company, count, table=Appointment.__table__, **kwargs):
+    with app.app_context():
+        batch = []
+        for row in _rows(company, count, **kwargs):
+            batch.append(row)
+            if len(batch) == 10000:
+                db.session.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(table.insert(), batch)
+        db.session.commit()
+
+
+def _read_csv(response):
+    text = response.get_data(as_text=True).lstrip('﻿')
+    return list(csv.reader(text.splitlines()))
+
+
+def test_export_includes_supplier_plant_and_archive(app, company):
+    _seed(app, company, 3, start=date(2026, 3, 1))
+    _seed(app, company, 2, table=AppointmentArchive.__table__, start=date(2023, 1, 1), first_id=100)
+    client = app.test_client()
+
+    response = client.get(f'{URL}?start=2023-01-01&end=2026-12-31', headers=auth_headers(company['admin_id']))
+    rows = _read_csv(response)
+    assert response.status_code == 200
+    assert rows[0] == admin.EXPORT_CSV_HEADERS
+    assert [row[0] for row in rows[1:]] == ['AG00000100', 'AG00000101', 'AG00000001', 'AG00000002', 'AG00000003']
+    assert rows[1][8:11] == ['Fornecedor 1', '33.333.333/0001-33', 'Planta 1']
+
+    # Período sem arquivados: apenas a tabela ativa
+    rows = _read_csv(client.get(f'{URL}?start=2026-01-01', headers=auth_headers(company['admin_id'])))
+    assert len(rows) == 4
+
+
+def test_export_error_mid_stream_marks_file_incomplete(app, company, monkeypatch):
+    _seed(app, company, 10)
+    monkeypatch.setattr(admin, 'EXPORT_CSV_BATCH_SIZE', 3)
+    original_writer = csv.writer
+
+    class FailingWriter:
+        def __init__(self, buffer):
+            self.writer = original_writer(buffer)
+            self.written = 0
+
+        def writerow(self, row):
+            self.written += 1
+            if self.written > 6:
+                raise RuntimeError('conexão perdida')
+            self.writer.writerow(row)
+
+    monkeypatch.setattr(admin.csv, 'writer', FailingWriter)
+    response = app.test_client().get(URL, headers=auth_headers(company['admin_id']), buffered=False)
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in response.response:
+            chunks.append(chunk)
+    body = b''.join(chunks).decode('utf-8')
+    assert body.endswith(admin.EXPORT_CSV_ERROR_MARKER)
+
+
+@pytest.mark.skipif(not os.environ.get('RUN_SLOW_TESTS'), reason='RUN_SLOW_TESTS não definida')
+def test_export_million_rows_in_constant_memory(app, company):
+    total = int(os.environ.get('EXPORT_TEST_ROWS', 1000000))
+    _seed(app, company, total)
+    response = app.test_client().get(URL, headers=auth_headers(company['admin_id']), buffered=False)
+    assert response.status_code == 200
+
+    tracemalloc.start()
+    lines = 0
+    try:
+        for chunk in response.response:
+            lines += chunk.count(b'\n')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        response.close()
+
+    assert lines == total + 1
+    # A memória alocada durante a transmissão não cresce com a quantidade de linhas
+    assert peak < 50 * 1024 * 1024
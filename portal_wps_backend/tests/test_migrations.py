@@ -0,0 +1,51 @@
+"""
+Testes das migrações versionadas (src/utils/migrations.py e src/migrations)
+"""
+from sqlalchemy import create_engine, text
+from src.models.user import db
+from src.utils.migrations import run_migrations
+from conftest import make_app, requires_postgres, TEST_DATABASE_URL
+
+
+def _user_indexes(engine):
+    # Pelo catálogo: o inspector do SQLAlchemy omite índices de expressão no SQLite
+    if engine.dialect.name == 'postgresql':
+        sql = "SELECT indexname FROM pg_indexes WHERE tablename = 'users'"
+    else:
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'users'"
+    with engine.connect() as connection:
+        return set(connection.execute(text(sql)).scalars())
+
+
+def _check_existing_database_gets_email_index(app):
+    with app.app_context():
+        engine = db.engine
+        # Banco criado antes das migrações, sem o índice funcional
+        with engine.begin() as connection:
+            connection.execute(text('DROP INDEX ix_users_email_lower_company'))
+        assert 'ix_users_email_lower_company' not in _user_indexes(engine)
+
+        executed = run_migrations(engine)
+        assert '0006_users_email_index' in executed
+        assert 'ix_users_email_lower_company' in _user_indexes(engine)
+        assert run_migrations(engine) == []
+
+
+def test_existing_database_gets_email_index(app):
+    _check_existing_database_gets_email_index(app)
+
+
+@requires_postgres
+def test_existing_database_gets_email_index_postgres():
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as connection:
+        connection.execute(text('DROP SCHEMA public CASCADE'))
+        connection.execute(text('CREATE SCHEMA public'))
+    engine.dispose()
+    app = make_app(TEST_DATABASE_URL)
+    try:
+        _check_existing_database_gets_email_index(app)
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
@@ -0,0 +1,94 @@
+"""
+Orçamento de consultas dos endpoints otimizados e cabeçalhos X-DB-* (src/utils/query_stats.py)
+
+Os orçamentos não dependem da quantidade de agendamentos: max_repeats pega uma
+consulta por item (N+1) mesmo quando o total ainda cabe em max_queries.
+"""
+from datetime import date, time, timedelta
+import pytest
+from src.models.user import db
+from src.models.plant import Plant
+from src.models.supplier import Supplier
+from src.models.appointment import Appointment
+from src.utils import pool_metrics, query_stats
+from src.utils.daily_stats import init_daily_stats
+from src.utils.query_stats import init_query_stats, query_budget
+from conftest import auth_headers
+
+MONDAY = date(2026, 3, 2)
+STATUSES = ('scheduled', 'checked_in', 'checked_out')
+
+
+@pytest.fixture
+def seeded(app, company):
+    """4 plantas, 6 fornecedores e 60 agendamentos na semana de MONDAY"""
+    init_daily_stats()
+    with app.app_context():
+        plants = [db.session.get(Plant, company['plant_id'])] + [
+            Plant(name=f'Planta {index}', cnpj=f'22.222.222/000{index}-22', company_id=company['company_id'], max_capacity=2)
+            for index in range(2, 5)
+        ]
+        suppliers = [db.session.get(Supplier, company['supplier_id'])] + [
+            Supplier(cnpj=f'33.333.333/000{index}-33', description=f'Fornecedor {index}', company_id=company['company_id'])
+            for index in range(2, 7)
+        ]
+        db.session.add_all(plants + suppliers)
+        db.session.commit()
+        db.session.add_all([
+            Appointment(
+                appointment_number=f'AG-{index:04d}', date=MONDAY + timedelta(days=index % 7), time=time(8 + index % 8),
+                purchase_order=f'PO{index}', truck_plate='ABC1D23', driver_name='Motorista', status=STATUSES[index % 3],
+                company_id=company['company_id'], supplier_id=suppliers[index % 6].id, plant_id=plants[index % 4].id
+            )
+            for index in range(60)
+        ])
+        db.session.commit()
+    return company
+
+
+@pytest.mark.parametrize('url, max_queries', [
+    (f'/api/admin/reports/dashboard-summary?start_date={MONDAY}&end_date={MONDAY + timedelta(days=6)}', 6),
+    (f'/api/admin/appointments?week={MONDAY}', 3),
+    (f'/api/admin/appointments?date={MONDAY}&plant_id=1', 4),
+    (f'/api/admin/overview?week={MONDAY}', 7),
+])
+def test_optimized_endpoints_stay_within_budget(app, seeded, url, max_queries):
+    client = app.test_client()
+    with query_budget(max_queries=max_queries, max_repeats=1):
+        response = client.get(url, headers=auth_headers(seeded['admin_id']))
+    assert response.status_code == 200
+    assert response.get_json()
+
+
+@pytest.fixture
+def stats_client(app, company, monkeypatch):
+    monkeypatch.setattr(query_stats, 'QUERY_STATS_ENABLED', True)
+    init_query_stats(app)
+    return app.test_client(), auth_headers(company['admin_id'])
+
+
+def test_headers_outside_production_without_token(stats_client, monkeypatch):
+    monkeypatch.setattr(pool_metrics, 'METRICS_TOKEN', '')
+    monkeypatch.setattr(pool_metrics, '_is_production', False)
+    client, headers = stats_client
+    response = client.get(f'/api/admin/appointments?week={MONDAY}', headers=headers)
+    assert int(response.headers['X-DB-Query-Count']) > 0
+
+
+def test_headers_hidden_in_production_without_token(stats_client, monkeypatch):
+    monkeypatch.setattr(pool_metrics, 'METRICS_TOKEN', '')
+    monkeypatch.setattr(pool_metrics, '_is_production', True)
+    client, headers = stats_client
+    response = client.get(f'/api/admin/appointments?week={MONDAY}', headers=headers)
+    assert response.status_code == 200
+    assert not any(name.startswith('X-DB-') for name in response.headers.keys())
+
+
+def test_headers_require_metrics_token(stats_client, monkeypatch):
+    monkeypatch.setattr(pool_metrics, 'METRICS_TOKEN', 'segredo')
+    monkeypatch.setattr(pool_metrics, '_is_production', False)
+    client, headers = stats_client
+    url = f'/api/admin/appointments?week={MONDAY}'
+    assert 'X-DB-Query-Count' not in client.get(url, headers=headers).headers
+    assert 'X-DB-Query-Count' not in client.get(url, headers={**headers, 'X-Metrics-Token': 'errado'}).headers
+    assert 'X-DB-Query-Count' in client.get(url, headers={**headers, 'X-Metrics-Token': 'segredo'}).headers
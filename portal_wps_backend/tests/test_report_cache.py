@@ -0,0 +1,69 @@
+"""
+Testes da invalidação do cache de relatórios (src/utils/report_cache.py)
+"""
+from datetime import date, time
+import pytest
+from src.models.user import db
+from src.models.company import Company
+from src.models.schedule_config import ScheduleConfig
+from src.models.default_schedule import DefaultSchedule
+from src.models.operating_hours import OperatingHours
+from src.utils.cache_bus import init_cache_bus
+from src.utils.report_cache import get_data_version
+
+
+@pytest.fixture
+def other_company_id(app):
+    with app.app_context():
+        other = Company(name='Outra', cnpj='44.444.444/0001-44')
+        db.session.add(other)
+        db.session.commit()
+        return other.id
+
+
+@pytest.fixture(autouse=True)
+def bus(app):
+    # Sem CACHE_BUS_MODE e fora do PostgreSQL: apenas a invalidação local
+    init_cache_bus(app, db)
+
+
+def _versions(*company_ids):
+    return [get_data_version(company_id) for company_id in company_ids]
+
+
+def test_schedule_block_bumps_only_its_company(app, company, other_company_id):
+    with app.app_context():
+        before = _versions(company['company_id'], other_company_id)
+        db.session.add(ScheduleConfig(plant_id=company['plant_id'], date=date(2026, 5, 4), time=time(9), is_available=False))
+        db.session.commit()
+        after = _versions(company['company_id'], other_company_id)
+    assert after[0] != before[0]
+    assert after[1] == before[1]
+
+
+def test_weekly_block_bumps_its_company(app, company):
+    with app.app_context():
+        before = get_data_version(company['company_id'])
+        db.session.add(DefaultSchedule(plant_id=company['plant_id'], day_of_week=1, time=time(12), is_available=False))
+        db.session.commit()
+        assert get_data_version(company['company_id']) != before
+
+
+def test_global_block_bumps_every_company(app, company, other_company_id):
+    with app.app_context():
+        before = _versions(company['company_id'], other_company_id)
+        db.session.add(DefaultSchedule(plant_id=None, day_of_week=1, time=time(12), is_available=False))
+        db.session.commit()
+        after = _versions(company['company_id'], other_company_id)
+    assert after[0] != before[0] and after[1] != before[1]
+
+
+def test_operating_hours_bump_company(app, company):
+    with app.app_context():
+        before = get_data_version(company['company_id'])
+        db.session.add(OperatingHours(
+            company_id=company['company_id'], plant_id=company['plant_id'], schedule_type='weekdays',
+            operating_start=time(8), operating_end=time(17), is_active=True
+        ))
+        db.session.commit()
+        assert get_data_version(company['company_id']) != before
@@ -0,0 +1,21 @@
+"""
+Testes dos relatórios (src/utils/reports.py)
+"""
+from sqlalchemy import literal, select, union_all
+from src.models.user import db
+from src.utils.reports import _punctuality_buckets
+
+
+def test_punctuality_buckets_are_disjoint(app):
+    samples = union_all(*(
+        select(literal(value).label('lateness')) for value in (-30, -15.5, -15, 0, 15, 15.5, 40)
+    )).subquery()
+    buckets = _punctuality_buckets(samples.c.lateness, 15)
+    with app.app_context():
+        result = {
+            bucket: [row[0] for row in db.session.execute(select(samples.c.lateness).where(condition))]
+            for bucket, condition in buckets.items()
+        }
+    assert sorted(result['on_time']) == [-15, 0, 15]
+    assert sorted(result['late']) == [15.5, 40]
+    assert sorted(result['early']) == [-30, -15.5]
@@ -0,0 +1,50 @@
+"""
+Testes da normalização do e-mail de usuários (User.normalize_email)
+"""
+import importlib
+from src.models.user import db, User
+from conftest import auth_headers
+
+normalize_user_emails = importlib.import_module('src.migrations.0007_normalize_user_emails')
+
+
+def _stored_email(app, user_id):
+    with app.app_context():
+        return db.session.execute(db.select(User.email).where(User.id == user_id)).scalar()
+
+
+def test_created_and_updated_emails_are_normalized(app, company):
+    client = app.test_client()
+    headers = auth_headers(company['admin_id'])
+
+    response = client.post('/api/admin/users', headers=headers, json={
+        'email': '  Novo.Admin@Teste.COM ', 'role': 'admin', 'password': 'senha123'
+    })
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['id']
+    assert _stored_email(app, user_id) == 'novo.admin@teste.com'
+
+    response = client.put(f'/api/admin/users/{user_id}', headers=headers, json={'email': 'Outro@Teste.com '})
+    assert response.status_code == 200
+    assert _stored_email(app, user_id) == 'outro@teste.com'
+
+    # Mesmo e-mail com outra grafia: conflita com o usuário existente
+    response = client.post('/api/admin/users', headers=headers, json={'email': 'OUTRO@teste.com', 'role': 'admin'})
+    assert response.status_code == 400
+
+
+def test_migration_normalizes_existing_emails(app, company):
+    with app.app_context():
+        # Inserção direta: usuários gravados antes da normalização no modelo
+        db.session.execute(User.__table__.insert(), [
+            {'id': 10, 'email': ' Antigo@Teste.com', 'password_hash': 'x', 'role': 'admin', 'company_id': company['company_id']},
+            {'id': 11, 'email': 'ADMIN@teste.com', 'password_hash': 'x', 'role': 'admin', 'company_id': company['company_id']}
+        ])
+        db.session.commit()
+        with db.engine.begin() as connection:
+            normalize_user_emails.upgrade(connection)
+
+    assert _stored_email(app, 10) == 'antigo@teste.com'
+    # Normalizado coincidiria com admin@teste.com da mesma company: fica como está
+    assert _stored_email(app, 11) == 'ADMIN@teste.com'
+    assert _stored_email(app, company['admin_id']) == 'admin@teste.com'